@@ -0,0 +1,489 @@
+"""Benchmarks for the colour extraction, the image -> colour -> sort pipeline
+and the Spotify client.
+
+Everything here runs offline: the pipeline benchmark generates synthetic
+cover images and playlists, so it needs neither Spotify nor downloaded data,
+and the client load test runs against a local stand-in server.
+"""
+
+import json
+import os
+import platform
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from PIL import Image
+
+from chromalist.colour import hue_distance, rgb_to_hsv
+from chromalist.colour_engines import get_engine
+from chromalist.colour_store import ColourDataWriter, iter_colour_data
+from chromalist.files import FilePaths
+from chromalist.image_processing import ImageProcessor
+from chromalist.models import ImageColourData, Playlist, Track
+from chromalist.playlist_sorting import ACHROMATIC_SATURATION_THRESHOLD, sort_playlist_by_hue
+
+
+@dataclass
+class EngineBenchmark:
+    engine: str
+    images: int
+    seconds: float
+    # Fraction of images whose dominant hue agrees with the baseline engine
+    hue_agreement: float
+    # Mean circular difference of the dominant hue from the baseline (degrees)
+    mean_hue_difference: float
+
+    @property
+    def images_per_second(self) -> float:
+        return self.images / self.seconds if self.seconds > 0 else float("inf")
+
+
+def benchmark_engines(
+    image_paths: list[Path],
+    engines: list[str],
+    k: int = 3,
+    baseline: str = "kmeans",
+    hue_tolerance: float = 15.0,
+) -> list[EngineBenchmark]:
+    """Measure the speed of colour engines and their agreement with a baseline.
+
+    The images are decoded once up front, so the timings only cover the colour
+    extraction and the HSV conversion.
+
+    Args:
+        image_paths: Images to extract the colours from
+        engines: Names of the engines to benchmark
+        k: Number of dominant colours to extract
+        baseline: Name of the engine the dominant hues are compared against
+        hue_tolerance: Maximum hue difference (degrees) counted as agreement.
+                       Dominant colours that are achromatic for both engines
+                       also count as agreement.
+
+    Returns:
+        An EngineBenchmark per engine, in the order given
+    """
+    loader = ImageProcessor()
+    pixels = [loader.load_pixels(path) for path in image_paths]
+
+    def dominant_hsvs(engine_name: str) -> tuple[list[tuple[float, float, float]], float]:
+        processor = ImageProcessor(get_engine(engine_name))
+        start = time.perf_counter()
+        dominant = []
+        for image_pixels in pixels:
+            _, hsvs = processor.colours_from_pixels(image_pixels, k)
+            dominant.append(hsvs[0])
+        return dominant, time.perf_counter() - start
+
+    baseline_hsvs, _ = dominant_hsvs(baseline)
+
+    results = []
+    for engine_name in engines:
+        engine_hsvs, seconds = dominant_hsvs(engine_name)
+        agreements = 0
+        differences = []
+        for (hue, sat, _), (baseline_hue, baseline_sat, _) in zip(engine_hsvs, baseline_hsvs):
+            difference = float(hue_distance(hue, baseline_hue))
+            differences.append(difference)
+            both_achromatic = (sat < ACHROMATIC_SATURATION_THRESHOLD
+                               and baseline_sat < ACHROMATIC_SATURATION_THRESHOLD)
+            if both_achromatic or difference <= hue_tolerance:
+                agreements += 1
+
+        results.append(EngineBenchmark(
+            engine=engine_name,
+            images=len(pixels),
+            seconds=seconds,
+            hue_agreement=agreements / len(pixels) if pixels else 0.0,
+            mean_hue_difference=sum(differences) / len(differences) if differences else 0.0,
+        ))
+
+    return results
+
+
+@dataclass
+class DecodeComparison:
+    images: int
+    # Mean time to load one image (ms) with the full and the fast decode path
+    full_ms: float
+    fast_ms: float
+    # Mean absolute difference of the resized pixels (0-255)
+    mean_pixel_drift: float
+    # Mean distance between the dominant RGB colours (0-441)
+    mean_dominant_rgb_drift: float
+    # Mean circular difference of the dominant hue (degrees)
+    mean_dominant_hue_drift: float
+
+    @property
+    def speedup(self) -> float:
+        return self.full_ms / self.fast_ms if self.fast_ms > 0 else float("inf")
+
+
+def compare_decode(image_paths: list[Path], k: int = 3) -> DecodeComparison:
+    """Compare the reduced-resolution JPEG decode with the full decode.
+
+    Measures the per-image latency of both load paths and the drift of the
+    extracted colours. Both sets of pixels are clustered with the (seeded)
+    batch k-means, so the drift is due to the decoding alone.
+
+    Args:
+        image_paths: Images to decode
+        k: Number of dominant colours to extract
+
+    Returns:
+        DecodeComparison with latencies and colour drift
+    """
+
+    def load_all(processor: ImageProcessor) -> tuple[np.ndarray, float]:
+        start = time.perf_counter()
+        pixels = np.stack([processor.load_pixels(path) for path in image_paths])
+        return pixels, time.perf_counter() - start
+
+    full_processor = ImageProcessor(fast_decode=False)
+    fast_processor = ImageProcessor(fast_decode=True)
+    full_pixels, full_seconds = load_all(full_processor)
+    fast_pixels, fast_seconds = load_all(fast_processor)
+
+    rgb_drifts = []
+    hue_drifts = []
+    full_clusters = full_processor.engine.extract_batch(full_pixels, k)
+    fast_clusters = fast_processor.engine.extract_batch(fast_pixels, k)
+    for (full_centroids, full_counts), (fast_centroids, fast_counts) in zip(
+        full_clusters, fast_clusters
+    ):
+        full_rgbs, full_hsvs = full_processor.colours_from_clusters(full_centroids, full_counts)
+        fast_rgbs, fast_hsvs = fast_processor.colours_from_clusters(fast_centroids, fast_counts)
+        rgb_drifts.append(float(np.linalg.norm(np.subtract(full_rgbs[0], fast_rgbs[0]))))
+        hue_drifts.append(float(hue_distance(full_hsvs[0][0], fast_hsvs[0][0])))
+
+    n_images = len(image_paths)
+    return DecodeComparison(
+        images=n_images,
+        full_ms=1000 * full_seconds / n_images,
+        fast_ms=1000 * fast_seconds / n_images,
+        mean_pixel_drift=float(np.abs(full_pixels - fast_pixels).mean()),
+        mean_dominant_rgb_drift=float(np.mean(rgb_drifts)),
+        mean_dominant_hue_drift=float(np.mean(hue_drifts)),
+    )
+
+
+@dataclass
+class StageTiming:
+    stage: str
+    items: int
+    # Best time over the repeats
+    seconds: float
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.seconds if self.seconds > 0 else float("inf")
+
+
+@dataclass
+class Regression:
+    stage: str
+    baseline_seconds: float
+    seconds: float
+
+    @property
+    def slowdown(self) -> float:
+        return self.seconds / self.baseline_seconds if self.baseline_seconds > 0 else float("inf")
+
+
+def synthetic_cover(rng: np.random.Generator, size: int = 640) -> Image.Image:
+    """Create a synthetic album cover: a few flat colour blocks with some noise."""
+    pixels = np.empty((size, size, 3))
+    pixels[:] = rng.integers(0, 256, 3)
+    for _ in range(rng.integers(1, 5)):
+        x, y = rng.integers(0, size, 2)
+        width, height = rng.integers(size // 8, size // 2, 2)
+        pixels[y:y + height, x:x + width] = rng.integers(0, 256, 3)
+    pixels += rng.normal(0, 6, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def synthetic_playlist(n_tracks: int, n_covers: int | None = None, seed: int = 0) -> Playlist:
+    """Create a playlist of synthetic tracks.
+
+    Args:
+        n_tracks: Number of tracks
+        n_covers: Number of distinct album covers the tracks are spread over
+                  (default: one per track)
+        seed: Seed for the random assignment of tracks to covers
+    """
+    rng = np.random.default_rng(seed)
+    n_covers = n_covers or n_tracks
+    covers = rng.integers(0, n_covers, n_tracks) if n_covers < n_tracks else range(n_tracks)
+    tracks = [
+        Track(
+            id=f"track{i:07d}",
+            name=f"Song {i}",
+            artist=f"Artist {cover}",
+            album_name=f"Album {cover}",
+            album_art_url=f"https://example.com/cover{cover:07d}.jpg",
+        )
+        for i, cover in enumerate(covers)
+    ]
+    return Playlist(
+        id="synthetic", name="Synthetic Playlist", description="Generated for benchmarking",
+        tracks=tracks)
+
+
+def synthetic_colour_data(playlist: Playlist, k: int = 3, seed: int = 0) -> list[ImageColourData]:
+    """Create random colour data for every track of a playlist."""
+    rng = np.random.default_rng(seed)
+    rgbs = rng.integers(0, 256, (len(playlist.tracks), k, 3))
+    hsvs = rgb_to_hsv(rgbs)
+    return [
+        ImageColourData(
+            track_id=track.id,
+            rgbs=[tuple(rgb) for rgb in track_rgbs],
+            hsvs=[tuple(hsv) for hsv in track_hsvs],
+            error=None,
+        )
+        for track, track_rgbs, track_hsvs in zip(playlist.tracks, rgbs.tolist(), hsvs.tolist())
+    ]
+
+
+def benchmark_pipeline(
+    work_dir: Path,
+    images: int = 100,
+    tracks: int = 10_000,
+    k: int = 3,
+    repeat: int = 3,
+    image_size: int = 640,
+    seed: int = 0,
+) -> list[StageTiming]:
+    """Time each stage of the image -> colour -> sort pipeline on synthetic data.
+
+    The image stages (decode, k-means, HSV conversion) run on `images`
+    synthetic covers. The data stages (JSON dump and load, sorting) run on a
+    synthetic playlist of `tracks` tracks with random colour data, so they can
+    be sized independently of the slower image stages.
+
+    Args:
+        work_dir: Existing directory for the generated files
+        images: Number of synthetic cover images
+        tracks: Number of tracks in the synthetic playlist
+        k: Number of dominant colours to extract per image
+        repeat: Number of times each stage is run; the best time is reported
+        image_size: Width and height of the synthetic covers
+        seed: Seed for the synthetic data
+
+    Returns:
+        A StageTiming per stage, in pipeline order
+    """
+    rng = np.random.default_rng(seed)
+    file_paths = FilePaths(work_dir)
+    processor = ImageProcessor()
+
+    image_paths = []
+    for i in range(images):
+        path = work_dir / f"cover{i:07d}.jpg"
+        synthetic_cover(rng, image_size).save(path, "JPEG")
+        image_paths.append(path)
+
+    playlist = synthetic_playlist(tracks, seed=seed)
+    colour_data = synthetic_colour_data(playlist, k, seed)
+
+    def best_of(function) -> float:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    pixels = [processor.load_pixels(path) for path in image_paths]
+    clusters = [processor.engine.extract(image_pixels, k) for image_pixels in pixels]
+
+    def dump() -> None:
+        playlist.to_json(file_paths.playlist_path())
+        with ColourDataWriter(file_paths.image_colours_jsonl_path(), append=False) as writer:
+            for item in colour_data:
+                writer.write(item)
+
+    def load() -> None:
+        Playlist.from_json(file_paths.playlist_path())
+        for _ in iter_colour_data(file_paths.image_colours_jsonl_path()):
+            pass
+
+    timings = [
+        StageTiming("decode", images, best_of(
+            lambda: [processor.load_pixels(path) for path in image_paths])),
+        StageTiming("kmeans", images, best_of(
+            lambda: [processor.engine.extract(image_pixels, k) for image_pixels in pixels])),
+        StageTiming("hsv", images, best_of(
+            lambda: [processor.colours_from_clusters(*image_clusters)
+                     for image_clusters in clusters])),
+        StageTiming("json_dump", tracks, best_of(dump)),
+        StageTiming("json_load", tracks, best_of(load)),
+        StageTiming("sort", tracks, best_of(lambda: sort_playlist_by_hue(file_paths))),
+    ]
+    return timings
+
+
+@dataclass
+class LoadTestResult:
+    tracks: int
+    playlist_seconds: float
+    # Unique covers downloaded, and how many of them failed
+    images: int
+    image_errors: int
+    download_seconds: float
+    # Requests the server answered, and how many of them it throttled or failed
+    requests: int
+    throttled: int
+    server_errors: int
+    # Concurrency the client's scheduler settled at
+    final_concurrency: int
+
+    @property
+    def tracks_per_second(self) -> float:
+        return self.tracks / self.playlist_seconds if self.playlist_seconds else 0.0
+
+    @property
+    def images_per_second(self) -> float:
+        return self.images / self.download_seconds if self.download_seconds else 0.0
+
+
+def load_test_client(
+    work_dir: Path,
+    tracks: int = 2000,
+    covers: int | None = 500,
+    concurrency: int = 8,
+    min_image_size: int | None = 100,
+    latency: float = 0.02,
+    page_size: int = 100,
+    error_rate: float = 0.0,
+    throttle_rate: float = 0.0,
+    retry_after: float = 0.1,
+    seed: int = 0,
+) -> LoadTestResult:
+    """Load test SpotifyClient against a local stand-in server (see fake_spotify).
+
+    Fetches a synthetic playlist and downloads its unique covers over real
+    HTTP, so download concurrency and retry changes can be measured offline.
+
+    Args:
+        work_dir: Directory the covers are downloaded to
+        tracks: Number of tracks in the playlist
+        covers: Number of distinct album covers (default: one per track)
+        concurrency: Maximum number of requests in flight
+        min_image_size: Cover variant to download (see Track.image_url)
+        latency: Seconds every response of the server is delayed by
+        page_size: The server's maximum number of tracks per page
+        error_rate: Fraction of requests the server answers with HTTP 500
+        throttle_rate: Fraction of requests the server answers with HTTP 429
+        retry_after: Retry-After of throttled responses, in seconds
+        seed: Seed for the synthetic playlist, covers and injected errors
+
+    Returns:
+        LoadTestResult with the throughput of the playlist fetch and the downloads
+    """
+    # Imported here, as the fake server builds on the synthetic data above
+    from chromalist.fake_spotify import FakeSpotifyServer
+    from chromalist.spotify_client import SpotifyClient
+
+    with FakeSpotifyServer(
+        latency=latency, page_size=page_size, error_rate=error_rate,
+        throttle_rate=throttle_rate, retry_after=retry_after, seed=seed,
+    ) as server:
+        server.add_playlist("loadtest", tracks, covers, seed)
+        client = SpotifyClient(
+            max_connections=concurrency, api_url=server.api_url, access_token="loadtest")
+
+        start = time.perf_counter()
+        playlist = client.get_playlist("loadtest", concurrency=concurrency)
+        playlist_seconds = time.perf_counter() - start
+
+        downloads = [
+            (group[0].id, group[0].image_url(min_image_size))
+            for group in playlist.cover_groups()
+        ]
+        start = time.perf_counter()
+        image_errors = sum(
+            error is not None
+            for _, error in client.download_album_arts(
+                downloads, FilePaths(work_dir), concurrency))
+        download_seconds = time.perf_counter() - start
+
+        return LoadTestResult(
+            tracks=len(playlist.tracks),
+            playlist_seconds=playlist_seconds,
+            images=len(downloads),
+            image_errors=image_errors,
+            download_seconds=download_seconds,
+            requests=server.requests,
+            throttled=server.throttled,
+            server_errors=server.errors,
+            final_concurrency=client.scheduler.concurrency,
+        )
+
+
+def benchmark_environment() -> dict[str, Any]:
+    """Describe the machine the benchmark runs on, for the baseline file."""
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save_baseline(
+    timings: list[StageTiming], path: Path, config: dict[str, Any] | None = None
+) -> None:
+    """Save benchmark timings as a JSON baseline.
+
+    Args:
+        timings: Stage timings from benchmark_pipeline
+        path: Path of the baseline file
+        config: Benchmark parameters, recorded for reference
+    """
+    baseline = {
+        "environment": benchmark_environment(),
+        "config": config or {},
+        "stages": [asdict(timing) for timing in timings],
+    }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2)
+
+
+def load_baseline(path: Path) -> list[StageTiming]:
+    """Load the stage timings from a JSON baseline."""
+    with open(path, "r") as f:
+        baseline = json.load(f)
+    return [StageTiming(**stage) for stage in baseline["stages"]]
+
+
+def find_regressions(
+    timings: list[StageTiming], baseline: list[StageTiming], tolerance: float = 0.2
+) -> list[Regression]:
+    """Find the stages that are slower than the baseline by more than the tolerance.
+
+    Stages are compared on time per item, so baselines recorded with a
+    different number of images or tracks can still be compared.
+
+    Args:
+        timings: Current stage timings
+        baseline: Baseline stage timings
+        tolerance: Allowed slowdown, e.g. 0.2 for 20%
+
+    Returns:
+        A Regression for each stage over the tolerance
+    """
+    baseline_by_stage = {timing.stage: timing for timing in baseline}
+    regressions = []
+    for timing in timings:
+        reference = baseline_by_stage.get(timing.stage)
+        if reference is None or reference.items == 0 or timing.items == 0:
+            continue
+        # Scale the baseline to the current number of items
+        baseline_seconds = reference.seconds / reference.items * timing.items
+        if timing.seconds > baseline_seconds * (1 + tolerance):
+            regressions.append(Regression(timing.stage, baseline_seconds, timing.seconds))
+    return regressions
@@ -0,0 +1,358 @@
+"""SQLite catalog of tracks, album covers and colours, shared across playlists.
+
+Every output directory otherwise holds its own playlist, covers and colour
+data, so tracks that are on several playlists are downloaded and processed
+once per playlist. A catalog is a single indexed database that the commands
+can share:
+
+- tracks, and the playlists they are on
+- album cover images, stored once by the SHA-256 hash of their content and
+  found by the URL they were downloaded from
+- colour extraction results, by cover hash and extraction parameters
+
+The catalog is a ColourCache whose keys start with the cover hash, so it can
+be used wherever a colour cache is accepted.
+"""
+
+import hashlib
+import json
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+from chromalist.colour_cache import ColourCache
+from chromalist.files import FilePaths
+from chromalist.image_pack import ImagePack
+from chromalist.models import AlbumImage, Playlist, Track
+
+# Maximum number of parameters per query (SQLite's default limit is 999)
+QUERY_CHUNK_SIZE = 500
+
+
+def cover_hash(image_bytes: bytes) -> str:
+    """Hash identifying the content of a cover image."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def colour_key(digest: str, k: int, image_size: int, algorithm: str) -> str:
+    """Colour result key for a cover hash and the extraction parameters (see Catalog.key)."""
+    return f"{digest}|k={k}|size={image_size}|algorithm={algorithm}"
+
+
+class Catalog(ColourCache):
+    """Catalog of tracks, covers and colour results in a SQLite database."""
+
+    def __init__(
+        self,
+        path: Path,
+        max_entries: int | None = None,
+        max_age_days: float | None = None,
+    ):
+        """Open (or create) the catalog database.
+
+        Args:
+            path: Path to the SQLite database file
+            max_entries: Maximum number of colour results to keep (None for no limit)
+            max_age_days: Maximum age of colour results in days (None for no limit)
+        """
+        super().__init__(path, max_entries, max_age_days)
+        # Cover hashes of the track images stored by add_track_images, so
+        # the images aren't read and hashed again for track_key
+        self.track_image_hashes: dict[str, str] = {}
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tracks (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                artist TEXT NOT NULL,
+                album_name TEXT NOT NULL,
+                album_art_url TEXT NOT NULL,
+                album_images TEXT NOT NULL,
+                cover_hash TEXT
+            );
+            CREATE INDEX IF NOT EXISTS tracks_cover_hash ON tracks (cover_hash);
+
+            CREATE TABLE IF NOT EXISTS covers (
+                hash TEXT PRIMARY KEY,
+                image BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS cover_urls (
+                url TEXT PRIMARY KEY,
+                hash TEXT NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS playlists (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                description TEXT NOT NULL,
+                snapshot_id TEXT
+            );
+            CREATE TABLE IF NOT EXISTS playlist_tracks (
+                playlist_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                track_id TEXT NOT NULL,
+                PRIMARY KEY (playlist_id, position)
+            );
+            CREATE INDEX IF NOT EXISTS playlist_tracks_track_id
+                ON playlist_tracks (track_id);
+            """
+        )
+        self.db.commit()
+
+    @staticmethod
+    def key(image_bytes: bytes, k: int, image_size: int, algorithm: str) -> str:
+        """Compute the colour result key for an image and the extraction parameters.
+
+        Unlike ColourCache.key, the key starts with the cover hash, so the
+        results for a cover can be looked up without the image.
+
+        Args:
+            image_bytes: Content of the image file
+            k: Number of dominant colours extracted
+            image_size: Size the image is resized to before extraction
+            algorithm: Name of the extraction algorithm
+
+        Returns:
+            Key of the form "{cover hash}|k={k}|size={image_size}|algorithm={algorithm}"
+        """
+        return colour_key(cover_hash(image_bytes), k, image_size, algorithm)
+
+    def track_key(
+        self,
+        track_id: str,
+        read_image: Callable[[], bytes],
+        k: int,
+        image_size: int,
+        algorithm: str,
+    ) -> str:
+        """Compute the colour result key for the image of a track.
+
+        The image is only read and hashed if add_track_images didn't store it.
+        """
+        digest = self.track_image_hashes.get(track_id)
+        if digest is None:
+            return super().track_key(track_id, read_image, k, image_size, algorithm)
+        return colour_key(digest, k, image_size, algorithm)
+
+    def add_playlist(self, playlist: Playlist) -> None:
+        """Add or update a playlist and its tracks.
+
+        The cover recorded for a track is kept, unless its album art URL changed.
+
+        Args:
+            playlist: Playlist to store
+        """
+        self.db.executemany(
+            """
+            INSERT INTO tracks (id, name, artist, album_name, album_art_url, album_images)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                name = excluded.name,
+                artist = excluded.artist,
+                album_name = excluded.album_name,
+                album_images = excluded.album_images,
+                cover_hash = CASE WHEN album_art_url = excluded.album_art_url
+                                  THEN cover_hash END,
+                album_art_url = excluded.album_art_url
+            """,
+            (
+                (track.id, track.name, track.artist, track.album_name,
+                 track.album_art_url, json.dumps([
+                     [image.url, image.width, image.height]
+                     for image in track.album_images
+                 ]))
+                for track in playlist.tracks
+            ),
+        )
+        self.db.execute(
+            "INSERT OR REPLACE INTO playlists (id, name, description, snapshot_id) "
+            "VALUES (?, ?, ?, ?)",
+            (playlist.id, playlist.name, playlist.description, playlist.snapshot_id),
+        )
+        self.db.execute("DELETE FROM playlist_tracks WHERE playlist_id = ?", (playlist.id,))
+        self.db.executemany(
+            "INSERT INTO playlist_tracks (playlist_id, position, track_id) VALUES (?, ?, ?)",
+            ((playlist.id, position, track.id) for position, track in enumerate(playlist.tracks)),
+        )
+        self.db.commit()
+
+    def get_playlist(self, playlist_id: str) -> Playlist | None:
+        """Load a playlist stored with add_playlist.
+
+        Args:
+            playlist_id: ID of the playlist
+
+        Returns:
+            The playlist, or None if it isn't in the catalog
+        """
+        row = self.db.execute(
+            "SELECT name, description, snapshot_id FROM playlists WHERE id = ?",
+            (playlist_id,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        tracks = [
+            Track(
+                id=track_id, name=name, artist=artist, album_name=album_name,
+                album_art_url=album_art_url,
+                album_images=[AlbumImage(*image) for image in json.loads(album_images)],
+            )
+            for track_id, name, artist, album_name, album_art_url, album_images in self.db.execute(
+                "SELECT t.id, t.name, t.artist, t.album_name, t.album_art_url, t.album_images "
+                "FROM playlist_tracks p JOIN tracks t ON t.id = p.track_id "
+                "WHERE p.playlist_id = ? ORDER BY p.position",
+                (playlist_id,),
+            )
+        ]
+        name, description, snapshot_id = row
+        return Playlist(id=playlist_id, name=name, description=description,
+                        tracks=tracks, snapshot_id=snapshot_id)
+
+    def playlists_with_track(self, track_id: str) -> list[str]:
+        """IDs of the playlists in the catalog that contain a track."""
+        return [
+            playlist_id for (playlist_id,) in self.db.execute(
+                "SELECT DISTINCT playlist_id FROM playlist_tracks WHERE track_id = ? "
+                "ORDER BY playlist_id",
+                (track_id,),
+            )
+        ]
+
+    def cover(self, url: str) -> bytes | None:
+        """Look up a cover image by the URL it was downloaded from.
+
+        Args:
+            url: Image URL
+
+        Returns:
+            The image content, or None if the cover isn't in the catalog
+        """
+        row = self.db.execute(
+            "SELECT c.image FROM cover_urls u JOIN covers c ON c.hash = u.hash "
+            "WHERE u.url = ?",
+            (url,),
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def add_cover(
+        self, image_bytes: bytes, track_ids: Iterable[str], url: str | None = None
+    ) -> str:
+        """Store a cover image and record it as the cover of tracks.
+
+        Like ColourCache.put, this doesn't commit: the cover is committed
+        with the next commit, at the latest when the catalog is closed.
+
+        Args:
+            image_bytes: Content of the image
+            track_ids: IDs of the tracks with this cover (tracks not in the
+                       catalog are ignored)
+            url: URL the image was downloaded from, so later downloads of it
+                 can be skipped (see Catalog.cover)
+
+        Returns:
+            The cover hash
+        """
+        digest = cover_hash(image_bytes)
+        self.db.execute(
+            "INSERT OR IGNORE INTO covers (hash, image) VALUES (?, ?)", (digest, image_bytes))
+        self.db.executemany(
+            "UPDATE tracks SET cover_hash = ? WHERE id = ?",
+            ((digest, track_id) for track_id in track_ids),
+        )
+        if url is not None:
+            self.db.execute(
+                "INSERT OR REPLACE INTO cover_urls (url, hash) VALUES (?, ?)", (url, digest))
+        return digest
+
+    def add_track_images(
+        self, file_paths: FilePaths, tracks: Iterable[Track], images: ImagePack | None = None
+    ) -> int:
+        """Store the {track-id}.jpg images of tracks as their covers.
+
+        All images are stored in a single transaction, read one at a time.
+        Their hashes are kept for track_key, so looking up their colours
+        doesn't read and hash them again.
+
+        Args:
+            file_paths: FilePaths instance for managing paths
+            tracks: Tracks whose images to store (missing images are skipped)
+            images: If given, the images are read from this pack instead
+
+        Returns:
+            Number of images stored
+        """
+        seen: set[str] = set()
+        track_covers: list[tuple[str, str]] = []
+
+        def new_covers() -> Iterator[tuple[str, bytes]]:
+            # Read one image at a time, so only the current one is in memory
+            for track in tracks:
+                if images is not None:
+                    image_bytes = images.get(track.id)
+                    if image_bytes is None:
+                        continue
+                else:
+                    try:
+                        image_bytes = file_paths.track_image_path(track.id).read_bytes()
+                    except OSError:
+                        continue
+                digest = cover_hash(image_bytes)
+                track_covers.append((digest, track.id))
+                self.track_image_hashes[track.id] = digest
+                if digest not in seen:
+                    seen.add(digest)
+                    yield digest, image_bytes
+
+        self.db.executemany(
+            "INSERT OR IGNORE INTO covers (hash, image) VALUES (?, ?)", new_covers())
+        self.db.executemany("UPDATE tracks SET cover_hash = ? WHERE id = ?", track_covers)
+        self.db.commit()
+        return len(track_covers)
+
+    def colour_data(
+        self, tracks: Iterable[Track], k: int, image_size: int, algorithm: str
+    ) -> Iterator[dict[str, Any]]:
+        """Look up the colour results of the covers of tracks.
+
+        Only results extracted with the given parameters are used (see
+        Catalog.key). Tracks without a recorded cover, or whose cover has no
+        such result, are left out.
+
+        Args:
+            tracks: Tracks to look up
+            k: Number of dominant colours extracted
+            image_size: Size the images were resized to before extraction
+            algorithm: Name of the extraction algorithm
+
+        Yields:
+            ImageColourData dicts, in track order
+        """
+        track_ids = [track.id for track in tracks]
+        cover_hashes: dict[str, str] = {}
+        for start in range(0, len(track_ids), QUERY_CHUNK_SIZE):
+            chunk = track_ids[start:start + QUERY_CHUNK_SIZE]
+            cover_hashes.update(self.db.execute(
+                f"SELECT id, cover_hash FROM tracks WHERE cover_hash IS NOT NULL "
+                f"AND id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ))
+
+        results: dict[str, tuple[str, str] | None] = {}
+        for track_id in track_ids:
+            digest = cover_hashes.get(track_id)
+            if digest is None:
+                continue
+            if digest not in results:
+                results[digest] = self.db.execute(
+                    "SELECT rgbs, hsvs FROM colours WHERE key = ?",
+                    (colour_key(digest, k, image_size, algorithm),),
+                ).fetchone()
+            result = results[digest]
+            if result is not None:
+                yield {
+                    "track_id": track_id,
+                    "rgbs": json.loads(result[0]),
+                    "hsvs": json.loads(result[1]),
+                    "error": None,
+                }
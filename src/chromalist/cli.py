@@ -1,15 +1,36 @@
+import os
+import sys
+import time
+from collections.abc import Callable
+from enum import Enum
 from pathlib import Path
 
 import typer
 from typing_extensions import Annotated
 
+from chromalist.catalog import Catalog
+from chromalist.colour_cache import ColourCache
+from chromalist.colour_engines import ENGINES
 from chromalist.files import FilePaths
+from chromalist.image_pack import ImagePack, open_image_pack
 from chromalist.image_processing import ImageProcessor
-from chromalist.models import Playlist
+from chromalist.manifest import Manifest
+from chromalist.models import Playlist, Track
+from chromalist.playlist_sorting import ACHROMATIC_SATURATION_THRESHOLD, SortMode, TieBreaker
 from chromalist.spotify_client import SpotifyClient
 
 app = typer.Typer()
 
+
+class ColourFormat(str, Enum):
+    jsonl = "jsonl"
+    json = "json"
+    binary = "binary"
+
+
+# Choice of colour extraction engines for the command line
+EngineName = Enum("EngineName", {name: name for name in ENGINES}, type=str)
+
 # Global option for output directory
 output_dir_option = Annotated[
     Path,
@@ -21,53 +42,293 @@ output_dir_option = Annotated[
 ]
 
 
+# Option for the catalog shared across playlists
+catalog_option = Annotated[
+    Path | None,
+    typer.Option(
+        "--catalog",
+        help="SQLite catalog of tracks, covers and colours shared across playlists",
+    ),
+]
+
+
+def validate_environment() -> None:
+    """Validate that required Spotify environment variables are set.
+
+    Only the commands that talk to Spotify need them; the others run offline.
+
+    Raises:
+        SystemExit: If required environment variables are missing.
+    """
+    required_vars = [
+        "SPOTIPY_CLIENT_ID",
+        "SPOTIPY_CLIENT_SECRET",
+        "SPOTIPY_REDIRECT_URI",
+    ]
+
+    missing_vars = [var for var in required_vars if not os.getenv(var)]
+
+    if missing_vars:
+        print(
+            "\n❌ ERROR: Missing required Spotify environment variables:\n", file=sys.stderr)
+        for var in missing_vars:
+            print(f"  - {var}", file=sys.stderr)
+
+        print("\n📚 Setup Instructions:", file=sys.stderr)
+        print("  1. Create a Spotify application at: https://developer.spotify.com/dashboard", file=sys.stderr)
+        print("  2. Set the following environment variables:", file=sys.stderr)
+        print("     export SPOTIPY_CLIENT_ID='your_client_id'", file=sys.stderr)
+        print("     export SPOTIPY_CLIENT_SECRET='your_client_secret'", file=sys.stderr)
+        print("     export SPOTIPY_REDIRECT_URI='https://127.0.0.1:3000/callback'", file=sys.stderr)
+        print(
+            "\n  Alternatively, create a .env file with these variables.\n", file=sys.stderr)
+        sys.exit(1)
+
+
+
 @app.command()
 def get_playlist(
     playlist_id: Annotated[str, typer.Argument(help="Spotify playlist ID or URI")],
     output_dir: output_dir_option = Path("tmp"),
+    concurrency: Annotated[int, typer.Option(
+        min=1,
+        help="Maximum number of album covers downloaded at the same time")] = 8,
+    min_image_size: Annotated[int | None, typer.Option(
+        min=1,
+        help="Download the smallest cover variant at least this many pixels wide "
+             "(default: the largest variant)")] = None,
+    force: Annotated[bool, typer.Option(
+        help="Download the whole playlist and all covers, even if it is unchanged")] = False,
+    catalog_path: catalog_option = None,
+    pack: Annotated[bool, typer.Option(
+        help="Store the covers in one packed file (covers.pack) instead of a "
+             "JPEG per track")] = False,
 ) -> None:
     """Download a playlist and its album cover images from Spotify.
 
     Downloads playlist metadata to playlist.json and album covers as {track-id}.jpg
-    in the output directory.
+    in the output directory. If the playlist was downloaded before, nothing is
+    done when it is unchanged, and only the covers of added tracks are downloaded
+    when it has changed. With --catalog, the playlist and covers are added to the
+    catalog, and covers already in it are not downloaded again. With --pack (or
+    if the covers were packed before), the covers are appended to covers.pack.
     """
+    validate_environment()
+
     # Create output directory if it doesn't exist
     output_dir.mkdir(parents=True, exist_ok=True)
     file_paths = FilePaths(output_dir)
+    playlist_file = file_paths.playlist_path()
+
+    previous = None
+    if not force and playlist_file.exists():
+        previous = Playlist.from_json(playlist_file)
 
     typer.echo(f"📡 Fetching playlist: {playlist_id}")
 
-    # Initialize Spotify client and fetch playlist
+    # Initialize Spotify client and fetch playlist, unless the stored copy
+    # is still the current snapshot
+    unchanged = False
     try:
-        client = SpotifyClient()
-        playlist = client.get_playlist(playlist_id)
+        client = SpotifyClient(max_connections=concurrency)
+        if previous is not None and previous.snapshot_id is not None:
+            current_id, snapshot_id = client.get_playlist_snapshot(playlist_id)
+            if current_id != previous.id:
+                # The output directory holds another playlist
+                previous = None
+            else:
+                unchanged = snapshot_id == previous.snapshot_id
+        playlist = previous if unchanged else client.get_playlist(playlist_id)
     except Exception as e:
         typer.echo(f"❌ Error fetching playlist: {e}", err=True)
         raise typer.Exit(code=1)
 
+    images = open_image_pack(file_paths)
+    if images is None and pack:
+        images = ImagePack.for_output_dir(file_paths)
+
+    # Only tracks that are new, or whose cover is missing (e.g. a failed
+    # download), need a cover
+    if unchanged:
+        added_ids = set()
+    elif previous is not None:
+        diff = playlist.diff(previous)
+        added_ids = {track.id for track in diff.added}
+        # Packs are append-only; the covers of removed tracks stay in them
+        if images is None:
+            for track in diff.removed:
+                file_paths.track_image_path(track.id).unlink(missing_ok=True)
+    else:
+        added_ids = {track.id for track in playlist.tracks}
+
+    def has_cover(track: Track) -> bool:
+        if images is not None:
+            return track.id in images
+        return file_paths.track_image_path(track.id).exists()
+
+    def needs_cover(track: Track) -> bool:
+        return bool(track.album_art_url) and (
+            track.id in added_ids or not has_cover(track))
+
+    if unchanged:
+        missing_count = sum(1 for track in playlist.tracks if needs_cover(track))
+        if not missing_count:
+            if images is not None:
+                images.close()
+            if catalog_path is not None:
+                with Catalog(catalog_path) as catalog:
+                    catalog.add_playlist(playlist)
+            typer.echo(
+                f"✅ Playlist '{playlist.name}' is unchanged "
+                f"(snapshot {playlist.snapshot_id}), nothing to do")
+            return
+        typer.echo(
+            f"✅ Playlist '{playlist.name}' is unchanged, "
+            f"but {missing_count} track(s) are missing their cover")
+    else:
+        typer.echo(
+            f"✅ Found playlist: '{playlist.name}' with {len(playlist.tracks)} tracks")
+        if previous is not None:
+            typer.echo(
+                f"🔄 Playlist changed: {len(diff.added)} track(s) added, "
+                f"{len(diff.removed)} removed")
+
+        # Save playlist metadata
+        playlist.to_json(playlist_file)
+        typer.echo(f"💾 Saved playlist metadata to {playlist_file}")
+
+    catalog = Catalog(catalog_path) if catalog_path is not None else None
+    manifest = Manifest.for_output_dir(file_paths)
+    try:
+        if catalog is not None:
+            catalog.add_playlist(playlist)
+        downloaded = _download_covers(
+            client, playlist, file_paths, needs_cover, min_image_size, concurrency, catalog,
+            images, manifest)
+    finally:
+        manifest.close()
+        if catalog is not None:
+            catalog.close()
+        if images is not None:
+            images.close()
+
+    if client.scheduler.throttled:
+        typer.echo(
+            f"\n🚦 Spotify throttled {client.scheduler.throttled} request(s); "
+            f"settled at {client.scheduler.concurrency} request(s) in flight")
+
     typer.echo(
-        f"✅ Found playlist: '{playlist.name}' with {len(playlist.tracks)} tracks")
+        f"\n✅ Done! Downloaded {downloaded} album covers for "
+        f"{len(playlist.tracks)} tracks to {output_dir}")
 
-    # Save playlist metadata
-    playlist_file = file_paths.playlist_path()
-    playlist.to_json(playlist_file)
-    typer.echo(f"💾 Saved playlist metadata to {playlist_file}")
 
-    # Download album art for each track
+def _download_covers(
+    client: SpotifyClient,
+    playlist: Playlist,
+    file_paths: FilePaths,
+    needs_cover: Callable[[Track], bool],
+    min_image_size: int | None,
+    concurrency: int,
+    catalog: Catalog | None,
+    images: ImagePack | None,
+    manifest: Manifest,
+) -> int:
+    """Download the covers get-playlist needs, sharing them between tracks.
+
+    The covers are saved as files, or appended to the images pack if given,
+    and recorded in the manifest.
+
+    Returns:
+        Number of covers downloaded and saved
+    """
+    def share(source_track_id: str, track_id: str) -> None:
+        if images is not None:
+            images.alias(source_track_id, track_id)
+        else:
+            file_paths.share_track_image(source_track_id, track_id)
+        manifest.share(source_track_id, track_id)
+
+    def save(track_id: str, image_bytes: bytes) -> None:
+        if images is not None:
+            images.add(track_id, image_bytes)
+        else:
+            file_paths.save_track_image(track_id, image_bytes)
+        saved(track_id, image_bytes)
+
+    def saved(track_id: str, image_bytes: bytes | memoryview) -> None:
+        mtime = time.time() if images is not None else (
+            file_paths.track_image_path(track_id).stat().st_mtime)
+        manifest.record(track_id, image_bytes, mtime)
+
+    def load(track_id: str) -> bytes | memoryview:
+        if images is not None:
+            return images.get(track_id)
+        return file_paths.track_image_path(track_id).read_bytes()
+
+    # Download album art once per unique cover (several at a time), and share
+    # it with the other tracks on the same album. Covers already downloaded
+    # for another track are shared without downloading them again, and so
+    # are covers found in the catalog.
     typer.echo("\n🖼️  Downloading album cover art...")
+    cover_groups = {}
+    from_catalog = 0
+    for tracks in playlist.cover_groups():
+        missing = [track for track in tracks if needs_cover(track)]
+        if not missing:
+            continue
+        existing = [track for track in tracks if not needs_cover(track)]
+        if existing:
+            for track in missing:
+                share(existing[0].id, track.id)
+            continue
+        image_url = missing[0].image_url(min_image_size)
+        image_bytes = catalog.cover(image_url) if catalog is not None else None
+        if image_bytes is not None:
+            save(missing[0].id, image_bytes)
+            for track in missing[1:]:
+                share(missing[0].id, track.id)
+            catalog.add_cover(image_bytes, [track.id for track in tracks], image_url)
+            from_catalog += 1
+            continue
+        cover_groups[missing[0].id] = missing
 
-    with typer.progressbar(playlist.tracks, label="Downloading") as progress:
-        for track in progress:
-            if track.album_art_url:
+    if from_catalog:
+        typer.echo(f"📚 Found {from_catalog} cover(s) in the catalog")
+
+    downloads = [
+        (track_id, tracks[0].image_url(min_image_size))
+        for track_id, tracks in cover_groups.items()
+    ]
+
+    downloaded = 0
+    with typer.progressbar(length=len(downloads), label="Downloading") as progress:
+        for track_id, error in client.download_album_arts(
+                downloads, file_paths, concurrency, images):
+            tracks = cover_groups[track_id]
+            if error is None:
                 try:
-                    client.download_album_art(
-                        track.id, track.album_art_url, file_paths)
+                    image_bytes = load(track_id)
+                    saved(track_id, image_bytes)
+                    for other_track in tracks[1:]:
+                        share(track_id, other_track.id)
+                    if catalog is not None:
+                        catalog.add_cover(
+                            image_bytes,
+                            [track.id for track in tracks],
+                            tracks[0].image_url(min_image_size),
+                        )
+                    downloaded += 1
                 except Exception as e:
+                    error = e
+            if error is not None:
+                # Every track sharing the cover is left without an image
+                for track in tracks:
                     typer.echo(
-                        f"\n⚠️  Warning: Failed to download art for '{track.name}': {e}", err=True)
+                        f"\n⚠️  Warning: Failed to download art for '{track.name}': {error}",
+                        err=True)
+            progress.update(1)
 
-    typer.echo(
-        f"\n✅ Done! Downloaded {len(playlist.tracks)} album covers to {output_dir}")
+    return downloaded
 
 
 @app.command()
@@ -75,13 +336,56 @@ def process_images(
     output_dir: output_dir_option = Path("tmp"),
     k: Annotated[int, typer.Option(
         help="Number of dominant colours to extract per image")] = 3,
+    engine: Annotated[EngineName, typer.Option(
+        help="Colour extraction engine")] = EngineName.kmeans,
+    fast_decode: Annotated[bool, typer.Option(
+        help="Decode JPEGs at reduced resolution (faster, slight colour drift)")] = False,
+    workers: Annotated[int | None, typer.Option(
+        min=1,
+        help="Number of worker processes (default: CPU count)")] = None,
+    batch_size: Annotated[int, typer.Option(
+        min=1,
+        help="Number of images to cluster together with the batched k-means")] = 1,
+    cache: Annotated[bool, typer.Option(
+        help="Reuse colours of unchanged images from the colour cache")] = True,
+    cache_path: Annotated[Path | None, typer.Option(
+        help="Colour cache database (default: colour-cache.sqlite in the output directory)")] = None,
+    cache_max_entries: Annotated[int | None, typer.Option(
+        min=1,
+        help="Evict the least recently used cache entries beyond this number")] = None,
+    cache_max_age: Annotated[float | None, typer.Option(
+        min=0,
+        help="Evict cache entries older than this number of days")] = None,
+    output_format: Annotated[ColourFormat, typer.Option(
+        "--format",
+        help="Colour data format: streamed JSON Lines (image-colours.jsonl), "
+             "a single JSON document (image-colours.json) or a memory-mappable "
+             "NumPy array (image-colours.npy)")] = ColourFormat.jsonl,
+    resume: Annotated[bool, typer.Option(
+        help="Skip tracks already recorded in image-colours.jsonl with the same "
+             "extraction parameters")] = True,
+    catalog_path: catalog_option = None,
 ) -> None:
     """Process images to extract dominant colours.
 
-    Reads images from output directory and writes colour data to image-colours.json.
+    Reads images from output directory and writes colour data to image-colours.jsonl
+    (or image-colours.json with --format json, image-colours.npy with --format
+    binary). Images are processed in parallel
+    across a pool of worker processes. JSON Lines results are appended as they
+    are produced, so an interrupted run picks up where it left off, and covers
+    get-playlist has replaced since (see manifest.jsonl) are processed again. With
+    --catalog, the catalog is used as the colour cache, and the playlist and
+    its covers are added to it.
     """
     import json
 
+    from chromalist.colour_store import (
+        ColourDataWriter,
+        processed_track_ids,
+        read_parameters,
+        write_colour_array,
+    )
+
     typer.echo(f"🔮 Processing images in {output_dir}...")
 
     # Validate output directory exists
@@ -103,56 +407,378 @@ def process_images(
         )
 
     playlist = Playlist.from_json(playlist_path)
-    processor = ImageProcessor()
+    processor = ImageProcessor(engine.value, fast_decode=fast_decode)
+
+    # The manifest written by get-playlist tells which covers have changed
+    # since they were processed
+    manifest = None
+    if file_paths.manifest_path().exists():
+        manifest = Manifest.for_output_dir(file_paths)
+
+    # Skip the tracks a previous (interrupted) run has already processed
+    output_file = file_paths.image_colours_path()
+    if output_format == ColourFormat.binary:
+        output_file = file_paths.image_colours_binary_path()
+    tracks = playlist.tracks
+    parameters = processor.extraction_parameters(k, batch_size)
+    if output_format == ColourFormat.jsonl:
+        output_file = file_paths.image_colours_jsonl_path()
+        if resume and output_file.exists() and read_parameters(output_file) != parameters:
+            # The recorded colours were extracted differently: start over
+            typer.echo(
+                f"🔁 {output_file.name} was written with other extraction parameters, "
+                "processing all tracks again")
+            resume = False
+        if resume:
+            done = processed_track_ids(output_file, parameters)
+            if manifest is not None:
+                changed = done & {
+                    track.id for track in manifest.changed(playlist.tracks, parameters)}
+                if changed:
+                    typer.echo(f"🔁 {len(changed)} cover(s) changed since they were processed")
+                done -= changed
+            tracks = [track for track in playlist.tracks if track.id not in done]
+            if done:
+                typer.echo(
+                    f"⏩ Resuming: {len(playlist.tracks) - len(tracks)} track(s) already processed")
 
-    # Validate all image files exist
-    processor.validate_files(file_paths, playlist)
+    # Images are read from the pack if the covers were packed (get-playlist --pack)
+    images = open_image_pack(file_paths)
 
-    # Process each track's image
+    # Process each track's image (results come back in playlist order).
+    # JSON Lines results are written as they come, JSON and binary results
+    # at the end.
     results = []
-    with typer.progressbar(playlist.tracks, label="Processing") as progress:
-        for track in progress:
-            try:
-                results.append(processor.process_track(file_paths, k, track))
-            except FileNotFoundError as e:
-                typer.echo(f"❌ Error: {e}", err=True)
-                raise typer.Exit(code=1)
-            except Exception as e:
-                typer.echo(f"❌ Error processing images: {e}", err=True)
-                raise typer.Exit(code=1)
-
-    # Count errors
-    error_count = sum(1 for r in results if r.error is not None)
-    success_count = len(results) - error_count
+    error_count = 0
+    colour_cache = None
+    writer = None
+    try:
+        # Validate all image files exist
+        processor.validate_files(
+            file_paths,
+            Playlist(id=playlist.id, name=playlist.name,
+                     description=playlist.description, tracks=tracks),
+            images,
+        )
+
+        if catalog_path is not None:
+            colour_cache = Catalog(
+                catalog_path, max_entries=cache_max_entries, max_age_days=cache_max_age)
+            colour_cache.add_playlist(playlist)
+            colour_cache.add_track_images(file_paths, tracks, images)
+        elif cache:
+            colour_cache = ColourCache(
+                cache_path or file_paths.colour_cache_path(),
+                max_entries=cache_max_entries,
+                max_age_days=cache_max_age,
+            )
+
+        if output_format == ColourFormat.jsonl:
+            writer = ColourDataWriter(output_file, append=resume, parameters=parameters)
+        with typer.progressbar(
+            processor.process_tracks(
+                file_paths, k, tracks, workers, batch_size, colour_cache, images),
+            length=len(tracks),
+            label="Processing",
+        ) as progress:
+            for result in progress:
+                if result.error is not None:
+                    error_count += 1
+                if writer is not None:
+                    writer.write(result)
+                    # Only results in the resumable JSON Lines file count
+                    # as processed
+                    if manifest is not None and result.error is None:
+                        manifest.mark_processed([result.track_id], parameters)
+                else:
+                    results.append(result)
+    except FileNotFoundError as e:
+        typer.echo(f"❌ Error: {e}", err=True)
+        raise typer.Exit(code=1)
+    except Exception as e:
+        typer.echo(f"❌ Error processing images: {e}", err=True)
+        raise typer.Exit(code=1)
+    finally:
+        if writer is not None:
+            writer.close()
+        if colour_cache is not None:
+            colour_cache.close()
+        if images is not None:
+            images.close()
+        if manifest is not None:
+            manifest.close()
+
+    if colour_cache is not None:
+        typer.echo(
+            f"🗃️  Colour cache: {colour_cache.hits} hit(s), {colour_cache.misses} miss(es) "
+            f"({colour_cache.hit_rate:.1%} hit rate)")
+
+    success_count = len(tracks) - error_count
 
     typer.echo(
-        f"✅ Successfully processed {success_count}/{len(results)} images")
+        f"✅ Successfully processed {success_count}/{len(tracks)} images")
     if error_count > 0:
         typer.echo(
-            f"⚠️  {error_count} image(s) had processing errors (see image-colours.json)")
+            f"⚠️  {error_count} image(s) had processing errors (see {output_file.name})")
 
-    # Save results to JSON
-    output_file = file_paths.image_colours_path()
+    if writer is not None:
+        typer.echo(f"💾 Saved colour data to {output_file}")
+        return
+
+    # Save results to JSON or the binary array
     try:
-        with open(output_file, "w") as f:
-            json.dump([r.to_dict() for r in results], f, indent=2)
+        if output_format == ColourFormat.binary:
+            write_colour_array(output_file, results, k)
+        else:
+            with open(output_file, "w") as f:
+                json.dump([r.to_dict() for r in results], f, indent=2)
         typer.echo(f"💾 Saved colour data to {output_file}")
     except Exception as e:
         typer.echo(f"❌ Error saving results to {output_file}: {e}", err=True)
         raise typer.Exit(code=1)
 
 
+@app.command()
+def benchmark_engines(
+    output_dir: output_dir_option = Path("tmp"),
+    k: Annotated[int, typer.Option(
+        help="Number of dominant colours to extract per image")] = 3,
+    engines: Annotated[list[EngineName] | None, typer.Option(
+        "--engine",
+        help="Engine to benchmark (repeat for several, default: all)")] = None,
+    limit: Annotated[int, typer.Option(
+        min=1,
+        help="Maximum number of images to benchmark on")] = 200,
+) -> None:
+    """Benchmark the colour extraction engines on the images in the output directory.
+
+    Reports images/sec and how often the dominant hue agrees with the k-means engine.
+    """
+    from chromalist.benchmarks import benchmark_engines as run_benchmark
+
+    image_paths = sorted(output_dir.glob("*.jpg"))[:limit]
+    if not image_paths:
+        typer.echo(f"❌ Error: No images found in {output_dir}", err=True)
+        typer.echo(
+            "Please run 'get-playlist' first to download images.", err=True)
+        raise typer.Exit(code=1)
+
+    typer.echo(f"⏱️  Benchmarking colour engines on {len(image_paths)} images...")
+    engine_names = [engine.value for engine in engines] if engines else list(ENGINES)
+    results = run_benchmark(image_paths, engine_names, k)
+
+    typer.echo(f"\n{'engine':<18} {'images/sec':>10} {'hue agreement':>14} {'mean Δhue':>10}")
+    for result in results:
+        typer.echo(
+            f"{result.engine:<18} {result.images_per_second:>10.1f} "
+            f"{result.hue_agreement:>14.1%} {result.mean_hue_difference:>9.1f}°")
+
+
+@app.command()
+def benchmark_decode(
+    output_dir: output_dir_option = Path("tmp"),
+    k: Annotated[int, typer.Option(
+        help="Number of dominant colours to extract per image")] = 3,
+    limit: Annotated[int, typer.Option(
+        min=1,
+        help="Maximum number of images to benchmark on")] = 200,
+) -> None:
+    """Compare the fast, reduced-resolution JPEG decode with the full decode.
+
+    Reports the per-image latency of both and the drift of the extracted colours.
+    """
+    from chromalist.benchmarks import compare_decode
+
+    image_paths = sorted(output_dir.glob("*.jpg"))[:limit]
+    if not image_paths:
+        typer.echo(f"❌ Error: No images found in {output_dir}", err=True)
+        typer.echo(
+            "Please run 'get-playlist' first to download images.", err=True)
+        raise typer.Exit(code=1)
+
+    typer.echo(f"⏱️  Comparing decode paths on {len(image_paths)} images...")
+    result = compare_decode(image_paths, k)
+
+    typer.echo(f"\nFull decode:                {result.full_ms:.2f} ms/image")
+    typer.echo(
+        f"Fast decode:                {result.fast_ms:.2f} ms/image "
+        f"({result.speedup:.1f}x faster)")
+    typer.echo(f"Mean pixel drift:           {result.mean_pixel_drift:.2f} (0-255)")
+    typer.echo(
+        f"Mean dominant colour drift: {result.mean_dominant_rgb_drift:.2f} (RGB distance)")
+    typer.echo(f"Mean dominant hue drift:    {result.mean_dominant_hue_drift:.2f}°")
+
+
+@app.command()
+def benchmark(
+    images: Annotated[int, typer.Option(
+        min=1,
+        help="Number of synthetic cover images for the image stages")] = 100,
+    tracks: Annotated[int, typer.Option(
+        min=1,
+        help="Number of tracks in the synthetic playlist for the JSON and sort stages")] = 10_000,
+    k: Annotated[int, typer.Option(
+        help="Number of dominant colours to extract per image")] = 3,
+    repeat: Annotated[int, typer.Option(
+        min=1,
+        help="Number of runs per stage (the best time is reported)")] = 3,
+    save_baseline: Annotated[Path | None, typer.Option(
+        help="Save the timings as a JSON baseline to this file")] = None,
+    baseline: Annotated[Path | None, typer.Option(
+        help="Compare the timings with this JSON baseline, failing on regressions")] = None,
+    tolerance: Annotated[float, typer.Option(
+        min=0,
+        help="Allowed slowdown per stage before it counts as a regression (0.2 = 20%)")] = 0.2,
+) -> None:
+    """Benchmark the image -> colour -> sort pipeline on synthetic data.
+
+    Runs offline: synthetic covers and playlists are generated in a temporary
+    directory. Times each stage (decode, k-means, HSV conversion, JSON dump and
+    load, sorting), and optionally saves or compares against a JSON baseline.
+    """
+    import tempfile
+
+    from chromalist import benchmarks
+
+    typer.echo(
+        f"⏱️  Benchmarking the pipeline with {images} images and {tracks} tracks...")
+    with tempfile.TemporaryDirectory() as work_dir:
+        timings = benchmarks.benchmark_pipeline(
+            Path(work_dir), images=images, tracks=tracks, k=k, repeat=repeat)
+
+    typer.echo(f"\n{'stage':<10} {'items':>8} {'seconds':>10} {'items/sec':>12}")
+    for timing in timings:
+        typer.echo(
+            f"{timing.stage:<10} {timing.items:>8} {timing.seconds:>10.4f} "
+            f"{timing.items_per_second:>12.1f}")
+
+    if save_baseline is not None:
+        benchmarks.save_baseline(
+            timings, save_baseline,
+            config={"images": images, "tracks": tracks, "k": k, "repeat": repeat})
+        typer.echo(f"\n💾 Saved baseline to {save_baseline}")
+
+    if baseline is not None:
+        regressions = benchmarks.find_regressions(
+            timings, benchmarks.load_baseline(baseline), tolerance)
+        if regressions:
+            typer.echo(f"\n❌ {len(regressions)} stage(s) slower than the baseline:", err=True)
+            for regression in regressions:
+                typer.echo(
+                    f"  - {regression.stage}: {regression.seconds:.4f}s vs "
+                    f"{regression.baseline_seconds:.4f}s ({regression.slowdown:.2f}x)", err=True)
+            raise typer.Exit(code=1)
+        typer.echo(f"\n✅ No regressions against {baseline} (tolerance {tolerance:.0%})")
+
+
+@app.command()
+def load_test(
+    tracks: Annotated[int, typer.Option(
+        min=1,
+        help="Number of tracks in the synthetic playlist")] = 2000,
+    covers: Annotated[int | None, typer.Option(
+        min=1,
+        help="Number of distinct album covers (default: one per track)")] = 500,
+    concurrency: Annotated[int, typer.Option(
+        min=1,
+        help="Maximum number of requests in flight")] = 8,
+    min_image_size: Annotated[int | None, typer.Option(
+        min=1,
+        help="Download the smallest cover variant at least this many pixels wide")] = 100,
+    latency: Annotated[float, typer.Option(
+        min=0,
+        help="Seconds every response of the stand-in server is delayed by")] = 0.02,
+    page_size: Annotated[int, typer.Option(
+        min=1,
+        help="Maximum number of tracks per page the server returns")] = 100,
+    error_rate: Annotated[float, typer.Option(
+        min=0, max=1,
+        help="Fraction of requests answered with HTTP 500")] = 0.0,
+    throttle_rate: Annotated[float, typer.Option(
+        min=0, max=1,
+        help="Fraction of requests answered with HTTP 429")] = 0.0,
+    retry_after: Annotated[float, typer.Option(
+        min=0,
+        help="Retry-After of throttled responses, in seconds")] = 0.1,
+) -> None:
+    """Load test the Spotify client against a local stand-in server.
+
+    Runs offline: a fake of the playlist, paging and image endpoints is
+    served on localhost. Reports tracks/sec for fetching the playlist and
+    images/sec for downloading the covers.
+    """
+    import logging
+    import tempfile
+
+    from chromalist.benchmarks import load_test_client
+
+    # spotipy logs every failed request; here the failures are injected on purpose
+    logging.getLogger("spotipy").setLevel(logging.CRITICAL)
+
+    typer.echo(
+        f"⏱️  Load testing with {tracks} tracks, {covers or tracks} covers "
+        f"and {concurrency} requests in flight...")
+    with tempfile.TemporaryDirectory() as work_dir:
+        result = load_test_client(
+            Path(work_dir), tracks=tracks, covers=covers, concurrency=concurrency,
+            min_image_size=min_image_size, latency=latency, page_size=page_size,
+            error_rate=error_rate, throttle_rate=throttle_rate, retry_after=retry_after)
+
+    typer.echo(
+        f"\nPlaylist:  {result.tracks} tracks in {result.playlist_seconds:.2f}s "
+        f"({result.tracks_per_second:.0f} tracks/sec)")
+    typer.echo(
+        f"Covers:    {result.images} images in {result.download_seconds:.2f}s "
+        f"({result.images_per_second:.1f} images/sec, {result.image_errors} failed)")
+    typer.echo(
+        f"Requests:  {result.requests} ({result.throttled} throttled, "
+        f"{result.server_errors} server errors), "
+        f"settled at {result.final_concurrency} in flight")
+
+
 @app.command()
 def generate_sorted_playlist(
     output_dir: output_dir_option = Path("tmp"),
+    catalog_path: catalog_option = None,
+    mode: Annotated[SortMode, typer.Option(
+        help="Sort by hue, or along a smooth gradient through OKLab colour space")] = SortMode.hue,
+    saturation_threshold: Annotated[float, typer.Option(
+        min=0, max=100,
+        help="Colours less saturated than this (in %) are sorted as greys, "
+             "by brightness")] = ACHROMATIC_SATURATION_THRESHOLD,
+    tie_breakers: Annotated[list[TieBreaker] | None, typer.Option(
+        "--tie-breaker",
+        help="Order of tracks with the same sort key (repeatable, in order of "
+             "precedence; default: playlist order)")] = None,
+    incremental: Annotated[bool, typer.Option(
+        help="Only place tracks added since the last run into the existing "
+             "sorted playlist, and take out removed ones")] = False,
+    k: Annotated[int, typer.Option(
+        help="Number of dominant colours extracted per image (with --catalog)")] = 3,
+    engine: Annotated[EngineName, typer.Option(
+        help="Colour extraction engine (with --catalog)")] = EngineName.kmeans,
+    fast_decode: Annotated[bool, typer.Option(
+        help="Whether JPEGs were decoded at reduced resolution (with --catalog)")] = False,
+    batch_size: Annotated[int, typer.Option(
+        min=1,
+        help="Number of images clustered together (with --catalog)")] = 1,
 ) -> None:
     """Generate a chromatically sorted playlist.
 
     Reads playlist.json and image-colours.json from output directory,
     sorts tracks by the hue of their dominant album cover colour,
-    and writes sorted-playlist.json.
+    and writes sorted-playlist.json. With --catalog, the colours are
+    looked up in the catalog instead, using the results extracted with the
+    given --k, --engine, --fast-decode and --batch-size. With --incremental, an existing
+    sorted-playlist.json is updated rather than sorted from scratch.
     """
-    from chromalist.playlist_sorting import sort_playlist_by_hue
+    from chromalist.playlist_sorting import sort_playlist_by_hue, update_sorted_playlist
+
+    if incremental and (mode != SortMode.hue or tie_breakers):
+        typer.echo(
+            "❌ Error: --incremental only works with --mode hue and without --tie-breaker",
+            err=True)
+        raise typer.Exit(code=1)
 
     typer.echo(f"🎨 Generating sorted playlist from {output_dir}...")
 
@@ -168,10 +794,22 @@ def generate_sorted_playlist(
 
     file_paths = FilePaths(output_dir)
 
+    catalog = Catalog(catalog_path) if catalog_path is not None else None
+    extraction_parameters = ImageProcessor(
+        engine.value, fast_decode=fast_decode).extraction_parameters(k, batch_size)
     try:
-        sorted_playlist, excluded_count = sort_playlist_by_hue(file_paths)
-
-        typer.echo(f"✅ Sorted {len(sorted_playlist.tracks)} tracks by hue")
+        if incremental:
+            result = update_sorted_playlist(
+                file_paths, catalog, saturation_threshold, extraction_parameters)
+            excluded_count = result.excluded_count
+            typer.echo(
+                f"✅ Added {len(result.added_tracks)} and removed {len(result.removed_tracks)} "
+                f"track(s), {result.track_count} tracks sorted by hue")
+        else:
+            sorted_playlist, excluded_count = sort_playlist_by_hue(
+                file_paths, catalog, saturation_threshold, tie_breakers or (), mode,
+                extraction_parameters)
+            typer.echo(f"✅ Sorted {len(sorted_playlist.tracks)} tracks by {mode.value}")
 
         if excluded_count > 0:
             typer.echo(
@@ -187,6 +825,228 @@ def generate_sorted_playlist(
     except Exception as e:
         typer.echo(f"❌ Error generating sorted playlist: {e}", err=True)
         raise typer.Exit(code=1)
+    finally:
+        if catalog is not None:
+            catalog.close()
+
+
+@app.command()
+def run(
+    playlist_id: Annotated[str, typer.Argument(help="Spotify playlist ID or URI")],
+    output_dir: output_dir_option = Path("tmp"),
+    k: Annotated[int, typer.Option(
+        help="Number of dominant colours to extract per image")] = 3,
+    engine: Annotated[EngineName, typer.Option(
+        help="Colour extraction engine")] = EngineName.kmeans,
+    fast_decode: Annotated[bool, typer.Option(
+        help="Decode JPEGs at reduced resolution (faster, slight colour drift)")] = False,
+    workers: Annotated[int | None, typer.Option(
+        min=1,
+        help="Number of worker processes (default: CPU count)")] = None,
+    concurrency: Annotated[int, typer.Option(
+        min=1,
+        help="Maximum number of album covers downloaded at the same time")] = 8,
+    min_image_size: Annotated[int | None, typer.Option(
+        min=1,
+        help="Download the smallest cover variant at least this many pixels wide "
+             "(default: the largest variant)")] = None,
+    save_intermediate: Annotated[bool, typer.Option(
+        help="Also write playlist.json, the cover images and image-colours.jsonl")] = False,
+    cache: Annotated[bool, typer.Option(
+        help="Reuse colours of unchanged images from the colour cache")] = True,
+    cache_path: Annotated[Path | None, typer.Option(
+        help="Colour cache database (default: colour-cache.sqlite in the output directory)")] = None,
+) -> None:
+    """Download, process and sort a playlist in one go.
+
+    Runs get-playlist, process-images and generate-sorted-playlist as a single
+    pipeline: covers are processed in memory as they are downloaded, and only
+    the sorted playlist is written to the output directory (unless
+    --save-intermediate is given).
+    """
+    from chromalist.pipeline import run_pipeline
+    from chromalist.playlist_sorting import write_sorted_playlist
+
+    validate_environment()
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    file_paths = FilePaths(output_dir)
+
+    typer.echo(f"📡 Fetching playlist: {playlist_id}")
+    try:
+        client = SpotifyClient(max_connections=concurrency)
+        playlist = client.get_playlist(playlist_id)
+    except Exception as e:
+        typer.echo(f"❌ Error fetching playlist: {e}", err=True)
+        raise typer.Exit(code=1)
+
+    typer.echo(
+        f"✅ Found playlist: '{playlist.name}' with {len(playlist.tracks)} tracks")
+
+    colour_cache = None
+    if cache:
+        colour_cache = ColourCache(cache_path or file_paths.colour_cache_path())
+
+    processor = ImageProcessor(engine.value, fast_decode=fast_decode)
+    try:
+        with typer.progressbar(
+                length=len(playlist.cover_groups()), label="Downloading and processing") as progress:
+            result = run_pipeline(
+                client, playlist, processor, k,
+                workers=workers,
+                concurrency=concurrency,
+                min_image_size=min_image_size,
+                file_paths=file_paths if save_intermediate else None,
+                cache=colour_cache,
+                progress=progress.update,
+            )
+    except Exception as e:
+        typer.echo(f"❌ Error processing playlist: {e}", err=True)
+        raise typer.Exit(code=1)
+    finally:
+        if colour_cache is not None:
+            colour_cache.close()
+
+    error_count = sum(1 for data in result.colour_data if data.error is not None)
+    if error_count > 0:
+        typer.echo(f"⚠️  {error_count} track(s) had download or processing errors")
+
+    write_sorted_playlist(file_paths, result.sorted_playlist)
+    typer.echo(f"✅ Sorted {len(result.sorted_playlist.tracks)} tracks by hue")
+    if result.excluded_tracks:
+        typer.echo(
+            f"⚠️  Excluded {len(result.excluded_tracks)} track(s) without valid colour data")
+    typer.echo(f"💾 Saved sorted playlist to {file_paths.sorted_playlist_path()}")
+
+
+@app.command()
+def batch(
+    playlist_ids: Annotated[list[str] | None, typer.Argument(
+        help="Spotify playlist IDs or URIs")] = None,
+    playlists_file: Annotated[Path | None, typer.Option(
+        help="File with a playlist ID or URI per line (blank lines and # comments are ignored)")] = None,
+    output_dir: output_dir_option = Path("tmp"),
+    k: Annotated[int, typer.Option(
+        help="Number of dominant colours to extract per image")] = 3,
+    engine: Annotated[EngineName, typer.Option(
+        help="Colour extraction engine")] = EngineName.kmeans,
+    fast_decode: Annotated[bool, typer.Option(
+        help="Decode JPEGs at reduced resolution (faster, slight colour drift)")] = False,
+    workers: Annotated[int | None, typer.Option(
+        min=1,
+        help="Number of worker processes (default: CPU count)")] = None,
+    concurrency: Annotated[int, typer.Option(
+        min=1,
+        help="Maximum number of album covers downloaded at the same time")] = 8,
+    min_image_size: Annotated[int | None, typer.Option(
+        min=1,
+        help="Download the smallest cover variant at least this many pixels wide "
+             "(default: the largest variant)")] = None,
+    save_intermediate: Annotated[bool, typer.Option(
+        help="Also write playlist.json, the cover images and image-colours.jsonl")] = False,
+    cache: Annotated[bool, typer.Option(
+        help="Reuse colours of unchanged images from the colour cache")] = True,
+    cache_path: Annotated[Path | None, typer.Option(
+        help="Colour cache database (default: colour-cache.sqlite in the output directory)")] = None,
+) -> None:
+    """Download, process and sort many playlists in one go.
+
+    Like run, for each playlist, writing the results of each playlist to a
+    directory named after its ID in the output directory. All playlists share
+    one Spotify client, one download and worker pool and one colour cache, and
+    covers shared between playlists are downloaded and processed once.
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    from chromalist.pipeline import Pipeline
+    from chromalist.playlist_sorting import write_sorted_playlist
+
+    playlist_ids = list(playlist_ids or [])
+    if playlists_file is not None:
+        for line in playlists_file.read_text().splitlines():
+            line = line.split("#", 1)[0].strip()
+            if line:
+                playlist_ids.append(line)
+    if not playlist_ids:
+        typer.echo("❌ Error: No playlists given", err=True)
+        raise typer.Exit(code=1)
+
+    validate_environment()
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    file_paths = FilePaths(output_dir)
+
+    try:
+        client = SpotifyClient(max_connections=concurrency)
+    except Exception as e:
+        typer.echo(f"❌ Error creating the Spotify client: {e}", err=True)
+        raise typer.Exit(code=1)
+
+    def fetch_playlist(playlist_id: str) -> Playlist | Exception:
+        try:
+            return client.get_playlist(playlist_id)
+        except Exception as e:
+            return e
+
+    colour_cache = None
+    if cache:
+        colour_cache = ColourCache(cache_path or file_paths.colour_cache_path())
+
+    processor = ImageProcessor(engine.value, fast_decode=fast_decode)
+    failed = []
+    typer.echo(f"📡 Processing {len(playlist_ids)} playlists...")
+    try:
+        # Fetch the next playlist while the current one is processed
+        with Pipeline(client, processor, k, workers, concurrency, min_image_size,
+                      colour_cache) as pipeline, ThreadPoolExecutor(max_workers=2) as fetcher:
+            remaining = iter(playlist_ids)
+            fetching = deque()
+
+            def fetch_next() -> None:
+                playlist_id = next(remaining, None)
+                if playlist_id is not None:
+                    fetching.append((playlist_id, fetcher.submit(fetch_playlist, playlist_id)))
+
+            fetch_next()
+            while fetching:
+                playlist_id, future = fetching.popleft()
+                fetch_next()
+                playlist = future.result()
+                if isinstance(playlist, Exception):
+                    typer.echo(f"❌ Error fetching playlist {playlist_id}: {playlist}", err=True)
+                    failed.append(playlist_id)
+                    continue
+
+                try:
+                    playlist_dir = output_dir / playlist.id
+                    playlist_dir.mkdir(exist_ok=True)
+                    playlist_paths = FilePaths(playlist_dir)
+                    result = pipeline.run(
+                        playlist, playlist_paths if save_intermediate else None)
+                    write_sorted_playlist(playlist_paths, result.sorted_playlist)
+                except Exception as e:
+                    typer.echo(f"❌ Error processing playlist {playlist_id}: {e}", err=True)
+                    failed.append(playlist_id)
+                    continue
+
+                typer.echo(
+                    f"✅ '{playlist.name}': sorted {len(result.sorted_playlist.tracks)}"
+                    f"/{len(playlist.tracks)} tracks to {playlist_paths.sorted_playlist_path()}")
+    finally:
+        if colour_cache is not None:
+            colour_cache.close()
+
+    typer.echo(
+        f"\n✅ Done! Sorted {len(playlist_ids) - len(failed)}/{len(playlist_ids)} playlists, "
+        f"downloading {pipeline.covers_downloaded} unique covers")
+    if colour_cache is not None:
+        typer.echo(
+            f"🗃️  Colour cache: {colour_cache.hits} hit(s), {colour_cache.misses} miss(es) "
+            f"({colour_cache.hit_rate:.1%} hit rate)")
+    if failed:
+        typer.echo(f"⚠️  {len(failed)} playlist(s) failed: {', '.join(failed)}", err=True)
+        raise typer.Exit(code=1)
 
 
 if __name__ == "__main__":
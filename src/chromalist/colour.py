@@ -0,0 +1,151 @@
+"""Vectorized colour space conversions and perceptual distances.
+
+All functions work on NumPy arrays of colours with the channels in the last
+axis, e.g. shape (3,), (n, 3) or (n, k, 3). The scales follow the rest of
+chromalist:
+
+- RGB: sRGB, 0-255
+- HSV: H 0-360, S 0-100, V 0-100
+- CIELAB: L 0-100, a and b roughly -128-128 (D65 white point)
+- OKLab: L 0-1, a and b roughly -0.4-0.4
+"""
+
+import numpy as np
+
+# sRGB (linear) to CIE XYZ, D65 white point
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+_XYZ_TO_RGB = np.linalg.inv(_RGB_TO_XYZ)
+_D65_WHITE = _RGB_TO_XYZ.sum(axis=1)
+
+# OKLab (Björn Ottosson, 2020): linear sRGB to LMS, and LMS' to Lab
+_RGB_TO_LMS = np.array([
+    [0.4122214708, 0.5363325363, 0.0514459929],
+    [0.2119034982, 0.6806995451, 0.1073969566],
+    [0.0883024619, 0.2817188376, 0.6299787005],
+])
+_LMS_TO_OKLAB = np.array([
+    [0.2104542553, 0.7936177850, -0.0040720468],
+    [1.9779984951, -2.4285922050, 0.4505937099],
+    [0.0259040371, 0.7827717662, -0.8086757660],
+])
+_LMS_TO_RGB = np.linalg.inv(_RGB_TO_LMS)
+_OKLAB_TO_LMS = np.linalg.inv(_LMS_TO_OKLAB)
+
+
+def rgb_to_hsv(rgb: np.ndarray) -> np.ndarray:
+    """Convert RGB (0-255) to HSV (H: 0-360, S: 0-100, V: 0-100).
+
+    Gives the same results as colorsys.rgb_to_hsv, for whole arrays at once.
+    """
+    rgb = np.asarray(rgb, dtype=float) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    maxc = rgb.max(axis=-1)
+    minc = rgb.min(axis=-1)
+    rangec = maxc - minc
+
+    # Achromatic colours have hue and saturation 0; avoid dividing by zero for them
+    chromatic = rangec > 0
+    safe_range = np.where(chromatic, rangec, 1.0)
+    safe_max = np.where(maxc > 0, maxc, 1.0)
+    rc = (maxc - r) / safe_range
+    gc = (maxc - g) / safe_range
+    bc = (maxc - b) / safe_range
+
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(chromatic, (h / 6.0) % 1.0, 0.0)
+    s = np.where(chromatic, rangec / safe_max, 0.0)
+
+    return np.stack([h * 360, s * 100, maxc * 100], axis=-1)
+
+
+def hsv_to_rgb(hsv: np.ndarray) -> np.ndarray:
+    """Convert HSV (H: 0-360, S: 0-100, V: 0-100) to RGB (0-255, floats)."""
+    hsv = np.asarray(hsv, dtype=float)
+    h = (hsv[..., 0] / 360.0) % 1.0
+    s = hsv[..., 1] / 100.0
+    v = hsv[..., 2] / 100.0
+
+    # Position on the colour wheel: sector i (0-5) and the fraction f within it
+    i = np.floor(h * 6.0)
+    f = h * 6.0 - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i.astype(int) % 6
+
+    r = np.choose(i, [v, q, p, p, t, v])
+    g = np.choose(i, [t, v, v, q, p, p])
+    b = np.choose(i, [p, p, t, v, v, q])
+    return np.stack([r, g, b], axis=-1) * 255
+
+
+def srgb_to_linear(rgb: np.ndarray) -> np.ndarray:
+    """Convert RGB (0-255) to linear-light sRGB (0-1)."""
+    c = np.asarray(rgb, dtype=float) / 255.0
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+
+def linear_to_srgb(linear: np.ndarray) -> np.ndarray:
+    """Convert linear-light sRGB (0-1) to RGB (0-255, floats, not clipped)."""
+    c = np.asarray(linear, dtype=float)
+    # Keep the sign so out-of-gamut values survive a round trip
+    magnitude = np.abs(c)
+    srgb = np.where(
+        magnitude <= 0.0031308, 12.92 * magnitude, 1.055 * magnitude ** (1 / 2.4) - 0.055)
+    return np.sign(c) * srgb * 255
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Convert RGB (0-255) to CIELAB (D65)."""
+    xyz = srgb_to_linear(rgb) @ _RGB_TO_XYZ.T / _D65_WHITE
+
+    delta = 6 / 29
+    f = np.where(xyz > delta ** 3, np.cbrt(xyz), xyz / (3 * delta ** 2) + 4 / 29)
+    fx, fy, fz = f[..., 0], f[..., 1], f[..., 2]
+    return np.stack([116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz)], axis=-1)
+
+
+def lab_to_rgb(lab: np.ndarray) -> np.ndarray:
+    """Convert CIELAB (D65) to RGB (0-255, floats, not clipped)."""
+    lab = np.asarray(lab, dtype=float)
+    fy = (lab[..., 0] + 16) / 116
+    f = np.stack([fy + lab[..., 1] / 500, fy, fy - lab[..., 2] / 200], axis=-1)
+
+    delta = 6 / 29
+    xyz = np.where(f > delta, f ** 3, 3 * delta ** 2 * (f - 4 / 29)) * _D65_WHITE
+    return linear_to_srgb(xyz @ _XYZ_TO_RGB.T)
+
+
+def rgb_to_oklab(rgb: np.ndarray) -> np.ndarray:
+    """Convert RGB (0-255) to OKLab."""
+    lms = srgb_to_linear(rgb) @ _RGB_TO_LMS.T
+    return np.cbrt(lms) @ _LMS_TO_OKLAB.T
+
+
+def oklab_to_rgb(oklab: np.ndarray) -> np.ndarray:
+    """Convert OKLab to RGB (0-255, floats, not clipped)."""
+    lms = (np.asarray(oklab, dtype=float) @ _OKLAB_TO_LMS.T) ** 3
+    return linear_to_srgb(lms @ _LMS_TO_RGB.T)
+
+
+def delta_e76(lab_a: np.ndarray, lab_b: np.ndarray) -> np.ndarray:
+    """CIE76 colour difference: Euclidean distance between CIELAB colours.
+
+    A difference of about 2.3 is the just noticeable difference.
+    """
+    return np.linalg.norm(np.asarray(lab_a) - np.asarray(lab_b), axis=-1)
+
+
+def oklab_distance(oklab_a: np.ndarray, oklab_b: np.ndarray) -> np.ndarray:
+    """Euclidean distance between OKLab colours."""
+    return np.linalg.norm(np.asarray(oklab_a) - np.asarray(oklab_b), axis=-1)
+
+
+def hue_distance(hue_a: np.ndarray, hue_b: np.ndarray) -> np.ndarray:
+    """Circular difference between hues in degrees (0-180)."""
+    difference = np.abs(np.asarray(hue_a) - np.asarray(hue_b)) % 360
+    return np.minimum(difference, 360 - difference)
@@ -0,0 +1,178 @@
+"""Persistent, content-addressed cache of extracted image colours."""
+
+import hashlib
+import json
+import sqlite3
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+RGBList = list[tuple[int, int, int]]
+HSVList = list[tuple[float, float, float]]
+
+
+class ColourCache:
+    """Cache of colour extraction results keyed by image content and parameters.
+
+    Entries are stored in a SQLite database, so the cache survives between runs
+    and re-runs only pay for images that have changed. Entries are evicted
+    by age and, least recently used first, by number of entries.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_entries: int | None = None,
+        max_age_days: float | None = None,
+    ):
+        """Open (or create) the cache database.
+
+        Args:
+            path: Path to the SQLite database file
+            max_entries: Maximum number of entries to keep (None for no limit)
+            max_age_days: Maximum age of entries in days (None for no limit)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS colours (
+                key TEXT PRIMARY KEY,
+                rgbs TEXT NOT NULL,
+                hsvs TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS colours_accessed ON colours (accessed)")
+        self.db.commit()
+
+    @staticmethod
+    def key(image_bytes: bytes, k: int, image_size: int, algorithm: str) -> str:
+        """Compute the cache key for an image and the extraction parameters.
+
+        Args:
+            image_bytes: Content of the image file
+            k: Number of dominant colours extracted
+            image_size: Size the image is resized to before extraction
+            algorithm: Name of the extraction algorithm
+
+        Returns:
+            Hex digest identifying the image content and parameters
+        """
+        digest = hashlib.sha256(image_bytes)
+        digest.update(f"|k={k}|size={image_size}|algorithm={algorithm}".encode())
+        return digest.hexdigest()
+
+    def track_key(
+        self,
+        track_id: str,
+        read_image: Callable[[], bytes],
+        k: int,
+        image_size: int,
+        algorithm: str,
+    ) -> str:
+        """Compute the cache key for the image of a track.
+
+        Args:
+            track_id: Spotify track ID
+            read_image: Returns the content of the image file
+            k: Number of dominant colours extracted
+            image_size: Size the image is resized to before extraction
+            algorithm: Name of the extraction algorithm
+
+        Returns:
+            The key of the image content and parameters (see ColourCache.key)
+
+        Raises:
+            OSError: If the image can't be read
+        """
+        return self.key(read_image(), k, image_size, algorithm)
+
+    def get(self, key: str) -> tuple[RGBList, HSVList] | None:
+        """Look up a cached result, counting the hit or miss.
+
+        Args:
+            key: Cache key from ColourCache.key
+
+        Returns:
+            Tuple of (RGB colour list, HSV colour list), or None if not cached
+        """
+        row = self.db.execute(
+            "SELECT rgbs, hsvs FROM colours WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.db.execute(
+            "UPDATE colours SET accessed = ? WHERE key = ?", (time.time(), key))
+        rgbs = [tuple(rgb) for rgb in json.loads(row[0])]
+        hsvs = [tuple(hsv) for hsv in json.loads(row[1])]
+        return rgbs, hsvs
+
+    def put(self, key: str, rgbs: RGBList, hsvs: HSVList) -> None:
+        """Store a result in the cache.
+
+        Args:
+            key: Cache key from ColourCache.key
+            rgbs: RGB colour list
+            hsvs: HSV colour list
+        """
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO colours (key, rgbs, hsvs, created, accessed) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, json.dumps(rgbs), json.dumps(hsvs), now, now),
+        )
+
+    def evict(self) -> int:
+        """Evict entries that are too old or exceed the maximum number of entries.
+
+        Returns:
+            Number of evicted entries
+        """
+        evicted = 0
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 24 * 60 * 60
+            evicted += self.db.execute(
+                "DELETE FROM colours WHERE created < ?", (cutoff,)).rowcount
+
+        if self.max_entries is not None:
+            # Least recently used entries go first
+            evicted += self.db.execute(
+                "DELETE FROM colours WHERE key IN ("
+                "SELECT key FROM colours ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+
+        self.db.commit()
+        return evicted
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM colours").fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that were hits (0.0 if there were no lookups)."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self) -> None:
+        """Evict stale entries, commit and close the database."""
+        self.evict()
+        self.db.close()
+
+    def __enter__(self) -> "ColourCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,256 @@
+"""Interchangeable engines for extracting the dominant colours of an image.
+
+Each engine takes the RGB pixels of an image and returns cluster centroids
+together with the number of pixels in each cluster. ImageProcessor turns those
+into the RGB and HSV lists sorted by frequency.
+"""
+
+import numpy as np
+from PIL import Image
+from scipy.cluster.vq import kmeans, vq
+
+# Centroids (m, 3) and the number of pixels in each cluster (m,)
+Clusters = tuple[np.ndarray, np.ndarray]
+
+
+class ColourEngine:
+    """Base class for colour extraction engines."""
+
+    name = ""
+
+    def extract(self, pixels: np.ndarray, k: int) -> Clusters:
+        """Find up to k dominant colours in an image.
+
+        Args:
+            pixels: Array of RGB pixels (0-255) with shape (n_pixels, 3)
+            k: Number of dominant colours to extract
+
+        Returns:
+            Tuple of (centroids, counts). Clusters with a count of 0 are ignored.
+        """
+        raise NotImplementedError
+
+    def extract_batch(self, pixels: np.ndarray, k: int) -> list[Clusters]:
+        """Find up to k dominant colours in each of many images.
+
+        Engines that can process many images at once override this; the
+        default extracts the colours one image at a time.
+
+        Args:
+            pixels: Array of RGB pixels (0-255) with shape (n_images, n_pixels, 3)
+            k: Number of dominant colours to extract
+
+        Returns:
+            List with the (centroids, counts) of each image
+        """
+        return [self.extract(image_pixels, k) for image_pixels in pixels]
+
+
+class KMeansEngine(ColourEngine):
+    """k-means clustering with SciPy, or the vectorized batch k-means for batches."""
+
+    name = "kmeans"
+
+    def extract(self, pixels: np.ndarray, k: int) -> Clusters:
+        # Run k-means clustering to find k dominant colours
+        centroids, _ = kmeans(pixels, k)
+
+        # Calculate frequency of each cluster to sort by dominance
+        codes, _ = vq(pixels, centroids)
+        return centroids, np.bincount(codes, minlength=len(centroids))
+
+    def extract_batch(self, pixels: np.ndarray, k: int) -> list[Clusters]:
+        centroids, counts = batch_kmeans(pixels, k)
+        return list(zip(centroids, counts))
+
+
+class MedianCutEngine(ColourEngine):
+    """PIL's median-cut colour quantization (Image.quantize)."""
+
+    name = "median-cut"
+
+    def extract(self, pixels: np.ndarray, k: int) -> Clusters:
+        img = Image.fromarray(pixels.astype(np.uint8).reshape(1, -1, 3), "RGB")
+        quantized = img.quantize(colors=k, method=Image.Quantize.MEDIANCUT)
+
+        indices = np.asarray(quantized).ravel()
+        palette = np.array(quantized.getpalette()[:3 * k], dtype=float).reshape(-1, 3)
+        counts = np.bincount(indices, minlength=len(palette))[:len(palette)]
+        return palette, counts
+
+
+class HistogramEngine(ColourEngine):
+    """3-D colour histogram: the k most populated bins, averaged."""
+
+    name = "histogram"
+
+    def __init__(self, bins_per_channel: int = 8):
+        self.bins_per_channel = bins_per_channel
+
+    def extract(self, pixels: np.ndarray, k: int) -> Clusters:
+        bins = self.bins_per_channel
+        n_bins = bins ** 3
+
+        # Bin index of each pixel in the bins x bins x bins cube
+        binned = np.minimum((pixels * (bins / 256)).astype(np.intp), bins - 1)
+        bin_index = (binned[:, 0] * bins + binned[:, 1]) * bins + binned[:, 2]
+
+        counts = np.bincount(bin_index, minlength=n_bins)
+        top = np.argsort(-counts, kind="stable")[:k]
+        top = top[counts[top] > 0]
+
+        # Represent each bin by the mean of its pixels rather than the bin centre
+        sums = np.stack(
+            [np.bincount(bin_index, weights=pixels[:, c], minlength=n_bins)[top]
+             for c in range(3)],
+            axis=1,
+        )
+        return sums / counts[top][:, None], counts[top]
+
+
+class MiniBatchKMeansEngine(ColourEngine):
+    """Mini-batch k-means: centroid updates from small random samples of pixels."""
+
+    name = "minibatch-kmeans"
+
+    def __init__(self, batch_size: int = 256, iterations: int = 20, seed: int = 0):
+        self.batch_size = batch_size
+        self.iterations = iterations
+        self.seed = seed
+
+    def extract(self, pixels: np.ndarray, k: int) -> Clusters:
+        rng = np.random.default_rng(self.seed)
+        n_pixels = len(pixels)
+
+        # k-means++ initialisation on a sample of the pixels
+        sample = pixels[rng.integers(n_pixels, size=min(n_pixels, 4 * self.batch_size))]
+        centroids, _ = batch_kmeans(sample[None], k, max_iter=0, seed=self.seed)
+        centroids = centroids[0]
+        seen = np.zeros(k)
+
+        for _ in range(self.iterations):
+            batch = pixels[rng.integers(n_pixels, size=self.batch_size)]
+            labels, _ = vq(batch, centroids)
+            batch_counts = np.bincount(labels, minlength=k)
+            batch_sums = np.stack(
+                [np.bincount(labels, weights=batch[:, c], minlength=k) for c in range(3)],
+                axis=1,
+            )
+
+            # Per-centroid learning rate decays with the number of pixels seen
+            seen += batch_counts
+            has_members = batch_counts > 0
+            rate = batch_counts[has_members] / seen[has_members]
+            batch_means = batch_sums[has_members] / batch_counts[has_members][:, None]
+            centroids[has_members] += rate[:, None] * (batch_means - centroids[has_members])
+
+        codes, _ = vq(pixels, centroids)
+        return centroids, np.bincount(codes, minlength=k)
+
+
+ENGINES: dict[str, type[ColourEngine]] = {
+    engine.name: engine
+    for engine in [KMeansEngine, MedianCutEngine, HistogramEngine, MiniBatchKMeansEngine]
+}
+
+
+def get_engine(name: str) -> ColourEngine:
+    """Create the colour extraction engine with the given name.
+
+    Raises:
+        ValueError: If there is no engine with that name
+    """
+    if name not in ENGINES:
+        raise ValueError(
+            f"Unknown colour engine: {name} (choose from {', '.join(ENGINES)})")
+    return ENGINES[name]()
+
+
+def batch_kmeans(
+    pixels: np.ndarray,
+    k: int,
+    max_iter: int = 50,
+    thresh: float = 1e-5,
+    seed: int = 0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Run k-means on many images at once with NumPy broadcasting.
+
+    Lloyd iterations are run for all images together, starting from a
+    k-means++ initialisation. Iteration stops when no centroid moves more
+    than thresh, or after max_iter iterations.
+
+    Args:
+        pixels: Array of shape (n_images, n_pixels, 3)
+        k: Number of clusters per image
+        max_iter: Maximum number of Lloyd iterations
+        thresh: Convergence threshold on the centroid movement
+        seed: Seed for the initialisation, so results are reproducible
+
+    Returns:
+        Tuple of (centroids, counts) with shapes (n_images, k, 3) and
+        (n_images, k). Clusters without members have a count of 0.
+    """
+    n_images, n_pixels, n_channels = pixels.shape
+    rng = np.random.default_rng(seed)
+    image_index = np.arange(n_images)
+
+    # Channel-major copy, so each channel is contiguous for matmul and bincount
+    channels = np.ascontiguousarray(pixels.transpose(0, 2, 1))
+    channels32 = channels.astype(np.float32)
+
+    def nearest(centroids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # |x - c|^2 = |x|^2 - 2 x.c + |c|^2; the |x|^2 term is the same for all
+        # centroids, so it is left out when looking for the nearest one
+        c32 = centroids.astype(np.float32)
+        scores = np.einsum("nkc,nkc->nk", c32, c32)[:, :, None] - 2 * (c32 @ channels32)
+        best = scores[:, 0].copy()
+        labels = np.zeros((n_images, n_pixels), dtype=np.intp)
+        for j in range(1, centroids.shape[1]):
+            closer = scores[:, j] < best
+            np.minimum(best, scores[:, j], out=best)
+            labels[closer] = j
+        return labels, best
+
+    # k-means++ initialisation: pick each new centroid with probability
+    # proportional to its squared distance from the nearest chosen centroid
+    squared_norms = np.einsum("ncp,ncp->np", channels32, channels32)
+    centroids = np.empty((n_images, k, n_channels))
+    centroids[:, 0] = pixels[image_index, rng.integers(n_pixels, size=n_images)]
+    for j in range(1, k):
+        _, best = nearest(centroids[:, :j])
+        weights = np.maximum(squared_norms + best, 0).astype(float)
+        cumulative = np.cumsum(weights, axis=1)
+        targets = rng.random(n_images) * cumulative[:, -1]
+        chosen = np.minimum((cumulative < targets[:, None]).sum(axis=1), n_pixels - 1)
+        centroids[:, j] = pixels[image_index, chosen]
+
+    def cluster_counts(labels: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # Offset the labels per image so all images are counted in one bincount
+        flat_labels = (labels + (image_index * k)[:, None]).ravel()
+        counts = np.bincount(flat_labels, minlength=n_images * k).reshape(n_images, k)
+        return flat_labels, counts
+
+    for _ in range(max_iter):
+        labels, _ = nearest(centroids)
+        flat_labels, counts = cluster_counts(labels)
+        sums = np.stack(
+            [
+                np.bincount(flat_labels, weights=channels[:, c].ravel(),
+                            minlength=n_images * k).reshape(n_images, k)
+                for c in range(n_channels)
+            ],
+            axis=2,
+        )
+
+        # Empty clusters keep their previous centroid
+        new_centroids = np.where(
+            (counts > 0)[:, :, None], sums / np.maximum(counts, 1)[:, :, None], centroids)
+        shift = np.abs(new_centroids - centroids).max()
+        centroids = new_centroids
+        if shift <= thresh:
+            break
+
+    labels, _ = nearest(centroids)
+    _, counts = cluster_counts(labels)
+
+    return centroids, counts
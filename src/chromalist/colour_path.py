@@ -0,0 +1,238 @@
+"""Short paths through colour space, for smooth colour gradients.
+
+Ordering tracks so that each cover is close in colour to the next is a
+travelling salesman problem. gradient_order finds a good (not optimal) open
+path in two steps:
+
+- nearest-neighbour chaining: starting at an extreme colour, repeatedly go
+  to the closest colour not visited yet, found with a KD-tree instead of
+  comparing against all n colours
+- 2-opt refinement: reverse stretches of the path where that shortens it,
+  only trying to connect each colour to its nearest neighbours, for a
+  bounded number of rounds
+"""
+
+import math
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Number of nearest neighbours looked up per point at once when chaining
+NEAREST_NEIGHBOURS = 16
+
+# Number of nearest neighbours 2-opt tries to connect each colour to
+TWO_OPT_NEIGHBOURS = 8
+
+# Maximum number of 2-opt rounds (each round tries all candidate moves once)
+TWO_OPT_MAX_ROUNDS = 10
+
+
+def path_length(points: np.ndarray, path: np.ndarray) -> float:
+    """Total length of a path.
+
+    Args:
+        points: Array of shape (n, d) with the points
+        path: Indices of the points in path order
+
+    Returns:
+        Sum of the Euclidean distances between consecutive points
+    """
+    return float(np.linalg.norm(np.diff(points[path], axis=0), axis=1).sum())
+
+
+def nearest_neighbour_path(points: np.ndarray, start: int = 0) -> np.ndarray:
+    """Chain points by repeatedly moving to the nearest unvisited point.
+
+    The nearest neighbours of all points are looked up in a KD-tree at once.
+    Only when all of them have been visited is the tree queried again, for
+    more neighbours; that tree is rebuilt on the unvisited points whenever
+    half of the points in it have been visited, so the queries stay cheap
+    to the end.
+
+    Args:
+        points: Array of shape (n, d) with the points
+        start: Index of the first point of the path
+
+    Returns:
+        Indices of the n points in path order
+    """
+    n = len(points)
+    path = np.empty(n, dtype=np.intp)
+    if n == 0:
+        return path
+
+    tree = cKDTree(points)
+    _, nearest = tree.query(points, k=min(NEAREST_NEIGHBOURS + 1, n))
+    # Plain Python lists: each step only looks at a handful of points
+    nearest = np.asarray(nearest).reshape(n, -1).tolist()
+    visited = [False] * n
+    # Points in the tree (indices into points)
+    in_tree = list(range(n))
+    visited_in_tree = 0
+
+    current = start
+    for step in range(n):
+        path[step] = current
+        visited[current] = True
+        visited_in_tree += 1
+        if step == n - 1:
+            break
+
+        following = next((index for index in nearest[current] if not visited[index]), None)
+        if following is None:
+            if visited_in_tree * 2 > len(in_tree):
+                in_tree = [index for index in in_tree if not visited[index]]
+                tree = cKDTree(points[in_tree])
+                visited_in_tree = 0
+
+            k = NEAREST_NEIGHBOURS
+            while following is None:
+                k = min(k, len(in_tree))
+                _, neighbours = tree.query(points[current], k=k)
+                following = next((
+                    in_tree[neighbour] for neighbour in np.atleast_1d(neighbours).tolist()
+                    if not visited[in_tree[neighbour]]
+                ), None)
+                k *= 4
+        current = following
+
+    return path
+
+
+def two_opt(
+    points: np.ndarray,
+    path: np.ndarray,
+    neighbours: int = TWO_OPT_NEIGHBOURS,
+    max_rounds: int = TWO_OPT_MAX_ROUNDS,
+) -> np.ndarray:
+    """Shorten a path by reversing stretches of it (2-opt).
+
+    Reversing a stretch s..e of the path replaces the edges into s and out of
+    e (where the path doesn't end there) with edges from the point before s
+    to e and from s to the point after e. Only moves that make two nearest
+    neighbours adjacent are tried. Each round evaluates the gain of all of
+    these moves at once, then makes the improving ones (best first, each
+    rechecked against the path as it changes).
+
+    Args:
+        points: Array of shape (n, d) with the points
+        path: Indices of the points in path order
+        neighbours: Number of nearest neighbours to try per point
+        max_rounds: Maximum number of rounds
+
+    Returns:
+        Indices of the points in the order of the shortened path
+    """
+    path = np.array(path, dtype=np.intp)
+    n = len(path)
+    if n < 3:
+        return path
+
+    neighbours = min(neighbours, n - 1)
+    _, nearest = cKDTree(points).query(points, k=neighbours + 1)
+    # Candidate edges to each nearest neighbour but the point itself, each
+    # pair of points once
+    first = np.repeat(np.arange(n), neighbours)
+    second = nearest[:, 1:].ravel()
+    pairs = np.unique(np.minimum(first, second) * n + np.maximum(first, second))
+    first, second = pairs // n, pairs % n
+    # Length of the edges the moves would add between the pairs
+    pair_distance = np.linalg.norm(points[first] - points[second], axis=1)
+
+    # Rechecking moves one at a time is faster on Python floats
+    point_tuples = list(map(tuple, points.tolist()))
+
+    def gain(start: int, end: int) -> float:
+        total = 0.0
+        if start > 0:
+            total += (math.dist(point_tuples[path[start - 1]], point_tuples[path[start]])
+                      - math.dist(point_tuples[path[start - 1]], point_tuples[path[end]]))
+        if end < n - 1:
+            total += (math.dist(point_tuples[path[end]], point_tuples[path[end + 1]])
+                      - math.dist(point_tuples[path[start]], point_tuples[path[end + 1]]))
+        return total
+
+    position = np.empty(n, dtype=np.intp)
+    for _ in range(max_rounds):
+        position[path] = np.arange(n)
+
+        # For the points of each pair at positions p < q, there are two moves
+        # that make them adjacent: reversing p + 1..q (the pair becomes the
+        # edge into the stretch) or p..q - 1 (the edge out of it)
+        p = np.minimum(position[first], position[second])
+        q = np.maximum(position[first], position[second])
+        valid = q > p + 1
+        candidates = np.flatnonzero(valid)
+        p, q, added = p[valid], q[valid], pair_distance[valid]
+        # Length of the edge out of each position (0 for the last one)
+        edge_length = np.append(np.linalg.norm(np.diff(points[path], axis=0), axis=1), 0.0)
+        # Reversing p + 1..q replaces p-(p + 1) and q-(q + 1) with the pair and
+        # (p + 1)-(q + 1); the last two only if q isn't the end of the path
+        has_after = q < n - 1
+        q_after = np.minimum(q + 1, n - 1)
+        gain_after = edge_length[p] + edge_length[q] - added - np.where(
+            has_after, np.linalg.norm(points[path[p + 1]] - points[path[q_after]], axis=1), 0.0)
+        # Reversing p..q - 1 replaces (p - 1)-p and (q - 1)-q with (p - 1)-(q - 1)
+        # and the pair; the first two only if p isn't the start of the path
+        has_before = p > 0
+        p_before = np.maximum(p - 1, 0)
+        gain_before = (np.where(has_before, edge_length[p_before], 0.0) + edge_length[q - 1]
+                       - added - np.where(has_before, np.linalg.norm(
+                           points[path[p_before]] - points[path[q - 1]], axis=1), 0.0))
+        # Only try the better of the two moves of each pair
+        after = gain_after >= gain_before
+        best_gain = np.where(after, gain_after, gain_before)
+
+        improving = np.flatnonzero(best_gain > 1e-12)
+        if len(improving) == 0:
+            break
+
+        moves = 0
+        for move in improving[np.argsort(-best_gain[improving])].tolist():
+            # Earlier moves may have changed the path: recheck the gain
+            pair = candidates[move]
+            pi, pj = sorted((position[first[pair]], position[second[pair]]))
+            if pj <= pi + 1:
+                continue
+            start, end = (pi + 1, pj) if after[move] else (pi, pj - 1)
+            if gain(start, end) <= 1e-12:
+                continue
+            path[start:end + 1] = path[start:end + 1][::-1].copy()
+            position[path[start:end + 1]] = np.arange(start, end + 1)
+            moves += 1
+        if moves == 0:
+            break
+
+    return path
+
+
+def gradient_order(points: np.ndarray, max_rounds: int = TWO_OPT_MAX_ROUNDS) -> np.ndarray:
+    """Order points along a short path, so that consecutive points are close.
+
+    Identical points (e.g. tracks sharing a cover) are collapsed first: the
+    path is found through the distinct points, then each of them is expanded
+    to all its copies, in input order. The path starts at the distinct point
+    farthest from the centroid, so it starts at one end of the colours rather
+    than in the middle.
+
+    Args:
+        points: Array of shape (n, d) with the points, e.g. OKLab colours
+        max_rounds: Maximum number of 2-opt rounds (0 to skip refinement)
+
+    Returns:
+        Indices of the n points in path order
+    """
+    points = np.asarray(points, dtype=float)
+    if len(points) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    distinct, copies_of = np.unique(points, axis=0, return_inverse=True)
+    start = int(np.argmax(np.linalg.norm(distinct - distinct.mean(axis=0), axis=1)))
+    path = nearest_neighbour_path(distinct, start)
+    if max_rounds > 0:
+        path = two_opt(distinct, path, max_rounds=max_rounds)
+
+    # Expand each distinct point to its copies (a stable sort keeps them in input order)
+    position = np.empty(len(distinct), dtype=np.intp)
+    position[path] = np.arange(len(distinct))
+    return np.argsort(position[copies_of.ravel()], kind="stable")
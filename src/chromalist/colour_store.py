@@ -0,0 +1,301 @@
+"""Reading and writing the image colour data files.
+
+Colour data is written either as a JSON list (image-colours.json), as JSON
+Lines (image-colours.jsonl), with one ImageColourData record per line, or as
+a binary NumPy array (image-colours.npy). The JSON Lines file is append-only:
+records are written as they are produced, so an interrupted run can be
+resumed, and a later record for a track replaces any earlier one. Its first
+line may be a header with the extraction parameters of the records (see
+read_parameters), so that a run with other parameters doesn't resume from it.
+
+The binary file holds a structured array with a fixed-width row per track
+(see colour_array_dtype). It is memory-mapped on read, so the colour data of
+a whole catalog loads without parsing any text.
+"""
+
+import json
+from collections.abc import Collection, Iterable, Iterator
+from json.decoder import scanstring
+from pathlib import Path
+from typing import Any, TextIO
+
+import numpy as np
+
+from chromalist.files import FilePaths
+from chromalist.models import ImageColourData
+
+# Start of the header line of a JSON Lines file
+PARAMETERS_HEADER = '{"parameters": '
+
+
+def colour_data_path(file_paths: FilePaths) -> Path | None:
+    """Find the colour data file to read, preferring the most recently written one.
+
+    Returns:
+        Path to image-colours.jsonl, image-colours.json or image-colours.npy,
+        or None if none of them exists
+    """
+    candidates = [
+        path
+        for path in (
+            file_paths.image_colours_jsonl_path(),
+            file_paths.image_colours_path(),
+            file_paths.image_colours_binary_path(),
+        )
+        if path.exists()
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda path: path.stat().st_mtime)
+
+
+def iter_colour_data(
+    path: Path, track_ids: Collection[str] | None = None
+) -> Iterator[dict[str, Any]]:
+    """Stream the raw colour data records (as dicts) from a colour data file.
+
+    JSON Lines files are read one line at a time. Partial lines, as left
+    behind by an interrupted run, are skipped.
+
+    Args:
+        path: Path to a .jsonl, .json or .npy colour data file
+        track_ids: If given, only the records of these tracks are returned.
+                   Lines of other tracks in JSON Lines files are skipped
+                   without being decoded.
+
+    Yields:
+        Colour data records in file order
+    """
+    if path.suffix == ".npy":
+        for colour_data in colour_data_from_array(load_colour_array(path)):
+            if track_ids is None or colour_data.track_id in track_ids:
+                yield colour_data.to_dict()
+        return
+
+    if path.suffix != ".jsonl":
+        with open(path, "r") as f:
+            for record in json.load(f):
+                if track_ids is None or record["track_id"] in track_ids:
+                    yield record
+        return
+
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip() or line.startswith(PARAMETERS_HEADER):
+                continue
+            if track_ids is not None and line.startswith('{"track_id": "'):
+                # Records are written by ColourDataWriter, track ID first
+                try:
+                    track_id = scanstring(line, 14)[0]
+                except ValueError:
+                    continue
+                if track_id not in track_ids:
+                    continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Partial line from an interrupted write
+                continue
+            if track_ids is None or record["track_id"] in track_ids:
+                yield record
+
+
+def read_parameters(path: Path) -> dict[str, Any] | None:
+    """Read the extraction parameters from the header of a JSON Lines file.
+
+    Returns:
+        The parameters, or None if the file doesn't exist or has no header
+    """
+    if not path.exists():
+        return None
+    with open(path, "r") as f:
+        line = f.readline()
+    if not line.startswith(PARAMETERS_HEADER):
+        return None
+    try:
+        return json.loads(line)["parameters"]
+    except json.JSONDecodeError:
+        return None
+
+
+def processed_track_ids(path: Path, parameters: dict[str, Any] | None = None) -> set[str]:
+    """Find the tracks that already have colour data without errors in a JSON Lines file.
+
+    Args:
+        path: Path to the JSON Lines file
+        parameters: If given, records are only used if the file was written
+                    with these extraction parameters (see read_parameters)
+
+    Returns:
+        Set of track IDs whose latest record has no error (empty if the file
+        doesn't exist or was written with other parameters)
+    """
+    if not path.exists():
+        return set()
+    if parameters is not None and read_parameters(path) != parameters:
+        return set()
+
+    processed = set()
+    for record in iter_colour_data(path):
+        if record.get("error") is None:
+            processed.add(record["track_id"])
+        else:
+            processed.discard(record["track_id"])
+    return processed
+
+
+# Error flag values in the binary colour array
+OK = 0
+FAILED = 1
+
+# Error message of failed tracks read back from the binary colour array
+BINARY_ERROR_MESSAGE = "Processing failed"
+
+
+def colour_array_dtype(k: int, track_id_width: int) -> np.dtype:
+    """The row type of the binary colour array.
+
+    Args:
+        k: Maximum number of colours per track
+        track_id_width: Length in bytes of the longest track ID
+
+    Returns:
+        Structured dtype with the fields
+        - track_id: the track ID (ASCII)
+        - count: the number of colours (rows beyond it are zero)
+        - error: OK, or FAILED if the track couldn't be processed
+        - rgbs: (k, 3) RGB colours, 0-255
+        - hsvs: (k, 3) HSV colours (H: 0-360, S: 0-100, V: 0-100)
+    """
+    return np.dtype([
+        ("track_id", f"S{max(track_id_width, 1)}"),
+        ("count", np.uint8),
+        ("error", np.uint8),
+        ("rgbs", np.uint8, (k, 3)),
+        ("hsvs", np.float32, (k, 3)),
+    ])
+
+
+def colour_data_to_array(colour_data: Iterable[ImageColourData], k: int) -> np.ndarray:
+    """Pack colour data into a binary colour array (see colour_array_dtype).
+
+    Args:
+        colour_data: Colour data of the tracks
+        k: Maximum number of colours per track; extra colours are dropped
+
+    Returns:
+        Structured array with a row per track, in input order
+    """
+    colour_data = list(colour_data)
+    track_ids = [data.track_id.encode("ascii") for data in colour_data]
+    array = np.zeros(
+        len(colour_data), dtype=colour_array_dtype(k, max(map(len, track_ids), default=1)))
+    array["track_id"] = track_ids
+
+    for i, data in enumerate(colour_data):
+        if data.error is not None:
+            array["error"][i] = FAILED
+            continue
+        count = min(len(data.rgbs), k)
+        if count == 0:
+            continue
+        array["count"][i] = count
+        array["rgbs"][i, :count] = data.rgbs[:count]
+        array["hsvs"][i, :count] = data.hsvs[:count]
+    return array
+
+
+def write_colour_array(path: Path, colour_data: Iterable[ImageColourData], k: int) -> None:
+    """Write colour data as a binary colour array (an .npy file).
+
+    Args:
+        path: Path to the .npy file
+        colour_data: Colour data of the tracks
+        k: Maximum number of colours per track
+    """
+    with open(path, "wb") as f:
+        np.save(f, colour_data_to_array(colour_data, k))
+
+
+def load_colour_array(path: Path) -> np.ndarray:
+    """Memory-map a binary colour array (see colour_array_dtype)."""
+    return np.load(path, mmap_mode="r")
+
+
+def colour_data_from_array(array: np.ndarray) -> Iterator[ImageColourData]:
+    """Unpack the rows of a binary colour array into ImageColourData.
+
+    Error messages are not stored in the array; failed tracks get
+    BINARY_ERROR_MESSAGE.
+    """
+    for row in array:
+        track_id = row["track_id"].decode("ascii")
+        if row["error"] != OK:
+            yield ImageColourData(
+                track_id=track_id, rgbs=[], hsvs=[], error=BINARY_ERROR_MESSAGE)
+            continue
+        count = int(row["count"])
+        yield ImageColourData(
+            track_id=track_id,
+            rgbs=[tuple(rgb) for rgb in row["rgbs"][:count].tolist()],
+            hsvs=[tuple(hsv) for hsv in row["hsvs"][:count].tolist()],
+        )
+
+
+def dominant_colours_from_array(array: np.ndarray) -> tuple[list[str], np.ndarray]:
+    """Find the dominant colour of every track with colours in a binary colour array.
+
+    Vectorized: no per-track objects are created.
+
+    Args:
+        array: Binary colour array, e.g. from load_colour_array
+
+    Returns:
+        Tuple of (track IDs, array of shape (n, 3) with the dominant HSV colour
+        of each of them)
+    """
+    valid = (array["error"] == OK) & (array["count"] > 0)
+    track_ids = np.char.decode(array["track_id"][valid], "ascii").tolist()
+    return track_ids, np.asarray(array["hsvs"][valid, 0], dtype=float)
+
+
+class ColourDataWriter:
+    """Appends ImageColourData records to a JSON Lines file as they are produced."""
+
+    def __init__(
+        self, path: Path, append: bool = True, parameters: dict[str, Any] | None = None
+    ):
+        """Open the file for writing.
+
+        Args:
+            path: Path to the JSON Lines file
+            append: Keep existing records (otherwise the file is truncated)
+            parameters: Extraction parameters of the records, written as the
+                        header of a new file (see read_parameters)
+        """
+        self.path = path
+        # Line buffered, so every record reaches the file as soon as it is written
+        self.file: TextIO = open(path, "a" if append else "w", buffering=1)
+        if append and self.file.tell() > 0:
+            self._terminate_last_line()
+        elif parameters is not None:
+            self.file.write(json.dumps({"parameters": parameters}) + "\n")
+
+    def _terminate_last_line(self) -> None:
+        # An interrupted run may have left a partial line; start on a fresh one
+        with open(self.path, "rb") as f:
+            f.seek(-1, 2)
+            if f.read(1) != b"\n":
+                self.file.write("\n")
+
+    def write(self, colour_data: ImageColourData) -> None:
+        self.file.write(json.dumps(colour_data.to_dict()) + "\n")
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "ColourDataWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,285 @@
+"""Local stand-in for the parts of the Spotify Web API chromalist uses.
+
+FakeSpotifyServer serves synthetic playlists (the playlist and playlist items
+endpoints, with offset paging; items are served at both /items and the older
+/tracks) and synthetic album cover images over real
+HTTP on localhost. Latency, page size, server errors and throttling (HTTP 429
+with Retry-After) can be injected, so the HTTP behaviour of SpotifyClient can
+be tested and load tested offline:
+
+    with FakeSpotifyServer(latency=0.02, throttle_rate=0.05) as server:
+        server.add_playlist("playlist1", n_tracks=1000)
+        client = SpotifyClient(api_url=server.api_url, access_token="fake")
+        playlist = client.get_playlist("playlist1")
+"""
+
+import io
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from chromalist.benchmarks import synthetic_cover, synthetic_playlist
+
+# Sizes of the album cover variants, as Spotify offers them (largest first)
+IMAGE_SIZES = (640, 300, 64)
+
+
+class _FakeSpotifyHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients can pool connections as they do with Spotify.
+    # Headers and body are separate writes, so without TCP_NODELAY every
+    # response on a kept-alive connection would wait for a delayed ACK.
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "_FakeSpotifyHTTPServer"
+
+    def do_GET(self) -> None:
+        fake = self.server.fake
+        url = urlsplit(self.path)
+        status = fake._next_status()
+        if fake.latency:
+            time.sleep(fake.latency)
+
+        if status == 429:
+            self._send_json(429, _error(429, "API rate limit exceeded"),
+                            {"Retry-After": f"{fake.retry_after:g}"})
+            return
+        if status == 500:
+            self._send_json(500, _error(500, "Server error"))
+            return
+
+        parts = url.path.strip("/").split("/")
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if parts[:2] == ["v1", "playlists"] and len(parts) in (3, 4):
+            playlist = fake.playlists.get(parts[2])
+            if playlist is None or (len(parts) == 4 and parts[3] not in ("items", "tracks")):
+                self._send_json(404, _error(404, "Not found."))
+            elif len(parts) == 3:
+                self._send_json(200, fake._playlist_object(playlist))
+            else:
+                offset = int(query.get("offset", 0))
+                limit = int(query.get("limit", 100))
+                self._send_json(200, fake._page(playlist, offset, limit))
+        elif parts[0] == "images" and len(parts) == 3:
+            image = fake._image(parts[1], parts[2].removesuffix(".jpg"))
+            if image is None:
+                self._send_json(404, _error(404, "Not found."))
+            else:
+                self._send(200, image, "image/jpeg")
+        else:
+            self._send_json(404, _error(404, "Service not found"))
+
+    def _send_json(self, status: int, body: Any, headers: dict[str, str] | None = None) -> None:
+        self._send(status, json.dumps(body).encode(), "application/json", headers)
+
+    def _send(
+        self, status: int, body: bytes, content_type: str, headers: dict[str, str] | None = None
+    ) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Keep the load tests quiet
+        pass
+
+
+class _FakeSpotifyHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "FakeSpotifyServer"
+
+
+def _error(status: int, message: str) -> dict[str, Any]:
+    return {"error": {"status": status, "message": message}}
+
+
+class FakeSpotifyServer:
+    """A local HTTP server standing in for the Spotify Web API and image CDN.
+
+    Use as a context manager: the server runs in a background thread until
+    the end of the with block.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        page_size: int = 100,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+        image_variety: int = 16,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        """Create the server (it starts with start or the with block).
+
+        Args:
+            latency: Seconds every response is delayed by
+            page_size: Maximum number of tracks per page of playlist items
+            error_rate: Fraction of requests answered with HTTP 500
+            throttle_rate: Fraction of requests answered with HTTP 429
+            retry_after: Retry-After of throttled responses, in seconds
+            image_variety: Number of distinct synthetic cover images
+            seed: Seed for the injected errors and the synthetic covers
+            host: Host to listen on
+            port: Port to listen on (default: any free port)
+        """
+        self.latency = latency
+        self.page_size = page_size
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.image_variety = image_variety
+        self.seed = seed
+        self.playlists: dict[str, dict[str, Any]] = {}
+
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._images: dict[tuple[int, int], bytes] = {}
+        self._httpd = _FakeSpotifyHTTPServer((host, port), _FakeSpotifyHandler)
+        self._httpd.fake = self
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self) -> str:
+        """Base URL of the Web API endpoints (see SpotifyClient's api_url)."""
+        return f"{self.url}/v1/"
+
+    def add_playlist(
+        self, playlist_id: str, n_tracks: int, n_covers: int | None = None, seed: int = 0
+    ) -> None:
+        """Add a playlist of synthetic tracks.
+
+        Args:
+            playlist_id: ID of the playlist
+            n_tracks: Number of tracks
+            n_covers: Number of distinct album covers the tracks are spread over
+                      (default: one per track)
+            seed: Seed for the random assignment of tracks to covers
+        """
+        playlist = synthetic_playlist(n_tracks, n_covers, seed)
+        tracks = []
+        for track in playlist.tracks:
+            cover = track.album_art_url.rsplit("/", 1)[1].removesuffix(".jpg")
+            tracks.append({
+                "id": track.id,
+                "name": track.name,
+                "artists": [{"name": track.artist}],
+                "album": {
+                    "name": track.album_name,
+                    "images": [
+                        {"url": f"{self.url}/images/{cover}/{size}.jpg",
+                         "width": size, "height": size}
+                        for size in IMAGE_SIZES
+                    ],
+                },
+            })
+        self.playlists[playlist_id] = {
+            "id": playlist_id,
+            "name": f"Playlist {playlist_id}",
+            "description": playlist.description,
+            "snapshot_id": f"{playlist_id}-snapshot",
+            "tracks": tracks,
+        }
+
+    def start(self) -> None:
+        """Start serving requests in a background thread."""
+        if not self._images:
+            self._render_images()
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stop the server."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeSpotifyServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _next_status(self) -> int | None:
+        """Count a request, and decide whether to inject a 429 or 500."""
+        with self._lock:
+            self.requests += 1
+            draw = self._random.random()
+            if draw < self.throttle_rate:
+                self.throttled += 1
+                return 429
+            if draw < self.throttle_rate + self.error_rate:
+                self.errors += 1
+                return 500
+        return None
+
+    def _playlist_object(self, playlist: dict[str, Any]) -> dict[str, Any]:
+        """The playlist object, with the first page of tracks."""
+        return {
+            "id": playlist["id"],
+            "name": playlist["name"],
+            "description": playlist["description"],
+            "snapshot_id": playlist["snapshot_id"],
+            "tracks": self._page(playlist, 0, 100),
+        }
+
+    def _page(self, playlist: dict[str, Any], offset: int, limit: int) -> dict[str, Any]:
+        """A page of playlist items; like Spotify's, at most page_size long."""
+        limit = min(limit, self.page_size)
+        tracks = playlist["tracks"]
+        href = f"{self.api_url}playlists/{playlist['id']}/items"
+        next_offset = offset + limit
+        return {
+            "href": f"{href}?offset={offset}&limit={limit}",
+            "items": [{"track": track} for track in tracks[offset:offset + limit]],
+            "limit": limit,
+            "offset": offset,
+            "total": len(tracks),
+            "next": f"{href}?offset={next_offset}&limit={limit}"
+            if next_offset < len(tracks) else None,
+        }
+
+    def _image(self, cover: str, size: str) -> bytes | None:
+        """The JPEG of a cover at one of the sizes (see _render_images)."""
+        if not size.isdigit():
+            return None
+        return self._images.get((zlib.crc32(cover.encode()) % self.image_variety, int(size)))
+
+    def _render_images(self) -> None:
+        """Render the synthetic cover images at every size.
+
+        Covers cycle through image_variety images, rendered up front, so
+        serving images costs the server little CPU and doesn't skew the load tests.
+        """
+        for variant in range(self.image_variety):
+            cover = synthetic_cover(np.random.default_rng([self.seed, variant]), IMAGE_SIZES[0])
+            for size in IMAGE_SIZES:
+                buffer = io.BytesIO()
+                cover.resize((size, size)).save(buffer, "JPEG")
+                self._images[(variant, size)] = buffer.getvalue()
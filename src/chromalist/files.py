@@ -1,8 +1,31 @@
 # Responsible for file paths
 
+import os
+import shutil
 from pathlib import Path
 
 
+def link_or_copy(source: Path, target: Path) -> None:
+    """Make target a hard link to source, or a copy of it where hard links aren't supported."""
+    if source == target:
+        return
+    target.unlink(missing_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def replace_file(path: Path, data: bytes) -> None:
+    """Write a new file, rather than writing to an existing one in place.
+
+    The file may be a hard link shared with other files (see link_or_copy);
+    writing to it in place would change all of them.
+    """
+    path.unlink(missing_ok=True)
+    path.write_bytes(data)
+
+
 class FilePaths:
     """Responsible for managing paths to the application data files."""
 
@@ -17,9 +40,38 @@ class FilePaths:
     def track_image_path(self, track_id: str) -> Path:
         return self.path / f"{track_id}.jpg"
 
+    def image_pack_path(self) -> Path:
+        return self.path / "covers.pack"
+
+    def image_pack_index_path(self) -> Path:
+        return self.path / "covers.pack.index"
+
+    def save_track_image(self, track_id: str, image_bytes: bytes) -> None:
+        """Save the image of a track, without changing images it was shared with."""
+        replace_file(self.track_image_path(track_id), image_bytes)
+
+    def share_track_image(self, source_track_id: str, track_id: str) -> None:
+        """Make the image of one track available as the image of another track.
+
+        Hard links the image where the filesystem supports it, and copies it otherwise.
+        """
+        link_or_copy(self.track_image_path(source_track_id), self.track_image_path(track_id))
+
+    def manifest_path(self) -> Path:
+        return self.path / "manifest.jsonl"
+
     def image_colours_path(self) -> Path:
         return self.path / "image-colours.json"
 
+    def image_colours_jsonl_path(self) -> Path:
+        return self.path / "image-colours.jsonl"
+
+    def image_colours_binary_path(self) -> Path:
+        return self.path / "image-colours.npy"
+
+    def colour_cache_path(self) -> Path:
+        return self.path / "colour-cache.sqlite"
+
     def sorted_playlist_path(self) -> Path:
         return self.path / "sorted-playlist.json"
 
@@ -0,0 +1,215 @@
+"""Packed store of track cover images.
+
+Instead of a {track-id}.jpg file per track, covers can be kept in a pack:
+one append-only blob file (covers.pack) with the images back to back, and an
+index (covers.pack.index) with a "{track-id}\\t{offset}\\t{length}" line per
+track. Covers are appended sequentially as they are downloaded, tracks
+sharing a cover point at the same bytes, and images are read through a
+memory map of the blob file, without opening a file per track.
+
+The blob is written before its index line, so an interrupted run leaves at
+most some unreferenced bytes at the end of the blob and a partial index line,
+which is ignored.
+"""
+
+import io
+import mmap
+import threading
+from pathlib import Path
+
+from chromalist.files import FilePaths
+
+
+class MemoryViewReader(io.RawIOBase):
+    """Seekable, read-only file object over a memoryview, without copying it.
+
+    Lets PIL decode an image straight from a memory-mapped pack.
+    """
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        start = min(self._position, len(self._view))
+        count = min(len(buffer), len(self._view) - start)
+        buffer[:count] = self._view[start:start + count]
+        self._position = start + count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._position
+
+
+class ImagePack:
+    """Append-only pack of cover images, with an offset index by track ID.
+
+    Covers can be added from several threads at once. Packs are picklable:
+    in worker processes they are reopened read-only, once per process.
+    """
+
+    def __init__(self, path: Path, index_path: Path):
+        """Open (or create, on the first add) a pack.
+
+        Args:
+            path: Path to the blob file
+            index_path: Path to the index file
+        """
+        self.path = path
+        self.index_path = index_path
+        # (offset, length) of the image of each track
+        self.index: dict[str, tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self._blob = None
+        self._index_file = None
+        self._map: mmap.mmap | None = None
+        self._load_index()
+
+    @classmethod
+    def for_output_dir(cls, file_paths: FilePaths) -> "ImagePack":
+        """The pack of an output directory (covers.pack and covers.pack.index)."""
+        return cls(file_paths.image_pack_path(), file_paths.image_pack_index_path())
+
+    def _load_index(self) -> None:
+        size = self.path.stat().st_size if self.path.exists() else 0
+        if not self.index_path.exists():
+            return
+        with open(self.index_path) as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                # Skip a partial last line of an interrupted run
+                if len(fields) != 3 or not line.endswith("\n"):
+                    continue
+                track_id, offset, length = fields[0], int(fields[1]), int(fields[2])
+                if offset + length <= size:
+                    self.index[track_id] = (offset, length)
+
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def add(self, track_id: str, image_bytes: bytes) -> None:
+        """Append the image of a track (replacing any earlier one).
+
+        Args:
+            track_id: Spotify track ID
+            image_bytes: Content of the image file
+        """
+        with self._lock:
+            if self._blob is None:
+                self._blob = open(self.path, "ab")
+            offset = self._blob.tell()
+            self._blob.write(image_bytes)
+            self._blob.flush()
+            self._write_index(track_id, offset, len(image_bytes))
+
+    def alias(self, source_track_id: str, track_id: str) -> None:
+        """Make the image of one track the image of another, without copying it.
+
+        Raises:
+            KeyError: If the source track has no image in the pack
+        """
+        with self._lock:
+            offset, length = self.index[source_track_id]
+            self._write_index(track_id, offset, length)
+
+    def _write_index(self, track_id: str, offset: int, length: int) -> None:
+        if self._index_file is None:
+            # Line buffered, so every entry reaches the file as soon as it is written
+            self._index_file = open(self.index_path, "a", buffering=1)
+        self._index_file.write(f"{track_id}\t{offset}\t{length}\n")
+        self.index[track_id] = (offset, length)
+
+    def get(self, track_id: str) -> memoryview | None:
+        """Look up the image of a track.
+
+        Args:
+            track_id: Spotify track ID
+
+        Returns:
+            A memoryview of the image in the memory-mapped blob (not a copy),
+            or None if the track has no image in the pack
+        """
+        entry = self.index.get(track_id)
+        if entry is None:
+            return None
+        offset, length = entry
+        with self._lock:
+            if self._map is None or offset + length > len(self._map):
+                # Map the blob (again, if it has grown since). An earlier map
+                # may still back memoryviews, so it is left to be collected.
+                with open(self.path, "rb") as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return memoryview(self._map)[offset:offset + length]
+
+    def close(self) -> None:
+        """Close the blob and index files.
+
+        The memory map is closed too, unless memoryviews returned by get
+        are still alive; it is then unmapped once they are collected.
+        """
+        for file in (self._blob, self._index_file):
+            if file is not None:
+                file.close()
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass
+        self._blob = self._index_file = self._map = None
+
+    def __enter__(self) -> "ImagePack":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __reduce__(self):
+        # Send the paths rather than the index; the size of the index file
+        # tells the worker processes whether their copy is still current
+        index_size = self.index_path.stat().st_size if self.index_path.exists() else 0
+        return _shared_pack, (self.path, self.index_path, index_size)
+
+
+# Packs opened in this process by unpickling, by path
+_shared_packs: dict[tuple[Path, Path], tuple[int, ImagePack]] = {}
+
+
+def _shared_pack(path: Path, index_path: Path, index_size: int) -> ImagePack:
+    """Open a pack read-only, reusing the copy opened earlier in this process."""
+    shared = _shared_packs.get((path, index_path))
+    if shared is None or shared[0] != index_size:
+        if shared is not None:
+            shared[1].close()
+        shared = (index_size, ImagePack(path, index_path))
+        _shared_packs[(path, index_path)] = shared
+    return shared[1]
+
+
+def open_image_pack(file_paths: FilePaths) -> ImagePack | None:
+    """Open the pack of an output directory, if the covers are packed.
+
+    Returns:
+        The pack, or None if the output directory has no pack
+    """
+    if not file_paths.image_pack_index_path().exists():
+        return None
+    return ImagePack.for_output_dir(file_paths)
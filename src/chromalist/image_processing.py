@@ -1,32 +1,63 @@
-import colorsys
+import io
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from functools import partial
 from pathlib import Path
+from typing import Any, BinaryIO
 
 import numpy as np
 from PIL import Image
-from scipy.cluster.vq import kmeans
 
+from chromalist.colour import rgb_to_hsv
+from chromalist.colour_cache import ColourCache
+from chromalist.colour_engines import ColourEngine, get_engine
 from chromalist.files import FilePaths
-from chromalist.models import ImageColourData, Playlist
+from chromalist.image_pack import ImagePack, MemoryViewReader
+from chromalist.models import ImageColourData, Playlist, Track, group_by_cover
 
 
 class ImageProcessor:
-    def __init__(self):
-        pass
+    # Images are resized to image_size x image_size before extraction
+    image_size = 100
 
-    def validate_files(self, file_paths: FilePaths, playlist: Playlist) -> None:
+    def __init__(self, engine: str | ColourEngine = "kmeans", fast_decode: bool = False):
+        """Create an image processor.
+
+        Args:
+            engine: Colour extraction engine, or the name of one (see colour_engines.ENGINES)
+            fast_decode: Decode JPEGs at reduced resolution (see load_pixels)
+        """
+        self.engine = get_engine(engine) if isinstance(engine, str) else engine
+        self.fast_decode = fast_decode
+
+    def validate_files(
+        self, file_paths: FilePaths, playlist: Playlist, images: ImagePack | None = None
+    ) -> None:
         """Validate that all required image files exist.
 
         Args:
             file_paths: FilePaths instance for managing paths
             playlist: Playlist object with track information
+            images: If given, the images are looked up in this pack's index
+                    instead of checking for files
 
         Raises:
             FileNotFoundError: If any required image file is missing
         """
+        # One scan of the output directory instead of a stat per track
+        present = images.index if images is not None else {
+            entry.name for entry in os.scandir(file_paths.path)}
+
         missing_files = []
         for track in playlist.tracks:
+            if images is not None:
+                if track.id not in present:
+                    missing_files.append(f"{track.id} (in {images.path.name})")
+                continue
             image_path = file_paths.track_image_path(track.id)
-            if not image_path.exists():
+            if image_path.name not in present:
                 missing_files.append(str(image_path))
 
         if missing_files:
@@ -42,12 +73,13 @@ class ImageProcessor:
             )
 
     def extract_colours(
-        self, image_path: Path, k: int = 3
+        self, image_path: Path | memoryview, k: int = 3
     ) -> tuple[list[tuple[int, int, int]], list[tuple[float, float, float]]]:
         """Extract k dominant colours from an image.
 
         Args:
-            image_path: Path to the image file
+            image_path: Path to the image file, or a memoryview of its content
+                        (e.g. from an ImagePack), decoded without copying it
             k: Number of dominant colours to extract
 
         Returns:
@@ -55,51 +87,125 @@ class ImageProcessor:
             RGB values are in range 0-255
             HSV values are (H: 0-360, S: 0-100, V: 0-100)
         """
-        # Load image and convert to RGB
-        img = Image.open(image_path)
-        img = img.convert("RGB")
+        return self.colours_from_pixels(self.load_pixels(image_path), k)
 
-        # Resize for faster processing (k-means is linear in pixels)
-        img = img.resize((100, 100))
+    def colours_from_pixels(
+        self, pixels: np.ndarray, k: int = 3
+    ) -> tuple[list[tuple[int, int, int]], list[tuple[float, float, float]]]:
+        """Extract k dominant colours from already loaded pixels (see load_pixels).
+
+        Returns:
+            Tuple of (RGB colour list, HSV colour list) as for extract_colours
+        """
+        # Find the k dominant colours and the frequency of each of them
+        centroids, counts = self.engine.extract(pixels, k)
+
+        return self.colours_from_clusters(centroids, counts)
+
+    def extract_colours_batch(
+        self, image_paths: list[Path], k: int = 3
+    ) -> list[tuple[list[tuple[int, int, int]], list[tuple[float, float, float]]]]:
+        """Extract k dominant colours from many images at once.
+
+        The resized pixels of all images are stacked into a single
+        (n_images, 10000, 3) array and handed to the engine in one go. The
+        k-means engine clusters them together with a vectorized k-means
+        (see colour_engines.batch_kmeans), which amortises the per-call overhead.
+
+        Args:
+            image_paths: Paths to the image files
+            k: Number of dominant colours to extract
 
-        # Convert to numpy array and reshape to list of pixels
-        pixels = np.array(img)
-        pixels_reshaped = pixels.reshape(-1, 3)
+        Returns:
+            List with a (RGB colour list, HSV colour list) tuple per image,
+            in the same format as extract_colours
+        """
+        if not image_paths:
+            return []
 
-        # Convert to float for k-means
-        pixels_float = pixels_reshaped.astype(float)
+        pixels = np.stack([self.load_pixels(path) for path in image_paths])
 
-        # Run k-means clustering to find k dominant colours
-        centroids, _ = kmeans(pixels_float, k)
+        return [
+            self.colours_from_clusters(centroids, counts)
+            for centroids, counts in self.engine.extract_batch(pixels, k)
+        ]
 
-        # Convert centroids back to integers for RGB
-        rgb_colours = [tuple(map(int, centroid)) for centroid in centroids]
+    def load_pixels(self, image_path: Path | BinaryIO | memoryview) -> np.ndarray:
+        """Load an image as a (10000, 3) float array of RGB pixels.
 
-        # Calculate frequency of each cluster to sort by dominance
-        from scipy.cluster.vq import vq
+        With fast_decode, JPEGs are decoded straight to roughly the target size
+        using libjpeg's DCT scaling (PIL's draft mode), and the remaining
+        downscaling starts with a cheap integer reduction. This skips most of
+        the decoding work for large covers, at the cost of a small drift in
+        the pixel values.
 
-        codes, _ = vq(pixels_float, centroids)
-        unique, counts = np.unique(codes, return_counts=True)
+        Args:
+            image_path: Path to the image file, a binary file object with the
+                        image, or a memoryview of the image file content
 
+        Returns:
+            Array of RGB pixels (0-255) of the image resized to 100x100
+        """
+        size = (self.image_size, self.image_size)
+        if isinstance(image_path, memoryview):
+            image_path = MemoryViewReader(image_path)
+
+        # Load image and convert to RGB
+        img = Image.open(image_path)
+        if self.fast_decode:
+            img.draft("RGB", size)
+        img = img.convert("RGB")
+
+        # Resize for faster processing (k-means is linear in pixels)
+        if self.fast_decode:
+            img = img.resize(size, reducing_gap=2.0)
+        else:
+            img = img.resize(size)
+
+        # Convert to numpy array, reshape to list of pixels and convert to float for k-means
+        return np.asarray(img).reshape(-1, 3).astype(float)
+
+    @staticmethod
+    def colours_from_clusters(
+        centroids: np.ndarray, counts: np.ndarray
+    ) -> tuple[list[tuple[int, int, int]], list[tuple[float, float, float]]]:
+        """Convert cluster centroids to RGB and HSV lists sorted by frequency.
+
+        Clusters without any members are dropped.
+        """
         # Sort colours by frequency (descending)
-        sorted_indices = np.argsort(-counts)
-        rgb_colours = [rgb_colours[i] for i in sorted_indices]
+        order = np.argsort(-counts, kind="stable")
+        order = order[counts[order] > 0]
 
-        # Convert RGB to HSV
-        hsv_colours = []
-        for r, g, b in rgb_colours:
-            # Normalize RGB to 0-1 for colorsys
-            h, s, v = colorsys.rgb_to_hsv(r / 255.0, g / 255.0, b / 255.0)
-            # Convert to degrees and percentages
-            hsv_colours.append((h * 360, s * 100, v * 100))
+        # Convert centroids back to integers for RGB, and RGB to HSV
+        rgb_array = np.asarray(centroids)[order].astype(int)
+        rgb_colours = [tuple(rgb) for rgb in rgb_array.tolist()]
+        hsv_colours = [tuple(hsv) for hsv in rgb_to_hsv(rgb_array).tolist()]
 
         return rgb_colours, hsv_colours
 
-    def process_track(self, file_paths: FilePaths, k, track) -> ImageColourData:
-        image_path = file_paths.track_image_path(track.id)
+    @staticmethod
+    def track_image(
+        file_paths: FilePaths, track_id: str, images: ImagePack | None = None
+    ) -> Path | memoryview:
+        """The image of a track: a memoryview from the pack if given, else the file path.
 
+        Raises:
+            FileNotFoundError: If the track has no image in the pack
+        """
+        if images is None:
+            return file_paths.track_image_path(track_id)
+        image = images.get(track_id)
+        if image is None:
+            raise FileNotFoundError(f"No image for track {track_id} in {images.path}")
+        return image
+
+    def process_track(
+        self, file_paths: FilePaths, k, track, images: ImagePack | None = None
+    ) -> ImageColourData:
         try:
-            rgbs, hsvs = self.extract_colours(image_path, k)
+            rgbs, hsvs = self.extract_colours(
+                self.track_image(file_paths, track.id, images), k)
             result = ImageColourData(
                 track_id=track.id, rgbs=rgbs, hsvs=hsvs, error=None
             )
@@ -109,3 +215,237 @@ class ImageProcessor:
                 track_id=track.id, rgbs=[], hsvs=[], error=str(e))
 
         return result
+
+    def process_image_bytes(self, image_bytes: bytes, k: int, track_id: str) -> ImageColourData:
+        """Process an image held in memory, e.g. straight from an HTTP response.
+
+        Args:
+            image_bytes: Content of the image file
+            k: Number of dominant colours to extract
+            track_id: ID of the track the image belongs to
+
+        Returns:
+            ImageColourData for the track, flagged with an error if the image
+            could not be processed
+        """
+        try:
+            rgbs, hsvs = self.colours_from_pixels(
+                self.load_pixels(io.BytesIO(image_bytes)), k)
+            return ImageColourData(track_id=track_id, rgbs=rgbs, hsvs=hsvs, error=None)
+        except Exception as e:
+            # Flag error but continue processing
+            return ImageColourData(track_id=track_id, rgbs=[], hsvs=[], error=str(e))
+
+    def cache_algorithm(self, batch_size: int = 1) -> str:
+        """Name of the extraction algorithm for colour cache keys (see ColourCache.key).
+
+        Args:
+            batch_size: Number of images clustered together
+
+        Returns:
+            The engine name, qualified by batching and decoding options that
+            change the results
+        """
+        algorithm = self.engine.name if batch_size == 1 else f"{self.engine.name}-batch"
+        if self.fast_decode:
+            algorithm += "-fast-decode"
+        return algorithm
+
+    def extraction_parameters(self, k: int, batch_size: int = 1) -> dict[str, Any]:
+        """The parameters that the extracted colours depend on.
+
+        Results extracted with other parameters can't be reused (see
+        ColourDataWriter and Manifest).
+
+        Args:
+            k: Number of dominant colours extracted per image
+            batch_size: Number of images clustered together
+
+        Returns:
+            Dictionary with k, the image size and the algorithm (see cache_algorithm)
+        """
+        return {"k": k, "image_size": self.image_size,
+                "algorithm": self.cache_algorithm(batch_size)}
+
+    def process_batch(
+        self,
+        file_paths: FilePaths,
+        k: int,
+        tracks: list[Track],
+        images: ImagePack | None = None,
+    ) -> list[ImageColourData]:
+        """Process the images for a batch of tracks with the engine's batch extraction.
+
+        Images that fail to load are flagged with an error, the rest are
+        clustered together.
+
+        Args:
+            file_paths: FilePaths instance for managing paths
+            k: Number of dominant colours to extract per image
+            tracks: Tracks in the batch
+            images: Pack to read the images from, instead of the image files
+
+        Returns:
+            ImageColourData for each track, in input order
+        """
+        results: list[ImageColourData | None] = [None] * len(tracks)
+        loaded_indices = []
+        loaded_pixels = []
+
+        for i, track in enumerate(tracks):
+            try:
+                loaded_pixels.append(
+                    self.load_pixels(self.track_image(file_paths, track.id, images)))
+                loaded_indices.append(i)
+            except Exception as e:
+                # Flag error but continue processing
+                results[i] = ImageColourData(
+                    track_id=track.id, rgbs=[], hsvs=[], error=str(e))
+
+        if loaded_pixels:
+            clusters = self.engine.extract_batch(np.stack(loaded_pixels), k)
+            for i, (centroids, counts) in zip(loaded_indices, clusters):
+                rgbs, hsvs = self.colours_from_clusters(centroids, counts)
+                results[i] = ImageColourData(
+                    track_id=tracks[i].id, rgbs=rgbs, hsvs=hsvs, error=None
+                )
+
+        return results
+
+    def process_tracks(
+        self,
+        file_paths: FilePaths,
+        k: int,
+        tracks: Iterable[Track],
+        workers: int | None = None,
+        batch_size: int = 1,
+        cache: ColourCache | None = None,
+        images: ImagePack | None = None,
+    ) -> Iterator[ImageColourData]:
+        """Process the images for many tracks, optionally across a process pool.
+
+        Results are yielded in the same order as the tracks, so the output is
+        deterministic regardless of the number of workers. Tracks sharing the
+        same album cover are processed once, and the result is fanned out to
+        all of them.
+
+        Args:
+            file_paths: FilePaths instance for managing paths
+            k: Number of dominant colours to extract per image
+            tracks: Tracks to process
+            workers: Number of worker processes (default: CPU count).
+                     With a single worker, tracks are processed in-process.
+            batch_size: Number of images to hand to the engine at once. For the
+                        k-means engine, batches are clustered together with the
+                        vectorized batch k-means, and with a batch size of 1 each
+                        image is clustered on its own with SciPy's k-means.
+            cache: Optional colour cache. Images found in the cache are not
+                   processed again, and new results are added to it.
+            images: Pack to read the images from, instead of the image files
+                    (see open_image_pack). It is left open, for the caller
+                    to close.
+
+        Yields:
+            ImageColourData for each track, in input order
+        """
+        tracks = list(tracks)
+        cover_groups = group_by_cover(tracks)
+        cover_results = self._process_cached(
+            file_paths, k, [group[0] for group in cover_groups], workers, batch_size, cache,
+            images)
+
+        # Covers are processed in order of first appearance, so the next cover
+        # result is always the one for the first track with an unseen cover
+        cover_of = {track.id: group[0].id for group in cover_groups for track in group}
+        results_by_cover: dict[str, ImageColourData] = {}
+        for track in tracks:
+            cover_id = cover_of[track.id]
+            if cover_id not in results_by_cover:
+                results_by_cover[cover_id] = next(cover_results)
+            yield replace(results_by_cover[cover_id], track_id=track.id)
+
+    def _process_cached(
+        self,
+        file_paths: FilePaths,
+        k: int,
+        tracks: list[Track],
+        workers: int | None,
+        batch_size: int,
+        cache: ColourCache | None,
+        images: ImagePack | None,
+    ) -> Iterator[ImageColourData]:
+        if cache is None:
+            yield from self._process_tracks(file_paths, k, tracks, workers, batch_size, images)
+            return
+
+        algorithm = self.cache_algorithm(batch_size)
+        keys: list[str | None] = []
+        cached = []
+        for track in tracks:
+            try:
+                key = cache.track_key(
+                    track.id, partial(self._read_track_image, file_paths, track.id, images),
+                    k, self.image_size, algorithm)
+            except OSError:
+                # Leave it to the processing to flag the error
+                keys.append(None)
+                cached.append(None)
+                continue
+            keys.append(key)
+            cached.append(cache.get(key))
+
+        misses = [track for track, hit in zip(tracks, cached) if hit is None]
+        miss_results = self._process_tracks(
+            file_paths, k, misses, workers, batch_size, images)
+
+        for track, key, hit in zip(tracks, keys, cached):
+            if hit is not None:
+                rgbs, hsvs = hit
+                yield ImageColourData(track_id=track.id, rgbs=rgbs, hsvs=hsvs, error=None)
+                continue
+
+            result = next(miss_results)
+            if key is not None and result.error is None:
+                cache.put(key, result.rgbs, result.hsvs)
+            yield result
+
+    def _read_track_image(
+        self, file_paths: FilePaths, track_id: str, images: ImagePack | None
+    ) -> bytes:
+        image = self.track_image(file_paths, track_id, images)
+        return image if images is not None else image.read_bytes()
+
+    def _process_tracks(
+        self,
+        file_paths: FilePaths,
+        k: int,
+        tracks: list[Track],
+        workers: int | None,
+        batch_size: int,
+        images: ImagePack | None = None,
+    ) -> Iterator[ImageColourData]:
+        batches = [tracks[i:i + batch_size] for i in range(0, len(tracks), batch_size)]
+        workers = workers or os.cpu_count() or 1
+        workers = min(workers, max(len(batches), 1))
+
+        if batch_size > 1:
+            process = partial(self.process_batch, file_paths, k, images=images)
+        else:
+            process = partial(self._process_single, file_paths, k, images=images)
+
+        if workers <= 1:
+            for batch in batches:
+                yield from process(batch)
+            return
+
+        # Hand out batches in chunks to amortise the inter-process overhead
+        chunksize = max(1, min(32, len(batches) // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for batch_results in executor.map(process, batches, chunksize=chunksize):
+                yield from batch_results
+
+    def _process_single(
+        self, file_paths: FilePaths, k: int, tracks: list[Track], images: ImagePack | None = None
+    ) -> list[ImageColourData]:
+        return [self.process_track(file_paths, k, track, images) for track in tracks]
+
@@ -0,0 +1,189 @@
+"""Manifest of the cover images in an output directory.
+
+get-playlist records the size, modification time and SHA-256 hash of every
+cover it saves in manifest.jsonl, one JSON record per line. process-images
+marks the covers it has extracted the colours of as processed, with the
+extraction parameters (see ImageProcessor.extraction_parameters), so a later
+run with the same parameters can tell from the manifest alone which covers are
+new or have changed since, without reading or hashing any image.
+
+Like image-colours.jsonl, the manifest is append-only: a later record for a
+track replaces any earlier one. The records that were replaced are dropped
+when the manifest is loaded, by rewriting the file.
+"""
+
+import hashlib
+import json
+import os
+from collections.abc import Iterable
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, TextIO
+
+from chromalist.files import FilePaths
+from chromalist.models import Track
+
+
+@dataclass(slots=True)
+class ManifestEntry:
+    track_id: str
+    size: int
+    mtime: float
+    sha256: str
+    # The extraction parameters the colours of this version of the image have
+    # been extracted with (None if they haven't been)
+    processed: dict[str, Any] | None = None
+
+
+class Manifest:
+    """Records of the cover images of an output directory, by track ID."""
+
+    def __init__(self, path: Path):
+        """Load the manifest (a missing file is an empty manifest).
+
+        If the file has records that were replaced by later ones (or a partial
+        line), it is compacted to one record per track.
+
+        Args:
+            path: Path to the manifest file
+        """
+        self.path = path
+        self.entries: dict[str, ManifestEntry] = {}
+        self.file: TextIO | None = None
+
+        if not path.exists():
+            return
+        line_count = 0
+        with open(path) as f:
+            for line in f:
+                line_count += 1
+                try:
+                    entry = ManifestEntry(**json.loads(line))
+                except (json.JSONDecodeError, TypeError):
+                    # Partial last line of an interrupted run
+                    continue
+                if not isinstance(entry.processed, dict):
+                    # Written before the parameters were recorded
+                    entry.processed = None
+                self.entries[entry.track_id] = entry
+        if line_count > len(self.entries):
+            self.compact()
+
+    @classmethod
+    def for_output_dir(cls, file_paths: FilePaths) -> "Manifest":
+        """The manifest of an output directory (manifest.jsonl)."""
+        return cls(file_paths.manifest_path())
+
+    def record(self, track_id: str, image_bytes: bytes, mtime: float) -> ManifestEntry:
+        """Record the current image of a track.
+
+        The image counts as processed (with the same parameters) if it is
+        the same image (by hash) that was processed before.
+
+        Args:
+            track_id: Spotify track ID
+            image_bytes: Content of the image
+            mtime: Modification time of the image
+
+        Returns:
+            The new entry
+        """
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        previous = self.entries.get(track_id)
+        entry = ManifestEntry(
+            track_id=track_id,
+            size=len(image_bytes),
+            mtime=mtime,
+            sha256=digest,
+            processed=previous.processed
+            if previous is not None and previous.sha256 == digest else None,
+        )
+        self._append(entry)
+        return entry
+
+    def share(self, source_track_id: str, track_id: str) -> None:
+        """Record that a track shares the image of another track.
+
+        Does nothing if the source track isn't in the manifest.
+        """
+        source = self.entries.get(source_track_id)
+        if source is None:
+            return
+        previous = self.entries.get(track_id)
+        self._append(replace(
+            source,
+            track_id=track_id,
+            processed=previous.processed
+            if previous is not None and previous.sha256 == source.sha256 else None,
+        ))
+
+    def mark_processed(self, track_ids: Iterable[str], parameters: dict[str, Any]) -> None:
+        """Mark the current images of tracks as processed (tracks not in the manifest are skipped).
+
+        Args:
+            track_ids: IDs of the processed tracks
+            parameters: Extraction parameters the colours were extracted with
+        """
+        for track_id in track_ids:
+            entry = self.entries.get(track_id)
+            if entry is not None and entry.processed != parameters:
+                self._append(replace(entry, processed=parameters))
+
+    def changed(self, tracks: Iterable[Track], parameters: dict[str, Any]) -> list[Track]:
+        """The tracks whose image is in the manifest but wasn't processed with the parameters.
+
+        These are the tracks whose image was added or replaced since the
+        colours were last extracted with these parameters.
+        """
+        return [
+            track for track in tracks
+            if (entry := self.entries.get(track.id)) is not None
+            and entry.processed != parameters
+        ]
+
+    def compact(self) -> None:
+        """Rewrite the manifest file with only the current record of each track.
+
+        The records are written to a new file that then replaces the old one,
+        so an interrupted rewrite leaves the old file intact.
+        """
+        self.close()
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary, "w") as f:
+            f.writelines(_record_line(entry) for entry in self.entries.values())
+        os.replace(temporary, self.path)
+
+    def _append(self, entry: ManifestEntry) -> None:
+        if self.file is None:
+            self.file = open(self.path, "a")
+            if self.file.tell() > 0:
+                # An interrupted run may have left a partial line; start on a fresh one
+                with open(self.path, "rb") as f:
+                    f.seek(-1, 2)
+                    if f.read(1) != b"\n":
+                        self.file.write("\n")
+        self.file.write(_record_line(entry))
+        self.entries[entry.track_id] = entry
+
+    def close(self) -> None:
+        """Close the manifest file."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self) -> "Manifest":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _record_line(entry: ManifestEntry) -> str:
+    """Encode a manifest entry as a line of the manifest file."""
+    return json.dumps({
+        "track_id": entry.track_id,
+        "size": entry.size,
+        "mtime": entry.mtime,
+        "sha256": entry.sha256,
+        "processed": entry.processed,
+    }) + "\n"
@@ -1,10 +1,22 @@
 import json
-from dataclasses import asdict, dataclass
+from collections.abc import Iterable
+from dataclasses import dataclass, field
 from typing import Any
+from json.decoder import scanstring
 from pathlib import Path
 
+# Encodes a single JSON value (strings take the C-accelerated fast path)
+_json_value = json.JSONEncoder().encode
 
-@dataclass
+
+@dataclass(slots=True)
+class AlbumImage:
+    url: str
+    width: int | None = None
+    height: int | None = None
+
+
+@dataclass(slots=True)
 class Track:
     id: str
     name: str
@@ -12,23 +24,125 @@ class Track:
     album_name: str
     album_art_url: str
     hue: float | None = None
+    # All the sizes of the album art Spotify offers
+    album_images: list[AlbumImage] = field(default_factory=list)
+    # (brightness, hue) key the track was last sorted by; derived from the
+    # colour data, so it doesn't take part in comparisons
+    sort_key: tuple[float, float] | None = field(default=None, compare=False)
+
+    def image_url(self, min_size: int | None = None) -> str:
+        """Choose the album art URL to download.
+
+        Args:
+            min_size: Minimum width and height in pixels. If given, the smallest
+                      image variant at least this large is chosen (or the largest
+                      variant if none is large enough).
+
+        Returns:
+            The image URL, album_art_url (the largest image) if min_size is None
+            or no image sizes are known
+        """
+        sized = [
+            image for image in self.album_images
+            if image.width is not None and image.height is not None
+        ]
+        if min_size is None or not sized:
+            return self.album_art_url
+
+        def size(image: AlbumImage) -> int:
+            return min(image.width, image.height)
+
+        large_enough = [image for image in sized if size(image) >= min_size]
+        if large_enough:
+            return min(large_enough, key=size).url
+        return max(sized, key=size).url
 
     def to_dict(self) -> dict[str, Any]:
         """Convert Track to dictionary for JSON serialization."""
-        return asdict(self)
+        return {
+            "id": self.id,
+            "name": self.name,
+            "artist": self.artist,
+            "album_name": self.album_name,
+            "album_art_url": self.album_art_url,
+            "hue": self.hue,
+            "album_images": [
+                {"url": image.url, "width": image.width, "height": image.height}
+                for image in self.album_images
+            ],
+            "sort_key": self.sort_key,
+        }
+
+    def to_json_line(self) -> str:
+        """Encode the track as a single line of JSON, equal to json.dumps(to_dict()).
+
+        The JSON is formatted directly from the fields, without building the
+        dictionary first.
+        """
+        images = ", ".join(
+            f'{{"url": {_json_value(image.url)}, "width": {_json_value(image.width)}, '
+            f'"height": {_json_value(image.height)}}}'
+            for image in self.album_images
+        )
+        sort_key = "null" if self.sort_key is None else _json_value(list(self.sort_key))
+        return (
+            f'{{"id": {_json_value(self.id)}, "name": {_json_value(self.name)}, '
+            f'"artist": {_json_value(self.artist)}, '
+            f'"album_name": {_json_value(self.album_name)}, '
+            f'"album_art_url": {_json_value(self.album_art_url)}, '
+            f'"hue": {_json_value(self.hue)}, "album_images": [{images}], '
+            f'"sort_key": {sort_key}}}'
+        )
+
+    @classmethod
+    def from_json_line(cls, line: str) -> "Track":
+        """Decode a track encoded with to_json_line."""
+        return cls.from_dict(json.loads(line))
 
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> "Track":
         """Create Track from dictionary."""
-        return cls(**data)
+        sort_key = data.get("sort_key")
+        return cls(
+            id=data["id"],
+            name=data["name"],
+            artist=data["artist"],
+            album_name=data["album_name"],
+            album_art_url=data["album_art_url"],
+            hue=data.get("hue"),
+            album_images=[AlbumImage(**image) for image in data.get("album_images", [])],
+            sort_key=tuple(sort_key) if sort_key is not None else None,
+        )
+
+
+def group_by_cover(tracks: Iterable[Track]) -> list[list[Track]]:
+    """Group tracks that share the same album cover art URL (see Playlist.cover_groups)."""
+    groups: dict[str, list[Track]] = {}
+    for track in tracks:
+        key = track.album_art_url or f"track:{track.id}"
+        groups.setdefault(key, []).append(track)
+    return list(groups.values())
+
+
+@dataclass(slots=True)
+class PlaylistDiff:
+    added: list[Track]
+    removed: list[Track]
 
+    @property
+    def unchanged(self) -> bool:
+        """True if no tracks were added or removed."""
+        return not self.added and not self.removed
 
-@dataclass
+
+@dataclass(slots=True)
 class Playlist:
     id: str
     name: str
     description: str
     tracks: list[Track]
+    # Spotify's version identifier of the playlist, changes with every edit
+    snapshot_id: str | None = None
 
     def to_dict(self) -> dict[str, Any]:
         """Convert Playlist to dictionary for JSON serialization."""
@@ -36,6 +150,7 @@ class Playlist:
             "id": self.id,
             "name": self.name,
             "description": self.description,
+            "snapshot_id": self.snapshot_id,
             "tracks": [track.to_dict() for track in self.tracks],
         }
 
@@ -48,22 +163,183 @@ class Playlist:
             name=data["name"],
             description=data["description"],
             tracks=tracks,
+            snapshot_id=data.get("snapshot_id"),
+        )
+
+    def diff(self, previous: "Playlist") -> PlaylistDiff:
+        """Compare the tracks of this playlist with an earlier version of it.
+
+        Args:
+            previous: The earlier version of the playlist
+
+        Returns:
+            PlaylistDiff with the tracks added since the previous version (in
+            this playlist's order) and the tracks removed from it (in the
+            previous version's order)
+        """
+        track_ids = {track.id for track in self.tracks}
+        previous_ids = {track.id for track in previous.tracks}
+        return PlaylistDiff(
+            added=[track for track in self.tracks if track.id not in previous_ids],
+            removed=[track for track in previous.tracks if track.id not in track_ids],
         )
 
+    def cover_groups(self) -> list[list[Track]]:
+        """Group tracks that share the same album cover art URL.
+
+        Groups are in order of first appearance in the playlist, and tracks
+        keep their playlist order within a group. Tracks without an album art
+        URL are each in a group of their own.
+        """
+        return group_by_cover(self.tracks)
+
     def to_json(self, filepath: str | Path) -> None:
-        """Save playlist to JSON file."""
-        with open(filepath, "w") as f:
-            json.dump(self.to_dict(), f, indent=2)
+        """Save playlist to JSON file.
+
+        The tracks are encoded and written one at a time, one per line (see
+        Track.to_json_line), so the playlist is never held in memory as a
+        tree of dictionaries.
+        """
+        _write_playlist_file(
+            filepath,
+            {"id": self.id, "name": self.name, "description": self.description,
+             "snapshot_id": self.snapshot_id},
+            (track.to_json_line() for track in self.tracks),
+        )
 
     @classmethod
     def from_json(cls, filepath: str | Path) -> "Playlist":
-        """Load playlist from JSON file."""
+        """Load playlist from JSON file.
+
+        The track dictionaries are replaced by Tracks in place, one pass over
+        the list, so each dictionary is dropped as soon as its Track exists.
+        """
         with open(filepath, "r") as f:
             data = json.load(f)
-        return cls.from_dict(data)
+        tracks = data["tracks"]
+        for i, track in enumerate(tracks):
+            tracks[i] = Track.from_dict(track)
+        return cls(
+            id=data["id"],
+            name=data["name"],
+            description=data["description"],
+            tracks=data["tracks"],
+            snapshot_id=data.get("snapshot_id"),
+        )
+
+
+@dataclass(slots=True)
+class PlaylistLines:
+    """A playlist file written by Playlist.to_json, with its tracks still encoded.
+
+    Tracks are only decoded when needed, so a large playlist can be compared
+    with another version and written back without decoding (or encoding
+    again) the tracks that didn't change.
+    """
+
+    id: str
+    name: str
+    description: str
+    # The JSON of each track (see Track.to_json_line)
+    track_lines: list[str]
+    snapshot_id: str | None = None
+
+    @classmethod
+    def read(cls, filepath: str | Path) -> "PlaylistLines | None":
+        """Read a playlist file, without decoding the tracks.
+
+        Returns:
+            The playlist, or None if the file isn't laid out one track per
+            line as Playlist.to_json writes it (use Playlist.from_json then)
+        """
+        with open(filepath, "r") as f:
+            lines = f.read().split("\n")
+
+        try:
+            tracks_start = lines.index('  "tracks": [')
+        except ValueError:
+            tracks_start = None
+        if tracks_start is not None:
+            if lines[-3:] != ["  ]", "}", ""]:
+                return None
+            track_lines = [line.strip().removesuffix(",") for line in lines[tracks_start + 1:-3]]
+        elif len(lines) >= 3 and lines[-3:-1] == ['  "tracks": []', "}"]:
+            tracks_start = len(lines) - 3
+            track_lines = []
+        else:
+            return None
+        if lines[0] != "{" or not all(line.startswith('{"id": ') for line in track_lines):
+            return None
+
+        try:
+            metadata = json.loads("{" + "".join(lines[1:tracks_start]).removesuffix(",") + "}")
+        except json.JSONDecodeError:
+            return None
+        return cls(
+            id=metadata["id"],
+            name=metadata["name"],
+            description=metadata["description"],
+            track_lines=track_lines,
+            snapshot_id=metadata.get("snapshot_id"),
+        )
+
+    @classmethod
+    def from_playlist(cls, playlist: Playlist) -> "PlaylistLines":
+        """Encode the tracks of a playlist."""
+        return cls(
+            id=playlist.id,
+            name=playlist.name,
+            description=playlist.description,
+            track_lines=[track.to_json_line() for track in playlist.tracks],
+            snapshot_id=playlist.snapshot_id,
+        )
+
+    def track_ids(self) -> list[str]:
+        """The track IDs, decoded from the start of each track line."""
+        # Lines start with '{"id": "'; scanstring decodes the string after the quote
+        return [scanstring(line, 8)[0] for line in self.track_lines]
+
+    def sort_keys(self) -> list[tuple[float, float] | None]:
+        """The sort keys, decoded from the end of each track line."""
+        sort_keys: list[tuple[float, float] | None] = []
+        for line in self.track_lines:
+            # Lines end with '"sort_key": null}' or '"sort_key": [brightness, hue]}'
+            value = line[line.rindex('"sort_key": ') + 12:-1]
+            if value == "null":
+                sort_keys.append(None)
+            else:
+                brightness, hue = value[1:-1].split(", ")
+                sort_keys.append((float(brightness), float(hue)))
+        return sort_keys
+
+    def to_json(self, filepath: str | Path) -> None:
+        """Save the playlist in the same format as Playlist.to_json."""
+        _write_playlist_file(
+            filepath,
+            {"id": self.id, "name": self.name, "description": self.description,
+             "snapshot_id": self.snapshot_id},
+            self.track_lines,
+        )
+
+
+def _write_playlist_file(
+    filepath: str | Path, metadata: dict[str, Any], track_lines: Iterable[str]
+) -> None:
+    """Write a playlist file with a line per track (see Playlist.to_json)."""
+    with open(filepath, "w") as f:
+        f.write("{\n")
+        for key, value in metadata.items():
+            f.write(f'  "{key}": {_json_value(value)},\n')
+        f.write('  "tracks": [')
+        separator = "\n    "
+        for line in track_lines:
+            f.write(separator)
+            f.write(line)
+            separator = ",\n    "
+        f.write("]\n}\n" if separator == "\n    " else "\n  ]\n}\n")
 
 
-@dataclass
+@dataclass(slots=True)
 class ImageColourData:
     track_id: str
     rgbs: list[tuple[int, int, int]]
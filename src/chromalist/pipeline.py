@@ -0,0 +1,257 @@
+"""Fused download -> colour extraction -> sort pipeline.
+
+The separate commands hand their data to each other through files. The
+pipeline overlaps the stages instead: album covers are downloaded into memory
+by a pool of threads, and each cover is handed to a pool of worker processes
+for colour extraction as soon as it arrives. The end-to-end time approaches
+that of the slowest stage rather than the sum of the stages.
+
+A Pipeline can sort many playlists with the same client, pools and cache,
+and covers shared between playlists are only downloaded and processed once.
+"""
+
+import os
+from collections.abc import Callable
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from chromalist.colour_cache import ColourCache
+from chromalist.colour_store import ColourDataWriter
+from chromalist.files import FilePaths, link_or_copy
+from chromalist.image_processing import ImageProcessor
+from chromalist.models import ImageColourData, Playlist, Track
+from chromalist.playlist_sorting import sort_tracks_by_hue
+from chromalist.spotify_client import SpotifyClient
+
+
+@dataclass
+class PipelineResult:
+    sorted_playlist: Playlist
+    # Tracks without valid colour data, left out of the sorted playlist
+    excluded_tracks: list[Track]
+    # Colour data of every track, in playlist order
+    colour_data: list[ImageColourData]
+
+
+class Pipeline:
+    """Download, colour extraction and sorting of playlists, sharing pools and results.
+
+    Use as a context manager, so the download and worker pools are shut down
+    at the end.
+    """
+
+    def __init__(
+        self,
+        client: SpotifyClient,
+        processor: ImageProcessor,
+        k: int = 3,
+        workers: int | None = None,
+        concurrency: int = 8,
+        min_image_size: int | None = None,
+        cache: ColourCache | None = None,
+    ):
+        """Create a pipeline and start its pools.
+
+        Args:
+            client: Spotify client to download the covers with
+            processor: Image processor for the colour extraction
+            k: Number of dominant colours to extract per image
+            workers: Number of worker processes (default: CPU count).
+                     With a single worker, colours are extracted in-process.
+            concurrency: Maximum number of covers downloaded at the same time
+            min_image_size: Download the smallest cover variant at least this
+                            large (see Track.image_url)
+            cache: Optional colour cache. Covers found in the cache are not
+                   processed again, and new results are added to it.
+        """
+        self.client = client
+        self.processor = processor
+        self.k = k
+        self.min_image_size = min_image_size
+        self.cache = cache
+        self.covers_downloaded = 0
+
+        workers = workers or os.cpu_count() or 1
+        self.downloader = ThreadPoolExecutor(max_workers=concurrency)
+        self.extractor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+        # Results and saved images of the covers seen so far, by album art URL
+        self._cover_results: dict[str, ImageColourData] = {}
+        self._cover_images: dict[str, Path] = {}
+
+    def run(
+        self,
+        playlist: Playlist,
+        file_paths: FilePaths | None = None,
+        progress: Callable[[int], None] | None = None,
+    ) -> PipelineResult:
+        """Download the covers of a playlist, extract their colours and sort the playlist.
+
+        Each unique cover is downloaded and processed once, and the result is
+        shared by all tracks with that cover, also in later runs.
+
+        Args:
+            playlist: Playlist to sort
+            file_paths: If given, also write the intermediate files the separate
+                        commands write: playlist.json, the {track-id}.jpg covers
+                        and image-colours.jsonl
+            progress: Called with the number of covers finished, as they finish
+
+        Returns:
+            PipelineResult with the sorted playlist and the colour data
+        """
+        cover_groups = {group[0].id: group for group in playlist.cover_groups()}
+        algorithm = self.processor.cache_algorithm()
+        cover_results: dict[str, ImageColourData] = {}
+
+        def save(cover: Track, image_path: Path) -> None:
+            for track in cover_groups[cover.id]:
+                link_or_copy(image_path, file_paths.track_image_path(track.id))
+
+        def fetch(cover: Track) -> bytes:
+            image_bytes = self.client.fetch_album_art(cover.image_url(self.min_image_size))
+            if file_paths is not None:
+                file_paths.save_track_image(cover.id, image_bytes)
+                save(cover, file_paths.track_image_path(cover.id))
+            return image_bytes
+
+        def finish(cover: Track, result: ImageColourData, key: str | None = None) -> None:
+            if self.cache is not None and key is not None and result.error is None:
+                self.cache.put(key, result.rgbs, result.hsvs)
+            cover_results[cover.id] = result
+            if result.error is None and cover.album_art_url:
+                self._cover_results[cover.album_art_url] = result
+                if file_paths is not None:
+                    self._cover_images[cover.album_art_url] = file_paths.track_image_path(cover.id)
+            if progress is not None:
+                progress(1)
+
+        if file_paths is not None:
+            playlist.to_json(file_paths.playlist_path())
+
+        downloads: dict[Future, Track] = {}
+        for group in cover_groups.values():
+            cover = group[0]
+            if not cover.album_art_url:
+                finish(cover, ImageColourData(
+                    track_id=cover.id, rgbs=[], hsvs=[], error="No album art URL"))
+                continue
+
+            # Covers seen in an earlier run are reused, unless the image is
+            # needed on disk and wasn't saved then
+            seen = self._cover_results.get(cover.album_art_url)
+            image_path = self._cover_images.get(cover.album_art_url)
+            if seen is not None and (file_paths is None or image_path is not None):
+                if file_paths is not None:
+                    save(cover, image_path)
+                finish(cover, replace(seen, track_id=cover.id))
+                continue
+
+            downloads[self.downloader.submit(fetch, cover)] = cover
+            self.covers_downloaded += 1
+
+        # Hand each cover to the extraction as soon as it is downloaded, and
+        # collect the extraction results as they finish
+        extractions: dict[Future, tuple[Track, str | None]] = {}
+        pending = set(downloads)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in extractions:
+                    cover, key = extractions.pop(future)
+                    finish(cover, future.result(), key)
+                    continue
+
+                cover = downloads.pop(future)
+                try:
+                    image_bytes = future.result()
+                except Exception as e:
+                    finish(cover, ImageColourData(
+                        track_id=cover.id, rgbs=[], hsvs=[], error=str(e)))
+                    continue
+
+                key = None
+                if self.cache is not None:
+                    key = self.cache.key(
+                        image_bytes, self.k, self.processor.image_size, algorithm)
+                    hit = self.cache.get(key)
+                    if hit is not None:
+                        rgbs, hsvs = hit
+                        finish(cover, ImageColourData(track_id=cover.id, rgbs=rgbs, hsvs=hsvs))
+                        continue
+
+                if self.extractor is None:
+                    finish(cover, self.processor.process_image_bytes(
+                        image_bytes, self.k, cover.id), key)
+                else:
+                    extraction = self.extractor.submit(
+                        self.processor.process_image_bytes, image_bytes, self.k, cover.id)
+                    extractions[extraction] = (cover, key)
+                    pending.add(extraction)
+
+        # Fan the cover results out to all tracks, in playlist order
+        cover_of = {
+            track.id: cover_id for cover_id, group in cover_groups.items() for track in group}
+        colour_data = [
+            replace(cover_results[cover_of[track.id]], track_id=track.id)
+            for track in playlist.tracks
+        ]
+
+        if file_paths is not None:
+            with ColourDataWriter(
+                file_paths.image_colours_jsonl_path(), append=False,
+                parameters=self.processor.extraction_parameters(self.k),
+            ) as writer:
+                for result in colour_data:
+                    writer.write(result)
+
+        sorted_playlist, excluded_tracks = sort_tracks_by_hue(
+            playlist, (result.to_dict() for result in colour_data))
+        return PipelineResult(
+            sorted_playlist=sorted_playlist,
+            excluded_tracks=excluded_tracks,
+            colour_data=colour_data,
+        )
+
+    def close(self) -> None:
+        """Shut down the download and worker pools."""
+        self.downloader.shutdown()
+        if self.extractor is not None:
+            self.extractor.shutdown()
+
+    def __enter__(self) -> "Pipeline":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def run_pipeline(
+    client: SpotifyClient,
+    playlist: Playlist,
+    processor: ImageProcessor,
+    k: int = 3,
+    workers: int | None = None,
+    concurrency: int = 8,
+    min_image_size: int | None = None,
+    file_paths: FilePaths | None = None,
+    cache: ColourCache | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> PipelineResult:
+    """Download the covers of a playlist, extract their colours and sort the playlist.
+
+    Runs a single playlist through a Pipeline; see Pipeline and Pipeline.run
+    for the arguments.
+
+    Returns:
+        PipelineResult with the sorted playlist and the colour data
+    """
+    with Pipeline(client, processor, k, workers, concurrency, min_image_size, cache) as pipeline:
+        return pipeline.run(playlist, file_paths, progress)
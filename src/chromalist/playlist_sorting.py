@@ -1,32 +1,160 @@
 """Playlist sorting by dominant colour hue."""
 
+import bisect
 import html
-import json
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Any
 
+import numpy as np
+
+from chromalist.catalog import Catalog
+from chromalist.colour import hsv_to_rgb, rgb_to_oklab
+from chromalist.colour_path import gradient_order
+from chromalist.colour_store import (
+    colour_data_path,
+    dominant_colours_from_array,
+    iter_colour_data,
+    load_colour_array,
+)
 from chromalist.files import FilePaths
-from chromalist.models import ImageColourData, Playlist
+from chromalist.models import Playlist, PlaylistLines, Track
+
+
+# Dominant colours less saturated than this (in %) are considered achromatic.
+# There is no science to this threshold, try to pick a reasonable value
+ACHROMATIC_SATURATION_THRESHOLD = 20.0
+
+
+class SortMode(str, Enum):
+    """How tracks are ordered by their dominant colours."""
+
+    # By hue, with the greys after the other colours (see hue_sort_keys)
+    hue = "hue"
+    # Along a short path through OKLab colour space, so that each cover is
+    # close in colour to the next (see colour_path.gradient_order)
+    gradient = "gradient"
+
+
+class TieBreaker(str, Enum):
+    """Orders tracks whose sort keys are equal (otherwise they keep their playlist order)."""
+
+    # More saturated colours first
+    saturation = "saturation"
+    # Darker colours first
+    value = "value"
+    # Track name, case-insensitively
+    name = "name"
+    # Artist, case-insensitively
+    artist = "artist"
+
+
+def hue_sort_keys(
+    hsvs: np.ndarray, saturation_threshold: float = ACHROMATIC_SATURATION_THRESHOLD
+) -> np.ndarray:
+    """Compute the sort keys for an array of dominant colours.
+
+    Args:
+        hsvs: Array of shape (n, 3) with the dominant HSV colour of each track
+        saturation_threshold: Colours less saturated than this (in %) are
+                              considered achromatic
+
+    Returns:
+        Array of shape (n, 2) with a (brightness, hue) sort key per track
+    """
+    hue, sat, val = hsvs[:, 0], hsvs[:, 1], hsvs[:, 2]
+
+    # Consider as anachromatic if saturation is low
+    anachromatic = sat < saturation_threshold
+
+    # We want to sort anachromatic colours (greyscale) to the end and separate the white (high v) from black (low v)
+    # Otherwise, sort by hue
+    return np.column_stack([
+        np.where(anachromatic, val, 0.0),
+        np.where(anachromatic, 0.0, hue),
+    ])
+
+
+def hue_sort_order(
+    keys: np.ndarray,
+    hsvs: np.ndarray,
+    tracks: Sequence[Track] = (),
+    tie_breakers: Sequence[TieBreaker] = (),
+) -> np.ndarray:
+    """Compute the order of tracks by their sort keys, with np.lexsort.
+
+    The sort is stable: tracks that are still tied after the tie-breakers
+    keep their order.
 
+    Args:
+        keys: Array of shape (n, 2) with the sort keys, from hue_sort_keys
+        hsvs: Array of shape (n, 3) with the dominant HSV colours the keys
+              were computed from
+        tracks: The n tracks (only needed for the name and artist tie-breakers)
+        tie_breakers: Tie-breakers, in order of precedence
 
-def sort_playlist_by_hue(file_paths: FilePaths) -> tuple[Playlist, int]:
+    Returns:
+        Array with the indices of the n tracks in sorted order
+    """
+    columns = []
+    for tie_breaker in tie_breakers:
+        if tie_breaker == TieBreaker.saturation:
+            columns.append(-hsvs[:, 1])
+        elif tie_breaker == TieBreaker.value:
+            columns.append(hsvs[:, 2])
+        elif tie_breaker == TieBreaker.name:
+            columns.append(np.array([track.name.casefold() for track in tracks], dtype=str))
+        elif tie_breaker == TieBreaker.artist:
+            columns.append(np.array([track.artist.casefold() for track in tracks], dtype=str))
+
+    # np.lexsort sorts by the last key first
+    return np.lexsort([*reversed(columns), keys[:, 1], keys[:, 0]])
+
+
+def sort_playlist_by_hue(
+    file_paths: FilePaths,
+    catalog: Catalog | None = None,
+    saturation_threshold: float = ACHROMATIC_SATURATION_THRESHOLD,
+    tie_breakers: Sequence[TieBreaker] = (),
+    mode: SortMode = SortMode.hue,
+    extraction_parameters: dict[str, Any] | None = None,
+) -> tuple[Playlist, int]:
     """
     Sort a playlist by the hue of the dominant colour in album cover art.
 
-    Reads playlist.json and image-colours.json from file_paths, sorts tracks
-    by the hue component (0-360°) of the most dominant colour, and writes
-    the sorted playlist to sorted-playlist.json.
+    Reads playlist.json and the colour data (image-colours.jsonl,
+    image-colours.json or image-colours.npy, whichever is newest) from
+    file_paths, sorts tracks by the hue component (0-360°) of the most
+    dominant colour, and writes the sorted playlist to sorted-playlist.json.
 
     Tracks without valid colour data (missing or with errors) are excluded
     from the sorted output.
 
     Args:
         file_paths: FilePaths instance for managing paths
+        catalog: If given, the colour data is looked up in the catalog
+                 instead of the colour data files
+        saturation_threshold: Colours less saturated than this (in %) are
+                              considered achromatic, and sorted by brightness
+                              after the chromatic ones
+        tie_breakers: Tie-breakers for tracks with equal sort keys, in order
+                      of precedence (by default they keep their playlist order)
+        mode: SortMode.hue, or SortMode.gradient to order the tracks along a
+              short path through colour space instead (the saturation
+              threshold and tie-breakers don't apply, and no sort keys are set)
+        extraction_parameters: Extraction parameters of the colours to look
+                               up in the catalog (see
+                               ImageProcessor.extraction_parameters);
+                               required with a catalog
 
     Returns:
         Tuple of (sorted_playlist, excluded_count) where excluded_count is the
         number of tracks that couldn't be sorted due to missing/invalid colour data
 
     Raises:
-        FileNotFoundError: If playlist.json or image-colours.json don't exist
+        FileNotFoundError: If playlist.json or the colour data don't exist
         json.JSONDecodeError: If JSON files are malformed
     """
     # Validate input files exist
@@ -37,59 +165,353 @@ def sort_playlist_by_hue(file_paths: FilePaths) -> tuple[Playlist, int]:
             "Please run 'get-playlist' first to download playlist data."
         )
 
-    colours_path = file_paths.image_colours_path()
-    if not colours_path.exists():
+    playlist = Playlist.from_json(playlist_path)
+    sorted_playlist, excluded_tracks = _sort_tracks(
+        file_paths, catalog, playlist, saturation_threshold, tie_breakers, mode,
+        extraction_parameters)
+    write_sorted_playlist(file_paths, sorted_playlist)
+
+    return sorted_playlist, len(excluded_tracks)
+
+
+@dataclass
+class IncrementalSortResult:
+    # Number of tracks in the sorted playlist
+    track_count: int
+    # Tracks placed into the sorted playlist, and tracks taken out of it
+    added_tracks: list[Track]
+    removed_tracks: list[Track]
+    # Tracks of the playlist without valid colour data
+    excluded_count: int
+
+
+def update_sorted_playlist(
+    file_paths: FilePaths,
+    catalog: Catalog | None = None,
+    saturation_threshold: float = ACHROMATIC_SATURATION_THRESHOLD,
+    extraction_parameters: dict[str, Any] | None = None,
+) -> IncrementalSortResult:
+    """Bring an existing sorted-playlist.json up to date with playlist.json.
+
+    Tracks that were removed from the playlist are taken out of the sorted
+    playlist, and only the tracks that aren't in it yet are sorted, then
+    placed among the others by binary search on the sort keys stored in
+    sorted-playlist.json (after any tracks with an equal key). The other
+    tracks keep their place, even if their colours have changed since;
+    sort_playlist_by_hue re-sorts everything.
+
+    Only the IDs and sort keys of the tracks are decoded from the playlist
+    files; the lines of the unchanged tracks are written back as they are,
+    and the files aren't rewritten at all if nothing changed.
+
+    Falls back to sort_playlist_by_hue if there is no sorted-playlist.json
+    yet, or if tracks need to be placed in one without sort keys (from
+    SortMode.gradient).
+
+    Args:
+        file_paths: FilePaths instance for managing paths
+        catalog: If given, the colour data is looked up in the catalog
+                 instead of the colour data files
+        saturation_threshold: Colours less saturated than this (in %) are
+                              considered achromatic; should be the threshold
+                              sorted-playlist.json was sorted with
+        extraction_parameters: Extraction parameters of the colours to look
+                               up in the catalog (see
+                               ImageProcessor.extraction_parameters);
+                               required with a catalog
+
+    Returns:
+        What changed in the sorted playlist
+
+    Raises:
+        FileNotFoundError: If playlist.json or the colour data don't exist
+        json.JSONDecodeError: If JSON files are malformed
+    """
+    playlist_path = file_paths.playlist_path()
+    if not playlist_path.exists():
         raise FileNotFoundError(
-            f"Image colours file not found: {colours_path}\n"
+            f"Playlist file not found: {playlist_path}\n"
+            "Please run 'get-playlist' first to download playlist data."
+        )
+
+    sorted_path = file_paths.sorted_playlist_path()
+    if not sorted_path.exists():
+        return _sort_from_scratch(
+            file_paths, catalog, saturation_threshold, extraction_parameters, None)
+
+    previous = _read_playlist_lines(sorted_path)
+    playlist = _read_playlist_lines(playlist_path)
+    playlist_ids = playlist.track_ids()
+    previous_ids = previous.track_ids()
+    in_playlist = set(playlist_ids)
+    in_previous = set(previous_ids)
+
+    removed_tracks = [
+        Track.from_json_line(line)
+        for line, track_id in zip(previous.track_lines, previous_ids)
+        if track_id not in in_playlist
+    ]
+    # Includes tracks excluded last time, in case they have colour data now
+    new_tracks = [
+        Track.from_json_line(line)
+        for line, track_id in zip(playlist.track_lines, playlist_ids)
+        if track_id not in in_previous
+    ]
+
+    added_tracks: list[Track] = []
+    excluded_tracks: list[Track] = []
+    if new_tracks:
+        sorted_new, excluded_tracks = _sort_tracks(
+            file_paths, catalog,
+            Playlist(id=playlist.id, name=playlist.name, description=playlist.description,
+                     tracks=new_tracks),
+            saturation_threshold, extraction_parameters=extraction_parameters)
+        added_tracks = sorted_new.tracks
+
+    if not (added_tracks or removed_tracks or playlist.name != previous.name
+            or playlist.description != previous.description or playlist.id != previous.id):
+        return IncrementalSortResult(
+            track_count=len(previous_ids),
+            added_tracks=[],
+            removed_tracks=[],
+            excluded_count=len(excluded_tracks),
+        )
+
+    sort_keys = previous.sort_keys()
+    if None in sort_keys:
+        return _sort_from_scratch(
+            file_paths, catalog, saturation_threshold, extraction_parameters, previous)
+
+    # Keep the tracks still on the playlist, as encoded lines
+    kept = [
+        (sort_key, line, track_id)
+        for sort_key, line, track_id in zip(sort_keys, previous.track_lines, previous_ids)
+        if track_id in in_playlist
+    ]
+
+    # Merge the sorted new tracks in: as they are in order, each search
+    # starts after the previous one's place
+    keys = [sort_key for sort_key, _, _ in kept]
+    position = 0
+    for track in added_tracks:
+        position = bisect.bisect_right(keys, track.sort_key, lo=position)
+        keys.insert(position, track.sort_key)
+        kept.insert(position, (track.sort_key, track.to_json_line(), track.id))
+        position += 1
+
+    PlaylistLines(
+        id=playlist.id,
+        name=playlist.name,
+        description=playlist.description,
+        track_lines=[line for _, line, _ in kept],
+    ).to_json(sorted_path)
+    _update_images_markdown(file_paths, kept, added_tracks)
+
+    return IncrementalSortResult(
+        track_count=len(kept),
+        added_tracks=added_tracks,
+        removed_tracks=removed_tracks,
+        excluded_count=len(excluded_tracks),
+    )
+
+
+def _sort_from_scratch(
+    file_paths: FilePaths,
+    catalog: Catalog | None,
+    saturation_threshold: float,
+    extraction_parameters: dict[str, Any] | None,
+    previous: PlaylistLines | None,
+) -> IncrementalSortResult:
+    """Sort the whole playlist, reporting the changes against the previous sorted playlist."""
+    sorted_playlist, excluded_count = sort_playlist_by_hue(
+        file_paths, catalog, saturation_threshold,
+        extraction_parameters=extraction_parameters)
+    previous_tracks = [Track.from_json_line(line) for line in previous.track_lines] \
+        if previous is not None else []
+    diff = sorted_playlist.diff(
+        Playlist(id="", name="", description="", tracks=previous_tracks))
+    return IncrementalSortResult(
+        track_count=len(sorted_playlist.tracks),
+        added_tracks=diff.added,
+        removed_tracks=diff.removed,
+        excluded_count=excluded_count,
+    )
+
+
+def _read_playlist_lines(path: Path) -> PlaylistLines:
+    """Read a playlist file with its tracks still encoded, whatever its layout."""
+    playlist = PlaylistLines.read(path)
+    if playlist is None:
+        playlist = PlaylistLines.from_playlist(Playlist.from_json(path))
+    return playlist
+
+
+def _update_images_markdown(
+    file_paths: FilePaths, tracks: list[tuple[Any, str, str]], added_tracks: list[Track]
+) -> None:
+    """Rewrite the images markdown for (sort key, track line, track ID) tuples, reusing its lines."""
+    markdown_path = file_paths.sorted_playlist_images_markdown_path()
+    lines: dict[str, str] = {}
+    if markdown_path.exists():
+        with open(markdown_path) as f:
+            for line in f:
+                lines[line[line.rfind('data-trackid="') + 14:line.rfind('"')]] = line
+    for track in added_tracks:
+        lines[track.id] = image_markdown_line(track)
+
+    with open(markdown_path, "w") as f:
+        for _, track_line, track_id in tracks:
+            line = lines.get(track_id)
+            f.write(line if line is not None
+                    else image_markdown_line(Track.from_json_line(track_line)))
+
+
+def _sort_tracks(
+    file_paths: FilePaths,
+    catalog: Catalog | None,
+    playlist: Playlist,
+    saturation_threshold: float = ACHROMATIC_SATURATION_THRESHOLD,
+    tie_breakers: Sequence[TieBreaker] = (),
+    mode: SortMode = SortMode.hue,
+    extraction_parameters: dict[str, Any] | None = None,
+) -> tuple[Playlist, list[Track]]:
+    """Sort the tracks of a playlist with the colour data of the output directory or catalog."""
+    if catalog is not None:
+        if extraction_parameters is None:
+            raise ValueError(
+                "The extraction parameters are required to look up colours in a catalog")
+        return sort_tracks_by_hue(
+            playlist, catalog.colour_data(playlist.tracks, **extraction_parameters),
+            saturation_threshold, tie_breakers, mode)
+
+    colours_path = colour_data_path(file_paths)
+    if colours_path is None:
+        raise FileNotFoundError(
+            f"Image colours file not found: {file_paths.image_colours_jsonl_path()} "
+            f"(or {file_paths.image_colours_path()})\n"
             "Please run 'process-images' first to extract colour data."
         )
 
-    # Load playlist
-    playlist = Playlist.from_json(playlist_path)
+    if colours_path.suffix == ".npy":
+        # Binary colour data: no per-track parsing
+        track_ids, dominant_hsvs = dominant_colours_from_array(load_colour_array(colours_path))
+        return sort_tracks_by_dominant_hsv(
+            playlist, track_ids, dominant_hsvs, saturation_threshold, tie_breakers, mode)
+    return sort_tracks_by_hue(
+        playlist, iter_colour_data(colours_path, {track.id for track in playlist.tracks}),
+        saturation_threshold, tie_breakers, mode)
+
+
+def sort_tracks_by_hue(
+    playlist: Playlist,
+    colour_data: Iterable[dict[str, Any]],
+    saturation_threshold: float = ACHROMATIC_SATURATION_THRESHOLD,
+    tie_breakers: Sequence[TieBreaker] = (),
+    mode: SortMode = SortMode.hue,
+) -> tuple[Playlist, list[Track]]:
+    """Sort the tracks of a playlist by the hue of their dominant colour.
+
+    Args:
+        playlist: Playlist to sort
+        colour_data: Colour data records (ImageColourData dicts), in any order.
+                     A later record for a track replaces an earlier one.
+        saturation_threshold: Colours less saturated than this (in %) are
+                              considered achromatic
+        tie_breakers: Tie-breakers for tracks with equal sort keys, in order
+                      of precedence
+        mode: How to order the tracks
 
-    # Load colour data
-    with open(colours_path, "r") as f:
-        colours_data_raw = json.load(f)
-
-    # Parse colour data into ImageColourData objects and create track_id -> hue mapping
-    sort_keys: dict[str, tuple[int | float, int | float]] = {}
-    for item in colours_data_raw:
-        colour_data = ImageColourData.from_dict(item)
-
-        # Skip tracks with errors or missing colour data
-        if colour_data.error is not None or not colour_data.hsvs:
-            continue
-
-        # Extract hue from the most dominant colour (first in list)
-        hue = colour_data.hsvs[0][0]  # First colour, first component (hue)
-        # First colour, second component (saturation)
-        sat = colour_data.hsvs[0][1]
-        val = colour_data.hsvs[0][2]  # First colour, third component (value)
-
-        # Consider as anachromatic if saturation is low
-        # There is no science to this threshold, try to pick a reasonable value
-        anachromatic = 1*(sat < 20)
-
-        # We want to sort anachromatic colours (greyscale) to the end and separate the white (high v) from black (low v)
-        # Otherwise, sort by hue
-        sort_keys[colour_data.track_id] = (
-            anachromatic*val, (1-anachromatic)*hue)
-
-    # Separate tracks into sortable and excluded
-    sortable_tracks = []
-    excluded_tracks = []
-
-    for track in playlist.tracks:
-        if track.id in sort_keys:
-            # Set the hue field for transparency
-            track.sort_key = sort_keys[track.id]
-            sortable_tracks.append(track)
+    Returns:
+        Tuple of (sorted_playlist, excluded_tracks), where excluded_tracks are
+        the tracks without valid colour data (missing or with errors)
+    """
+    # Collect the most dominant colour (first in list) of each track as one
+    # array, skipping tracks with errors or missing colour data
+    latest_hsvs: dict[str, list[float] | None] = {}
+    for item in colour_data:
+        if item.get("error") is not None or not item["hsvs"]:
+            latest_hsvs[item["track_id"]] = None
         else:
-            excluded_tracks.append(track)
+            latest_hsvs[item["track_id"]] = item["hsvs"][0]
+
+    track_ids = [track_id for track_id, hsv in latest_hsvs.items() if hsv is not None]
+    dominant_hsvs = [hsv for hsv in latest_hsvs.values() if hsv is not None]
+
+    return sort_tracks_by_dominant_hsv(
+        playlist, track_ids, np.array(dominant_hsvs, dtype=float).reshape(-1, 3),
+        saturation_threshold, tie_breakers, mode)
+
+
+def sort_tracks_by_dominant_hsv(
+    playlist: Playlist,
+    track_ids: list[str],
+    dominant_hsvs: np.ndarray,
+    saturation_threshold: float = ACHROMATIC_SATURATION_THRESHOLD,
+    tie_breakers: Sequence[TieBreaker] = (),
+    mode: SortMode = SortMode.hue,
+) -> tuple[Playlist, list[Track]]:
+    """Sort the tracks of a playlist by the hue of their dominant colour.
+
+    The tracks are matched to their colours, keyed and ordered on NumPy
+    arrays; Track objects are only touched to build the sorted playlist.
+
+    Args:
+        playlist: Playlist to sort
+        track_ids: IDs of the tracks with colour data. If an ID occurs more
+                   than once, the last colour is used.
+        dominant_hsvs: Array of shape (n, 3) with the dominant HSV colour of
+                       each of those tracks
+        saturation_threshold: Colours less saturated than this (in %) are
+                              considered achromatic
+        tie_breakers: Tie-breakers for tracks with equal sort keys, in order
+                      of precedence (by default they keep their playlist order)
+        mode: SortMode.hue, or SortMode.gradient to order the tracks along a
+              short path through colour space instead (the saturation
+              threshold and tie-breakers don't apply, and no sort keys are set)
+
+    Returns:
+        Tuple of (sorted_playlist, excluded_tracks), where excluded_tracks are
+        the tracks without colour data
+    """
+    tracks = playlist.tracks
+    playlist_ids = np.array([track.id for track in tracks], dtype=str)
+
+    # Find the (last) colour of each track of the playlist, by binary search
+    # in the unique colour track IDs
+    colour_ids = np.array(track_ids, dtype=str)
+    unique_ids, last_reversed = np.unique(colour_ids[::-1], return_index=True)
+    colour_rows = len(colour_ids) - 1 - last_reversed
+    positions = np.minimum(np.searchsorted(unique_ids, playlist_ids), max(len(unique_ids) - 1, 0))
+    if len(unique_ids) > 0:
+        found = unique_ids[positions] == playlist_ids
+    else:
+        found = np.zeros(len(tracks), dtype=bool)
 
-    # Sort tracks by hue (0-360°)
-    sortable_tracks.sort(key=lambda t: t.sort_key if t.sort_key is not None else (
-        float('inf'), float('inf')))
+    sortable = np.flatnonzero(found)
+    hsvs = np.asarray(dominant_hsvs, dtype=float).reshape(-1, 3)[colour_rows[positions[sortable]]]
+
+    if mode == SortMode.gradient:
+        order = gradient_order(rgb_to_oklab(hsv_to_rgb(hsvs)))
+        sortable_tracks = [tracks[index] for index in sortable[order].tolist()]
+        # Positions on a path aren't sort keys that could be compared
+        for track in sortable_tracks:
+            track.sort_key = None
+    else:
+        keys = hue_sort_keys(hsvs, saturation_threshold)
+        order = hue_sort_order(
+            keys, hsvs,
+            [tracks[index] for index in sortable.tolist()]
+            if {TieBreaker.name, TieBreaker.artist} & set(tie_breakers) else (),
+            tie_breakers,
+        )
+
+        # Materialize the sorted tracks, setting the sort key for transparency
+        sortable_tracks = [tracks[index] for index in sortable[order].tolist()]
+        sorted_keys = keys[order]
+        for track, sort_key in zip(
+                sortable_tracks, zip(sorted_keys[:, 0].tolist(), sorted_keys[:, 1].tolist())):
+            track.sort_key = sort_key
+    excluded_tracks = [tracks[index] for index in np.flatnonzero(~found).tolist()]
 
     # Create sorted playlist with same metadata but reordered tracks
     sorted_playlist = Playlist(
@@ -99,6 +521,16 @@ def sort_playlist_by_hue(file_paths: FilePaths) -> tuple[Playlist, int]:
         tracks=sortable_tracks
     )
 
+    return sorted_playlist, excluded_tracks
+
+
+def write_sorted_playlist(file_paths: FilePaths, sorted_playlist: Playlist) -> None:
+    """Write a sorted playlist to sorted-playlist.json and the images markdown.
+
+    Args:
+        file_paths: FilePaths instance for managing paths
+        sorted_playlist: The sorted playlist
+    """
     # Write sorted playlist to output file
     output_path = file_paths.sorted_playlist_path()
     sorted_playlist.to_json(output_path)
@@ -106,9 +538,11 @@ def sort_playlist_by_hue(file_paths: FilePaths) -> tuple[Playlist, int]:
     # Write a list of the images as markdown (so we can show them in the README)
     images_md_path = file_paths.sorted_playlist_images_markdown_path()
     with open(images_md_path, "w") as f:
-        for track in sortable_tracks:
-            alt_text = f"{track.name} ({track.artist})"
-            f.write(
-                f'<img src="{track.album_art_url}" alt="{html.escape(alt_text)}" width="64" height="64" data-trackid="{track.id}">\n')
+        for track in sorted_playlist.tracks:
+            f.write(image_markdown_line(track))
 
-    return sorted_playlist, len(excluded_tracks)
+
+def image_markdown_line(track: Track) -> str:
+    """The line of a track in the images markdown."""
+    alt_text = f"{track.name} ({track.artist})"
+    return f'<img src="{track.album_art_url}" alt="{html.escape(alt_text)}" width="64" height="64" data-trackid="{track.id}">\n'
@@ -0,0 +1,217 @@
+"""Rate-limit-aware scheduling of HTTP requests.
+
+The scheduler retries failed requests with exponential backoff and jitter,
+honours the Retry-After header of throttled (HTTP 429) responses, and adapts
+the number of requests in flight with AIMD (additive increase, multiplicative
+decrease): every request that isn't throttled raises the concurrency limit a
+little, and every throttled one halves it.
+"""
+
+import email.utils
+import random
+import threading
+import time
+from collections.abc import Callable, Mapping
+from datetime import datetime, timezone
+from typing import Any, TypeVar
+
+import requests
+from spotipy.exceptions import SpotifyException
+
+T = TypeVar("T")
+
+# Statuses worth retrying: throttling and transient server errors
+THROTTLED_STATUS = 429
+RETRY_STATUSES = frozenset({THROTTLED_STATUS, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header value.
+
+    Args:
+        value: Header value, either a number of seconds or an HTTP date
+
+    Returns:
+        Number of seconds to wait (never negative), or None if the value
+        is missing or malformed
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _status_and_headers(
+    result: Any, error: Exception | None
+) -> tuple[int | None, Mapping[str, str]]:
+    """Find the HTTP status and headers of a request's result or error."""
+    if isinstance(error, SpotifyException):
+        return error.http_status, error.headers or {}
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code, error.response.headers
+    if error is None and isinstance(result, requests.Response):
+        return result.status_code, result.headers
+    return None, {}
+
+
+class RequestScheduler:
+    """Shared scheduler for the HTTP requests of a client.
+
+    Requests are run through RequestScheduler.run from any number of threads;
+    the scheduler makes them wait for a free slot, so no more than the current
+    concurrency limit are in flight. The scheduler is thread safe.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        max_retry_after: float = 120.0,
+    ):
+        """Create a scheduler.
+
+        Args:
+            max_concurrency: Maximum (and initial) number of requests in flight
+            min_concurrency: The concurrency limit is never lowered below this
+            max_retries: Maximum number of retries per request
+            backoff_base: Backoff before the first retry in seconds; it doubles
+                          for every further retry
+            backoff_max: Maximum backoff in seconds
+            max_retry_after: Requests throttled for longer than this many seconds
+                             fail instead of waiting
+        """
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+
+        self._limit = float(max_concurrency)
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def concurrency(self) -> int:
+        """Current limit on the number of requests in flight."""
+        return int(self._limit)
+
+    def run(self, request: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a request, retrying it if it is throttled or fails transiently.
+
+        The request is retried on HTTP 429 and 5xx statuses (whether returned
+        as a requests.Response or raised as a requests.HTTPError or
+        spotipy.SpotifyException) and on connection errors and timeouts.
+
+        Args:
+            request: Function making the request, e.g. session.get
+            *args: Positional arguments for the request function
+            **kwargs: Keyword arguments for the request function
+
+        Returns:
+            The result of the request function. If the retries run out, the last
+            response is returned (or the last error raised).
+
+        Raises:
+            Exception: Whatever the request function raises, once retrying is
+                       pointless or the retries are used up
+        """
+        attempt = 0
+        while True:
+            started = self._acquire()
+            result, error = None, None
+            try:
+                result = request(*args, **kwargs)
+            except Exception as e:
+                error = e
+            finally:
+                self._release()
+
+            status, headers = _status_and_headers(result, error)
+            retry_after = None
+            if status == THROTTLED_STATUS:
+                retry_after = parse_retry_after(headers.get("Retry-After"))
+                self._on_throttled(started, retry_after)
+            else:
+                self._on_not_throttled()
+
+            retryable = status in RETRY_STATUSES or isinstance(
+                error, (requests.ConnectionError, requests.Timeout))
+            give_up = (
+                not retryable
+                or attempt >= self.max_retries
+                or (retry_after is not None and retry_after > self.max_retry_after)
+            )
+            if give_up:
+                if error is not None:
+                    raise error
+                return result
+
+            # Full jitter, so throttled clients don't all come back at once
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            if retry_after is not None:
+                delay += retry_after
+            attempt += 1
+            with self._condition:
+                self.retries += 1
+            time.sleep(delay)
+
+    def _acquire(self) -> float:
+        """Wait for a free slot (and the end of any throttling pause).
+
+        Returns:
+            The time the request started, on the time.monotonic clock
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    self._condition.wait(self._paused_until - now)
+                elif self._in_flight >= int(self._limit):
+                    self._condition.wait()
+                else:
+                    self._in_flight += 1
+                    self.requests += 1
+                    return now
+
+    def _release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def _on_not_throttled(self) -> None:
+        """Additive increase: about one more request in flight per full window."""
+        with self._condition:
+            self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+    def _on_throttled(self, started: float, retry_after: float | None) -> None:
+        """Multiplicative decrease, and pause everyone for Retry-After."""
+        with self._condition:
+            self.throttled += 1
+            # Requests that were already in flight when the limit was last
+            # lowered were throttled at the old rate; don't count them twice
+            if started >= self._last_decrease:
+                self._limit = max(self.min_concurrency, self._limit / 2)
+                self._last_decrease = time.monotonic()
+            if retry_after is not None and retry_after <= self.max_retry_after:
+                self._paused_until = max(
+                    self._paused_until, time.monotonic() + retry_after)
@@ -1,102 +1,257 @@
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import requests
 import spotipy
+from requests.adapters import HTTPAdapter
 from spotipy.oauth2 import SpotifyClientCredentials
 
 from chromalist.files import FilePaths
-from chromalist.models import Playlist, Track
+from chromalist.image_pack import ImagePack
+from chromalist.models import AlbumImage, Playlist, Track
+from chromalist.request_scheduler import RequestScheduler
+
+# Maximum number of tracks per page of the playlist items endpoint
+PAGE_SIZE = 100
+
+# Only request the fields chromalist uses (see the Web API's `fields` filter)
+TRACK_FIELDS = "track(id,name,artists(name),album(name,images(url,width,height)))"
+PLAYLIST_ITEMS_FIELDS = f"total,items({TRACK_FIELDS})"
+PLAYLIST_FIELDS = f"id,name,description,snapshot_id,tracks({PLAYLIST_ITEMS_FIELDS})"
 
 
 class SpotifyClient:
     """Client for interacting with Spotify API."""
 
-    def __init__(self):
+    def __init__(
+        self,
+        max_connections: int = 16,
+        scheduler: RequestScheduler | None = None,
+        api_url: str | None = None,
+        access_token: str | None = None,
+    ):
         """Initialize Spotify client with Client Credentials authentication.
 
-        Environment variables required:
+        Environment variables required (unless an access token is given):
         - SPOTIPY_CLIENT_ID: Your Spotify application client ID
         - SPOTIPY_CLIENT_SECRET: Your Spotify application client secret
+
+        Args:
+            max_connections: Number of keep-alive connections pooled per host,
+                             and the maximum number of requests in flight
+            scheduler: Scheduler for the API requests and image downloads
+                       (default: a new one allowing max_connections requests
+                       in flight)
+            api_url: Base URL of the Web API (default: Spotify's), e.g. that of
+                     a local stand-in server (see fake_spotify)
+            access_token: Access token to use instead of authenticating with
+                          Client Credentials
         """
-        auth_manager = SpotifyClientCredentials()
+        # Shared session, so requests reuse connections instead of paying for
+        # a new TCP+TLS handshake each time. It has no retries of its own:
+        # the scheduler retries and backs off when Spotify throttles us.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.scheduler = scheduler or RequestScheduler(max_concurrency=max_connections)
 
-        self.sp = spotipy.Spotify(auth_manager=auth_manager)
+        if access_token is not None:
+            self.sp = spotipy.Spotify(auth=access_token, requests_session=self.session)
+        else:
+            auth_manager = SpotifyClientCredentials()
+            self.sp = spotipy.Spotify(auth_manager=auth_manager, requests_session=self.session)
+        if api_url is not None:
+            self.sp.prefix = api_url.rstrip("/") + "/"
 
-    def get_playlist(self, playlist_id: str) -> Playlist:
-        """Fetch playlist metadata and tracks from Spotify.
+    def get_playlist_snapshot(self, playlist_id: str) -> tuple[str, str]:
+        """Fetch only the ID and current snapshot ID of a playlist.
+
+        This is a single small request, so it is a cheap way to find out
+        whether a playlist has changed since it was last downloaded.
 
         Args:
             playlist_id: Spotify playlist ID or full URI
 
         Returns:
-            Playlist object containing metadata and tracks
+            Tuple of (playlist ID, snapshot ID)
 
         Raises:
             spotipy.SpotifyException: If playlist is not found or inaccessible
         """
-        # Fetch playlist details
-        playlist_data = self.sp.playlist(playlist_id)
+        playlist_data = self.scheduler.run(
+            self.sp.playlist, playlist_id, fields="id,snapshot_id")
+        return playlist_data["id"], playlist_data["snapshot_id"]
 
-        # Extract tracks
-        tracks = []
-        results = playlist_data["tracks"]
+    def get_playlist(self, playlist_id: str, concurrency: int = 4) -> Playlist:
+        """Fetch playlist metadata and tracks from Spotify.
 
-        while results:
-            for item in results["items"]:
-                if item["track"] is None:
-                    # Skip local files or unavailable tracks
-                    continue
+        Only the fields chromalist uses are requested. The first page of tracks
+        comes with the playlist and tells the total number of tracks; the
+        remaining pages are then fetched concurrently by offset.
 
-                track_data = item["track"]
+        Args:
+            playlist_id: Spotify playlist ID or full URI
+            concurrency: Maximum number of pages fetched at the same time
 
-                # Get album art URL (prefer largest image)
-                album_images = track_data["album"]["images"]
-                album_art_url = album_images[0]["url"] if album_images else ""
+        Returns:
+            Playlist object containing metadata and tracks (in playlist order)
+
+        Raises:
+            spotipy.SpotifyException: If playlist is not found or inaccessible
+        """
+        # Fetch playlist details and the first page of tracks
+        playlist_data = self.scheduler.run(
+            self.sp.playlist, playlist_id, fields=PLAYLIST_FIELDS)
+        first_page = playlist_data["tracks"]
 
-                # Get artist name (first artist if multiple)
-                artist_name = track_data["artists"][0]["name"] if track_data["artists"] else "Unknown"
+        # Fetch the remaining pages by offset, in pages as large as the first
+        # one (the server's page size); map keeps them in playlist order
+        first_count = len(first_page["items"])
+        page_size = min(first_count, PAGE_SIZE) or PAGE_SIZE
+        offsets = range(first_count, first_page.get("total", first_count), page_size)
 
-                track = Track(
-                    id=track_data["id"],
-                    name=track_data["name"],
-                    artist=artist_name,
-                    album_name=track_data["album"]["name"],
-                    album_art_url=album_art_url,
-                )
-                tracks.append(track)
+        def fetch_page(offset: int) -> dict:
+            return self.scheduler.run(
+                self.sp.playlist_items,
+                playlist_id, fields=PLAYLIST_ITEMS_FIELDS, limit=page_size, offset=offset)
 
-            # Check if there are more tracks to fetch
-            if results["next"]:
-                results = self.sp.next(results)
-            else:
-                results = None
+        pages = [first_page]
+        if offsets:
+            with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(offsets)))) as executor:
+                pages.extend(executor.map(fetch_page, offsets))
+
+        tracks = []
+        for page in pages:
+            for item in page["items"]:
+                if item["track"] is None:
+                    # Skip local files or unavailable tracks
+                    continue
+                tracks.append(self._track_from_data(item["track"]))
 
         playlist = Playlist(
             id=playlist_data["id"],
             name=playlist_data["name"],
             description=playlist_data.get("description", ""),
             tracks=tracks,
+            snapshot_id=playlist_data.get("snapshot_id"),
         )
 
         return playlist
 
-    def download_album_art(self, track_id: str, image_url: str, file_paths: FilePaths) -> None:
+    @staticmethod
+    def _track_from_data(track_data: dict) -> Track:
+        """Create a Track from a Spotify track object."""
+        # Get album art URL (prefer largest image), and keep all sizes
+        album_images = track_data["album"]["images"]
+        album_art_url = album_images[0]["url"] if album_images else ""
+
+        # Get artist name (first artist if multiple)
+        artist_name = track_data["artists"][0]["name"] if track_data["artists"] else "Unknown"
+
+        return Track(
+            id=track_data["id"],
+            name=track_data["name"],
+            artist=artist_name,
+            album_name=track_data["album"]["name"],
+            album_art_url=album_art_url,
+            album_images=[
+                AlbumImage(
+                    url=image["url"],
+                    width=image.get("width"),
+                    height=image.get("height"),
+                )
+                for image in album_images
+            ],
+        )
+
+    def download_album_art(
+        self,
+        track_id: str,
+        image_url: str,
+        file_paths: FilePaths,
+        pack: ImagePack | None = None,
+    ) -> None:
         """Download album art image and save to file.
 
         Args:
             track_id: Spotify track ID (used for filename)
             image_url: URL of the album art image
             file_paths: FilePaths instance for managing paths
+            pack: If given, the image is appended to this pack instead of
+                  being saved as a file
 
         Raises:
-            requests.RequestException: If download fails
+            requests.RequestException: If download fails (after retrying
+                                       throttled and transient failures)
         """
         if not image_url:
             return
 
-        response = requests.get(image_url, timeout=10)
-        response.raise_for_status()
+        image_bytes = self.fetch_album_art(image_url)
+        if pack is not None:
+            pack.add(track_id, image_bytes)
+            return
 
         # Save as JPEG
-        filepath = file_paths.track_image_path(track_id)
-        with open(filepath, "wb") as f:
-            f.write(response.content)
+        file_paths.save_track_image(track_id, image_bytes)
+
+    def fetch_album_art(self, image_url: str) -> bytes:
+        """Download an album art image into memory.
+
+        Args:
+            image_url: URL of the album art image
+
+        Returns:
+            Content of the image file
+
+        Raises:
+            requests.RequestException: If download fails (after retrying
+                                       throttled and transient failures)
+        """
+        response = self.scheduler.run(self.session.get, image_url, timeout=10)
+        response.raise_for_status()
+        return response.content
+
+    def download_album_arts(
+        self,
+        downloads: Iterable[tuple[str, str]],
+        file_paths: FilePaths,
+        concurrency: int = 8,
+        pack: ImagePack | None = None,
+    ) -> Iterator[tuple[str, Exception | None]]:
+        """Download many album art images concurrently.
+
+        At most `concurrency` downloads are in flight at a time, all sharing
+        the client's pooled session. The client's scheduler lowers that when
+        the server throttles the downloads.
+
+        Args:
+            downloads: (track_id, image_url) pairs to download
+            file_paths: FilePaths instance for managing paths
+            concurrency: Maximum number of downloads in flight
+            pack: If given, the images are appended to this pack instead of
+                  being saved as files
+
+        Yields:
+            (track_id, error) as each download finishes, in completion order.
+            The error is None if the download succeeded.
+        """
+        downloads = list(downloads)
+        if concurrency <= 1:
+            for track_id, image_url in downloads:
+                try:
+                    self.download_album_art(track_id, image_url, file_paths, pack)
+                    yield track_id, None
+                except Exception as e:
+                    yield track_id, e
+            return
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {
+                executor.submit(
+                    self.download_album_art, track_id, image_url, file_paths, pack): track_id
+                for track_id, image_url in downloads
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.exception()
@@ -0,0 +1,106 @@
+"""Tests for the benchmarks."""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from chromalist.benchmarks import (
+    StageTiming,
+    benchmark_engines,
+    benchmark_pipeline,
+    compare_decode,
+    find_regressions,
+    load_baseline,
+    load_test_client,
+    save_baseline,
+    synthetic_playlist,
+)
+from chromalist.colour_engines import ENGINES
+
+
+@pytest.fixture
+def cover_images(tmp_path):
+    """Create a few 640x640 covers with a dominant colour and some noise."""
+    rng = np.random.default_rng(0)
+    image_paths = []
+    for i, colour in enumerate([(230, 20, 20), (20, 200, 40), (128, 128, 128)]):
+        pixels = np.clip(rng.normal(colour, 8, (640, 640, 3)), 0, 255).astype(np.uint8)
+        path = tmp_path / f"{i}.jpg"
+        Image.fromarray(pixels).save(path, "JPEG")
+        image_paths.append(path)
+    return image_paths
+
+
+def test_benchmark_engines(cover_images):
+    """Test that the benchmark reports speed and agreement for every engine."""
+    results = benchmark_engines(cover_images, list(ENGINES), k=1)
+
+    assert [r.engine for r in results] == list(ENGINES)
+    for result in results:
+        assert result.images == 3
+        assert result.images_per_second > 0
+        assert result.hue_agreement == 1.0
+
+
+def test_compare_decode(cover_images):
+    """Test that the fast decode path is compared on latency and colour drift."""
+    result = compare_decode(cover_images, k=1)
+
+    assert result.images == 3
+    assert result.full_ms > 0
+    assert result.fast_ms > 0
+    assert result.mean_pixel_drift < 5
+    assert result.mean_dominant_rgb_drift < 5
+    assert result.mean_dominant_hue_drift < 5
+
+
+def test_benchmark_pipeline_times_every_stage(tmp_path):
+    """Test that the offline pipeline benchmark times each stage."""
+    timings = benchmark_pipeline(tmp_path, images=2, tracks=50, repeat=1, image_size=64)
+
+    assert [t.stage for t in timings] == [
+        "decode", "kmeans", "hsv", "json_dump", "json_load", "sort"]
+    assert [t.items for t in timings] == [2, 2, 2, 50, 50, 50]
+    assert all(t.seconds > 0 for t in timings)
+
+
+def test_synthetic_playlist_shares_covers():
+    """Test that synthetic tracks are spread over the requested number of covers."""
+    playlist = synthetic_playlist(100, n_covers=10)
+
+    assert len(playlist.tracks) == 100
+    assert len({t.id for t in playlist.tracks}) == 100
+    assert len(playlist.cover_groups()) <= 10
+
+
+def test_baseline_round_trip(tmp_path):
+    """Test that timings survive saving and loading a baseline."""
+    timings = [StageTiming("decode", 10, 0.5), StageTiming("sort", 1000, 0.1)]
+    path = tmp_path / "baseline.json"
+
+    save_baseline(timings, path, config={"images": 10})
+
+    assert load_baseline(path) == timings
+
+
+def test_find_regressions_compares_time_per_item():
+    """Test that only stages slower per item than the tolerance are reported."""
+    baseline = [StageTiming("decode", 10, 1.0), StageTiming("sort", 1000, 1.0)]
+    timings = [StageTiming("decode", 20, 2.1), StageTiming("sort", 1000, 1.5)]
+
+    regressions = find_regressions(timings, baseline, tolerance=0.2)
+
+    assert [r.stage for r in regressions] == ["sort"]
+    assert regressions[0].slowdown == pytest.approx(1.5)
+
+
+def test_load_test_client(tmp_path):
+    """Test that the client load test reports the throughput against the stand-in server."""
+    result = load_test_client(tmp_path, tracks=50, covers=10, latency=0.0, page_size=20)
+
+    assert result.tracks == 50
+    assert result.images == 10
+    assert result.image_errors == 0
+    assert result.tracks_per_second > 0
+    assert result.images_per_second > 0
+    assert result.requests == 3 + 10
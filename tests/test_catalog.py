@@ -0,0 +1,167 @@
+"""Tests for the SQLite catalog shared across playlists."""
+
+import io
+
+import pytest
+from PIL import Image
+
+from chromalist.catalog import Catalog, cover_hash
+from chromalist.files import FilePaths
+from chromalist.image_processing import ImageProcessor
+from chromalist.models import AlbumImage, Playlist, Track
+from chromalist.playlist_sorting import sort_playlist_by_hue
+
+
+def jpeg_bytes(colour):
+    """Encode a single-colour image as JPEG."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (100, 100), colour).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def make_track(track_id, cover):
+    """Create a track with the given ID and cover name."""
+    return Track(id=track_id, name=f"Song {track_id}", artist="Artist", album_name=cover,
+                 album_art_url=f"https://example.com/{cover}.jpg")
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """Create a catalog in a temporary directory."""
+    with Catalog(tmp_path / "catalog.sqlite") as catalog:
+        yield catalog
+
+
+def test_playlist_round_trip(catalog):
+    """Test storing playlists that share tracks, and loading them back."""
+    track = make_track("t1", "red")
+    track.album_images = [AlbumImage(url="https://example.com/red-64.jpg", width=64, height=64)]
+    first = Playlist(id="p1", name="First", description="", snapshot_id="s1",
+                     tracks=[track, make_track("t2", "blue")])
+    second = Playlist(id="p2", name="Second", description="Desc",
+                      tracks=[make_track("t3", "green"), track])
+
+    catalog.add_playlist(first)
+    catalog.add_playlist(second)
+
+    assert catalog.get_playlist("p1") == first
+    assert catalog.get_playlist("p2") == second
+    assert catalog.get_playlist("missing") is None
+    assert catalog.playlists_with_track("t1") == ["p1", "p2"]
+    assert catalog.playlists_with_track("t2") == ["p1"]
+
+    # Updating a playlist replaces its tracks
+    first.tracks = first.tracks[1:]
+    catalog.add_playlist(first)
+    assert catalog.get_playlist("p1") == first
+    assert catalog.playlists_with_track("t1") == ["p2"]
+
+
+def test_covers_by_url_and_hash(catalog):
+    """Test that covers are found by URL, stored once, and forgotten when the art changes."""
+    playlist = Playlist(id="p1", name="Playlist", description="",
+                        tracks=[make_track("t1", "red"), make_track("t2", "red")])
+    catalog.add_playlist(playlist)
+    image = jpeg_bytes((255, 0, 0))
+
+    digest = catalog.add_cover(image, ["t1", "t2"], "https://example.com/red.jpg")
+
+    assert digest == cover_hash(image)
+    assert catalog.cover("https://example.com/red.jpg") == image
+    assert catalog.cover("https://example.com/other.jpg") is None
+    assert catalog.db.execute("SELECT COUNT(*) FROM covers").fetchone()[0] == 1
+
+    # Re-adding keeps the cover, unless the album art URL changed
+    playlist.tracks[1] = make_track("t2", "blue")
+    catalog.add_playlist(playlist)
+    assert dict(catalog.db.execute("SELECT id, cover_hash FROM tracks")) == {
+        "t1": digest, "t2": None}
+
+
+def test_colours_shared_across_playlists(tmp_path, catalog):
+    """Test that a cover processed for one playlist is reused, and sorted from, in another."""
+    colours = {"red": (255, 0, 0), "green": (0, 255, 0), "blue": (0, 0, 255)}
+    (tmp_path / "second").mkdir()
+    first_paths, second_paths = FilePaths(tmp_path), FilePaths(tmp_path / "second")
+    first = Playlist(id="p1", name="First", description="",
+                     tracks=[make_track("t1", "blue"), make_track("t2", "red")])
+    second = Playlist(id="p2", name="Second", description="",
+                      tracks=[make_track("t3", "blue"), make_track("t4", "green"),
+                              make_track("t5", "missing")])
+    processor = ImageProcessor()
+
+    for playlist, file_paths in [(first, first_paths), (second, second_paths)]:
+        playlist.to_json(file_paths.playlist_path())
+        for track in playlist.tracks:
+            if track.album_name in colours:
+                file_paths.track_image_path(track.id).write_bytes(
+                    jpeg_bytes(colours[track.album_name]))
+        catalog.add_playlist(playlist)
+        catalog.add_track_images(file_paths, playlist.tracks)
+        list(processor.process_tracks(file_paths, 1, playlist.tracks[:2], workers=1,
+                                      cache=catalog))
+
+    # The blue cover was only processed for the first playlist
+    assert (catalog.hits, catalog.misses) == (1, 3)
+    parameters = processor.extraction_parameters(1)
+    assert [data["track_id"] for data in catalog.colour_data(second.tracks, **parameters)] == [
+        "t3", "t4"]
+
+    sorted_playlist, excluded_count = sort_playlist_by_hue(
+        second_paths, catalog, extraction_parameters=parameters)
+
+    assert [track.id for track in sorted_playlist.tracks] == ["t4", "t3"]
+    assert excluded_count == 1
+
+
+def test_colour_data_with_extraction_parameters(tmp_path, catalog):
+    """Test that only colours extracted with the requested parameters are used."""
+    file_paths = FilePaths(tmp_path)
+    playlist = Playlist(id="p1", name="Playlist", description="",
+                        tracks=[make_track("t1", "red"), make_track("t2", "red")])
+    playlist.to_json(file_paths.playlist_path())
+    image = Image.new("RGB", (100, 100), (255, 0, 0))
+    image.paste((0, 0, 255), (0, 0, 50, 100))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    for track in playlist.tracks:
+        file_paths.track_image_path(track.id).write_bytes(buffer.getvalue())
+    catalog.add_playlist(playlist)
+    assert catalog.add_track_images(file_paths, playlist.tracks) == 2
+    assert catalog.db.execute("SELECT COUNT(*) FROM covers").fetchone()[0] == 1
+    assert not catalog.db.in_transaction
+
+    processor = ImageProcessor()
+    list(processor.process_tracks(file_paths, 2, playlist.tracks, workers=1, cache=catalog))
+    list(processor.process_tracks(file_paths, 1, playlist.tracks, workers=1, cache=catalog))
+
+    for k in [1, 2]:
+        colour_data = list(catalog.colour_data(
+            playlist.tracks, **processor.extraction_parameters(k)))
+        assert [data["track_id"] for data in colour_data] == ["t1", "t2"]
+        assert all(len(data["rgbs"]) == k for data in colour_data)
+    assert list(catalog.colour_data(playlist.tracks, **processor.extraction_parameters(3))) == []
+
+    with pytest.raises(ValueError, match="extraction parameters"):
+        sort_playlist_by_hue(file_paths, catalog)
+
+
+def test_track_images_are_hashed_once(tmp_path, catalog, monkeypatch):
+    """Test that colour lookups reuse the hashes of the images stored from the output directory."""
+    file_paths = FilePaths(tmp_path)
+    tracks = [make_track("t1", "red"), make_track("t2", "red"), make_track("t3", "blue")]
+    catalog.add_playlist(Playlist(id="p1", name="Playlist", description="", tracks=tracks))
+    for track, colour in zip(tracks, [(255, 0, 0), (255, 0, 0), (0, 0, 255)]):
+        file_paths.track_image_path(track.id).write_bytes(jpeg_bytes(colour))
+
+    hashed = []
+    monkeypatch.setattr(
+        "chromalist.catalog.cover_hash",
+        lambda image_bytes: hashed.append(image_bytes) or cover_hash(image_bytes))
+    assert catalog.add_track_images(file_paths, tracks) == 3
+    results = list(ImageProcessor().process_tracks(file_paths, 1, tracks, workers=1, cache=catalog))
+
+    assert len(hashed) == 3
+    assert [result.error for result in results] == [None, None, None]
+    assert catalog.db.execute("SELECT COUNT(*) FROM covers").fetchone()[0] == 2
+    assert len(catalog) == 2
@@ -0,0 +1,150 @@
+"""Tests for the command line interface."""
+
+import io
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import Mock
+
+from PIL import Image
+from typer.testing import CliRunner
+
+from chromalist.cli import _download_covers, app
+from chromalist.colour_store import iter_colour_data, read_parameters
+from chromalist.files import FilePaths
+from chromalist.manifest import Manifest
+from chromalist.models import Playlist, Track
+
+runner = CliRunner()
+
+
+def jpeg_bytes(colour):
+    """Encode a single-colour image as JPEG."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (100, 100), colour).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def write_playlist(file_paths, colours):
+    """Write a playlist with a single-colour cover per track."""
+    tracks = []
+    for i, colour in enumerate(colours):
+        track = Track(id=f"t{i}", name=f"Song {i}", artist="Artist", album_name=f"Album {i}",
+                      album_art_url=f"https://example.com/{i}.jpg")
+        file_paths.track_image_path(track.id).write_bytes(jpeg_bytes(colour))
+        tracks.append(track)
+    Playlist(id="p", name="P", description="", tracks=tracks).to_json(file_paths.playlist_path())
+
+
+def test_process_images_resumes_only_with_the_same_parameters(tmp_path):
+    """Test that a run with another k processes all tracks again instead of resuming."""
+    file_paths = FilePaths(tmp_path)
+    write_playlist(file_paths, [(255, 0, 0), (0, 0, 255)])
+    command = ["process-images", "--output-dir", str(tmp_path), "--no-cache", "--workers", "1"]
+
+    result = runner.invoke(app, command + ["--k", "1"])
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(app, command + ["--k", "1"])
+    assert result.exit_code == 0, result.output
+    assert "Resuming: 2 track(s) already processed" in result.output
+
+    result = runner.invoke(app, command + ["--k", "2"])
+    assert result.exit_code == 0, result.output
+    assert "Resuming" not in result.output
+    assert "Successfully processed 2/2 images" in result.output
+
+    colours_path = file_paths.image_colours_jsonl_path()
+    assert read_parameters(colours_path)["k"] == 2
+    records = list(iter_colour_data(colours_path))
+    assert [record["track_id"] for record in records] == ["t0", "t1"]
+
+
+def test_process_images_other_format_leaves_changed_covers_to_resume(tmp_path):
+    """Test that a cover processed only into image-colours.json is processed again on resume."""
+    file_paths = FilePaths(tmp_path)
+    write_playlist(file_paths, [(255, 0, 0), (0, 0, 255)])
+    with Manifest.for_output_dir(file_paths) as manifest:
+        for track_id in ["t0", "t1"]:
+            manifest.record(
+                track_id, file_paths.track_image_path(track_id).read_bytes(), 1.0)
+    command = ["process-images", "--output-dir", str(tmp_path), "--no-cache", "--workers", "1"]
+
+    result = runner.invoke(app, command)
+    assert result.exit_code == 0, result.output
+
+    # get-playlist replaces a cover, then the colours go to another format
+    green = jpeg_bytes((0, 255, 0))
+    file_paths.track_image_path("t0").write_bytes(green)
+    with Manifest.for_output_dir(file_paths) as manifest:
+        manifest.record("t0", green, 2.0)
+    result = runner.invoke(app, command + ["--format", "json"])
+    assert result.exit_code == 0, result.output
+
+    result = runner.invoke(app, command)
+    assert result.exit_code == 0, result.output
+    assert "1 cover(s) changed since they were processed" in result.output
+    assert "Successfully processed 1/1 images" in result.output
+    records = list(iter_colour_data(file_paths.image_colours_jsonl_path(), {"t0"}))
+    assert records[-1]["rgbs"][0][1] > 200
+
+
+def run_module(*args):
+    """Run python -m chromalist without Spotify credentials."""
+    env = {name: value for name, value in os.environ.items() if not name.startswith("SPOTIPY_")}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [
+        str(Path(__file__).parents[1] / "src"), env.get("PYTHONPATH")]))
+    return subprocess.run(
+        [sys.executable, "-m", "chromalist", *args], env=env, capture_output=True, text=True)
+
+
+def test_offline_commands_need_no_credentials():
+    """Test that only the commands that talk to Spotify require the credentials."""
+    result = run_module("benchmark", "--images", "2", "--tracks", "20", "--repeat", "1")
+    assert result.returncode == 0, result.stderr
+    assert "SPOTIPY_CLIENT_ID" not in result.stderr
+
+    result = run_module("get-playlist", "playlist1")
+    assert result.returncode == 1
+    assert "SPOTIPY_CLIENT_ID" in result.stderr
+
+
+def test_load_test_needs_no_credentials():
+    """Test that the load test runs against the local stand-in server without credentials."""
+    result = run_module(
+        "load-test", "--tracks", "20", "--covers", "5", "--latency", "0", "--page-size", "10")
+
+    assert result.returncode == 0, result.stderr
+    assert "Playlist:  20 tracks" in result.stdout
+    assert "0 failed" in result.stdout
+
+
+def test_download_covers_reports_every_track_of_a_failed_cover(tmp_path, capsys):
+    """Test that all tracks sharing a failed cover are warned about, and it isn't counted."""
+    file_paths = FilePaths(tmp_path)
+    tracks = [
+        Track(id=f"t{i}", name=f"Song {i}", artist="Artist", album_name=album,
+              album_art_url=f"https://example.com/{album}.jpg")
+        for i, album in enumerate(["red", "blue", "blue"])
+    ]
+    playlist = Playlist(id="p", name="P", description="", tracks=tracks)
+
+    def download_album_arts(downloads, file_paths, concurrency, images):
+        for track_id, url in downloads:
+            if "blue" in url:
+                yield track_id, OSError("404 Not Found")
+            else:
+                file_paths.save_track_image(track_id, jpeg_bytes((255, 0, 0)))
+                yield track_id, None
+
+    client = Mock()
+    client.download_album_arts.side_effect = download_album_arts
+    with Manifest.for_output_dir(file_paths) as manifest:
+        downloaded = _download_covers(
+            client, playlist, file_paths, lambda track: True, None, 2, None, None, manifest)
+
+    assert downloaded == 1
+    errors = capsys.readouterr().err
+    assert "'Song 0'" not in errors
+    assert "Failed to download art for 'Song 1': 404 Not Found" in errors
+    assert "Failed to download art for 'Song 2': 404 Not Found" in errors
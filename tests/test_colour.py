@@ -0,0 +1,93 @@
+"""Tests for the vectorized colour space conversions."""
+
+import colorsys
+
+import numpy as np
+import pytest
+
+from chromalist import colour
+
+
+@pytest.fixture
+def random_rgbs():
+    """Random RGB colours, including the corners of the RGB cube."""
+    rng = np.random.default_rng(0)
+    corners = np.array([[r, g, b] for r in (0, 255) for g in (0, 255) for b in (0, 255)])
+    greys = np.array([[v, v, v] for v in (1, 64, 128, 254)])
+    return np.concatenate([corners, greys, rng.integers(0, 256, (500, 3))]).astype(float)
+
+
+def test_rgb_to_hsv_matches_colorsys(random_rgbs):
+    """Test that the vectorized HSV conversion matches colorsys."""
+    expected = np.array([
+        [h * 360, s * 100, v * 100]
+        for h, s, v in (colorsys.rgb_to_hsv(*(rgb / 255.0)) for rgb in random_rgbs)
+    ])
+
+    assert colour.rgb_to_hsv(random_rgbs) == pytest.approx(expected, abs=1e-9)
+
+
+def test_hsv_round_trip(random_rgbs):
+    """Test that converting to HSV and back gives the original colours."""
+    hsvs = colour.rgb_to_hsv(random_rgbs)
+
+    assert colour.hsv_to_rgb(hsvs) == pytest.approx(random_rgbs, abs=1e-6)
+
+
+def test_rgb_to_lab_reference_values():
+    """Test CIELAB conversion against well-known reference values."""
+    labs = colour.rgb_to_lab(np.array([[255, 255, 255], [0, 0, 0], [255, 0, 0]]))
+
+    assert labs[0] == pytest.approx([100.0, 0.0, 0.0], abs=0.01)
+    assert labs[1] == pytest.approx([0.0, 0.0, 0.0], abs=0.01)
+    assert labs[2] == pytest.approx([53.24, 80.09, 67.20], abs=0.05)
+
+
+def test_rgb_to_oklab_reference_values():
+    """Test OKLab conversion against well-known reference values."""
+    oklabs = colour.rgb_to_oklab(np.array([[255, 255, 255], [255, 0, 0], [0, 0, 255]]))
+
+    assert oklabs[0] == pytest.approx([1.0, 0.0, 0.0], abs=1e-4)
+    assert oklabs[1] == pytest.approx([0.6280, 0.2249, 0.1258], abs=1e-3)
+    assert oklabs[2] == pytest.approx([0.4520, -0.0325, -0.3115], abs=1e-3)
+
+
+@pytest.mark.parametrize("to_space, from_space", [
+    (colour.rgb_to_lab, colour.lab_to_rgb),
+    (colour.rgb_to_oklab, colour.oklab_to_rgb),
+])
+def test_perceptual_round_trip(random_rgbs, to_space, from_space):
+    """Test that converting to a perceptual space and back gives the original colours."""
+    assert from_space(to_space(random_rgbs)) == pytest.approx(random_rgbs, abs=1e-6)
+
+
+def test_conversions_keep_leading_dimensions():
+    """Test that arrays of any leading shape are converted element-wise."""
+    rgbs = np.random.default_rng(1).integers(0, 256, (4, 5, 3))
+
+    for convert in (colour.rgb_to_hsv, colour.rgb_to_lab, colour.rgb_to_oklab):
+        converted = convert(rgbs)
+        assert converted.shape == (4, 5, 3)
+        assert converted[2, 3] == pytest.approx(convert(rgbs[2, 3]))
+
+
+def test_distances():
+    """Test the vectorized perceptual distances."""
+    labs = colour.rgb_to_lab(np.array([[255, 0, 0], [250, 0, 0], [0, 0, 255]]))
+    oklabs = colour.rgb_to_oklab(np.array([[255, 0, 0], [250, 0, 0], [0, 0, 255]]))
+
+    lab_distances = colour.delta_e76(labs[0], labs)
+    oklab_distances = colour.oklab_distance(oklabs[0], oklabs)
+
+    assert lab_distances.shape == oklab_distances.shape == (3,)
+    assert lab_distances[0] == 0
+    assert lab_distances[1] < 5 < lab_distances[2]
+    assert oklab_distances[0] == 0
+    assert oklab_distances[1] < oklab_distances[2]
+
+
+def test_hue_distance_wraps_around():
+    """Test that hue differences are measured around the colour wheel."""
+    distances = colour.hue_distance(np.array([350.0, 10.0, 0.0]), np.array([10.0, 350.0, 180.0]))
+
+    assert distances.tolist() == [20.0, 20.0, 180.0]
@@ -0,0 +1,103 @@
+"""Tests for the content-addressed colour cache."""
+
+import time
+
+import pytest
+from PIL import Image
+
+from chromalist.colour_cache import ColourCache
+from chromalist.files import FilePaths
+from chromalist.image_processing import ImageProcessor
+from chromalist.models import Track
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Create a colour cache in a temporary directory."""
+    with ColourCache(tmp_path / "cache.sqlite") as cache:
+        yield cache
+
+
+def test_key_depends_on_content_and_parameters():
+    """Test that the key changes with the image bytes and every parameter."""
+    key = ColourCache.key(b"image", 3, 100, "kmeans")
+
+    assert key == ColourCache.key(b"image", 3, 100, "kmeans")
+    assert key != ColourCache.key(b"other image", 3, 100, "kmeans")
+    assert key != ColourCache.key(b"image", 5, 100, "kmeans")
+    assert key != ColourCache.key(b"image", 3, 50, "kmeans")
+    assert key != ColourCache.key(b"image", 3, 100, "kmeans-batch")
+
+
+def test_get_and_put_track_hit_rate(cache):
+    """Test storing and retrieving results, and the hit/miss counters."""
+    assert cache.get("key") is None
+
+    cache.put("key", [(255, 0, 0)], [(0.0, 100.0, 100.0)])
+    assert cache.get("key") == ([(255, 0, 0)], [(0.0, 100.0, 100.0)])
+
+    assert cache.hits == 1
+    assert cache.misses == 1
+    assert cache.hit_rate == 0.5
+
+
+def test_persists_between_instances(tmp_path):
+    """Test that cached results survive closing and reopening the cache."""
+    with ColourCache(tmp_path / "cache.sqlite") as cache:
+        cache.put("key", [(1, 2, 3)], [(210.0, 66.7, 1.2)])
+
+    with ColourCache(tmp_path / "cache.sqlite") as cache:
+        assert cache.get("key") == ([(1, 2, 3)], [(210.0, 66.7, 1.2)])
+
+
+def test_evict_least_recently_used_beyond_max_entries(tmp_path):
+    """Test that eviction by size keeps the most recently used entries."""
+    with ColourCache(tmp_path / "cache.sqlite", max_entries=2) as cache:
+        for key in ["a", "b", "c"]:
+            cache.put(key, [], [])
+            time.sleep(0.01)
+        cache.get("a")
+
+        assert cache.evict() == 1
+        assert len(cache) == 2
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+
+
+def test_evict_by_age(tmp_path):
+    """Test that entries older than the maximum age are evicted."""
+    with ColourCache(tmp_path / "cache.sqlite", max_age_days=0) as cache:
+        cache.put("old", [], [])
+        time.sleep(0.01)
+
+        assert cache.evict() == 1
+        assert len(cache) == 0
+
+
+def test_process_tracks_skips_cached_images(tmp_path, cache):
+    """Test that unchanged images are served from the cache on a re-run."""
+    file_paths = FilePaths(tmp_path)
+    tracks = [
+        Track(id=f"track{i}", name="Song", artist="Artist",
+              album_name="Album", album_art_url="")
+        for i in range(3)
+    ]
+    for track, colour in zip(tracks, [(255, 0, 0), (0, 255, 0), (0, 0, 255)]):
+        Image.new("RGB", (100, 100), colour).save(
+            file_paths.track_image_path(track.id), "JPEG")
+
+    processor = ImageProcessor()
+    first = list(processor.process_tracks(file_paths, 1, tracks, workers=1, cache=cache))
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    # Change one image; the other two come from the cache
+    Image.new("RGB", (100, 100), (255, 255, 0)).save(
+        file_paths.track_image_path("track1"), "JPEG")
+    second = list(processor.process_tracks(file_paths, 1, tracks, workers=1, cache=cache))
+
+    assert (cache.hits, cache.misses) == (2, 4)
+    assert [r.track_id for r in second] == ["track0", "track1", "track2"]
+    assert second[0].rgbs == first[0].rgbs
+    assert second[2].rgbs == first[2].rgbs
+    assert second[1].rgbs != first[1].rgbs
@@ -0,0 +1,53 @@
+"""Tests for the colour extraction engines."""
+
+import numpy as np
+import pytest
+
+from chromalist.colour import hue_distance
+from chromalist.colour_engines import ENGINES, get_engine
+from chromalist.image_processing import ImageProcessor
+
+
+@pytest.fixture
+def red_and_blue_pixels():
+    """Pixels of an image that is 80% red and 20% blue, with a little noise."""
+    rng = np.random.default_rng(0)
+    pixels = np.zeros((10000, 3))
+    pixels[:8000] = (220, 20, 30)
+    pixels[8000:] = (20, 40, 200)
+    return np.clip(pixels + rng.normal(0, 5, pixels.shape), 0, 255)
+
+
+@pytest.mark.parametrize("engine_name", list(ENGINES))
+def test_engine_finds_dominant_colour(engine_name, red_and_blue_pixels):
+    """Test that every engine ranks the most frequent colour first."""
+    processor = ImageProcessor(engine_name)
+
+    rgbs, hsvs = processor.colours_from_pixels(red_and_blue_pixels, k=2)
+
+    assert 1 <= len(rgbs) <= 2
+    assert len(rgbs) == len(hsvs)
+    r, g, b = rgbs[0]
+    assert r > 180 and g < 60 and b < 70
+    assert hue_distance(hsvs[0][0], 357.0) < 10
+
+
+@pytest.mark.parametrize("engine_name", list(ENGINES))
+def test_engine_batch_matches_engine_output_format(engine_name, red_and_blue_pixels):
+    """Test that batch extraction returns centroids and counts per image."""
+    engine = get_engine(engine_name)
+    batch = np.stack([red_and_blue_pixels, red_and_blue_pixels[::-1]])
+
+    clusters = engine.extract_batch(batch, 2)
+
+    assert len(clusters) == 2
+    for centroids, counts in clusters:
+        assert centroids.shape[1] == 3
+        assert len(centroids) == len(counts)
+        assert counts.sum() > 0
+
+
+def test_get_engine_unknown_name():
+    """Test that an unknown engine name is rejected."""
+    with pytest.raises(ValueError, match="Unknown colour engine"):
+        get_engine("no-such-engine")
@@ -0,0 +1,77 @@
+"""Tests for short paths through colour space."""
+
+import time
+
+import numpy as np
+import pytest
+
+from chromalist.colour_path import gradient_order, nearest_neighbour_path, path_length, two_opt
+
+
+def test_nearest_neighbour_path_visits_every_point_once():
+    """Test chaining, including duplicate points and tree rebuilds."""
+    rng = np.random.default_rng(0)
+    points = rng.uniform(size=(500, 3))
+    points = np.concatenate([points, points[:100]])
+
+    path = nearest_neighbour_path(points, start=7)
+
+    assert path[0] == 7
+    assert sorted(path.tolist()) == list(range(len(points)))
+
+
+def test_nearest_neighbour_path_follows_a_line():
+    """Test that points on a line are chained in order from one end."""
+    points = np.array([[x, 0.0, 0.0] for x in [3, 0, 4, 1, 2]])
+
+    assert nearest_neighbour_path(points, start=1).tolist() == [1, 3, 4, 0, 2]
+    assert nearest_neighbour_path(np.empty((0, 3))).tolist() == []
+
+
+def test_two_opt_undoes_a_crossing():
+    """Test that a reversed stretch of a path is put back."""
+    points = np.array([[x, 0.0, 0.0] for x in range(8)], dtype=float)
+    path = np.array([0, 1, 5, 4, 3, 2, 6, 7])
+
+    assert two_opt(points, path).tolist() == list(range(8))
+    # The ends of the path can move too
+    assert two_opt(points, np.array([0, 1, 2, 3, 7, 6, 5, 4])).tolist() == list(range(8))
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 1000])
+def test_gradient_order_is_a_short_permutation(size):
+    """Test that refining never lengthens the path, for any number of points."""
+    points = np.random.default_rng(1).uniform(size=(size, 3))
+
+    chained = gradient_order(points, max_rounds=0)
+    refined = gradient_order(points)
+
+    assert sorted(refined.tolist()) == list(range(size))
+    if size > 1:
+        assert path_length(points, refined) <= path_length(points, chained)
+    if size == 1000:
+        assert path_length(points, refined) < path_length(points, chained)
+
+
+def test_gradient_order_collapses_duplicate_colours():
+    """Test that many tracks sharing a few colours are ordered quickly, copies together."""
+    rng = np.random.default_rng(2)
+    colours = rng.uniform(size=(20, 3))
+    which = rng.integers(0, 20, size=100_000)
+    points = colours[which]
+
+    start = time.perf_counter()
+    order = gradient_order(points)
+    assert time.perf_counter() - start < 5.0
+
+    assert sorted(order.tolist()) == list(range(len(points)))
+    # All copies of a colour are adjacent, in input order
+    ordered = which[order]
+    assert np.count_nonzero(np.diff(ordered)) == 19
+    for colour in range(20):
+        copies = order[ordered == colour]
+        assert (np.diff(copies) > 0).all()
+
+    start = time.perf_counter()
+    assert gradient_order(np.zeros((50_000, 3))).tolist() == list(range(50_000))
+    assert time.perf_counter() - start < 5.0
@@ -0,0 +1,176 @@
+"""Tests for reading and writing the colour data files."""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from chromalist.colour_store import (
+    BINARY_ERROR_MESSAGE,
+    ColourDataWriter,
+    colour_data_from_array,
+    colour_data_path,
+    dominant_colours_from_array,
+    iter_colour_data,
+    load_colour_array,
+    processed_track_ids,
+    read_parameters,
+    write_colour_array,
+)
+from chromalist.files import FilePaths
+from chromalist.models import ImageColourData
+
+
+def colour_data(track_id, error=None):
+    if error is not None:
+        return ImageColourData(track_id=track_id, rgbs=[], hsvs=[], error=error)
+    return ImageColourData(
+        track_id=track_id, rgbs=[(255, 0, 0)], hsvs=[(0.0, 100.0, 100.0)], error=None)
+
+
+def test_writer_streams_json_lines(tmp_path):
+    """Test that every record is on disk as soon as it is written."""
+    path = tmp_path / "image-colours.jsonl"
+
+    with ColourDataWriter(path) as writer:
+        writer.write(colour_data("track1"))
+        assert [r["track_id"] for r in iter_colour_data(path)] == ["track1"]
+        writer.write(colour_data("track2"))
+
+    records = list(iter_colour_data(path))
+    assert [r["track_id"] for r in records] == ["track1", "track2"]
+    assert ImageColourData.from_dict(records[0]) == colour_data("track1")
+
+
+def test_writer_appends_or_truncates(tmp_path):
+    """Test that existing records are kept when appending, and dropped otherwise."""
+    path = tmp_path / "image-colours.jsonl"
+    with ColourDataWriter(path) as writer:
+        writer.write(colour_data("track1"))
+
+    with ColourDataWriter(path, append=True) as writer:
+        writer.write(colour_data("track2"))
+    assert [r["track_id"] for r in iter_colour_data(path)] == ["track1", "track2"]
+
+    with ColourDataWriter(path, append=False) as writer:
+        writer.write(colour_data("track3"))
+    assert [r["track_id"] for r in iter_colour_data(path)] == ["track3"]
+
+
+def test_resume_after_interrupted_write(tmp_path):
+    """Test that a partial last line is skipped and appending starts on a new line."""
+    path = tmp_path / "image-colours.jsonl"
+    complete = json.dumps(colour_data("track1").to_dict())
+    partial = json.dumps(colour_data("track2").to_dict())[:20]
+    path.write_text(complete + "\n" + partial)
+
+    assert processed_track_ids(path) == {"track1"}
+
+    with ColourDataWriter(path) as writer:
+        writer.write(colour_data("track2"))
+
+    assert [r["track_id"] for r in iter_colour_data(path)] == ["track1", "track2"]
+
+
+def test_processed_track_ids_retries_errors(tmp_path):
+    """Test that tracks whose latest record is an error are not considered processed."""
+    path = tmp_path / "image-colours.jsonl"
+    with ColourDataWriter(path) as writer:
+        writer.write(colour_data("track1"))
+        writer.write(colour_data("track2", error="Failed"))
+        writer.write(colour_data("track3", error="Failed"))
+        writer.write(colour_data("track3"))
+
+    assert processed_track_ids(path) == {"track1", "track3"}
+    assert processed_track_ids(tmp_path / "missing.jsonl") == set()
+
+
+def test_processed_track_ids_with_other_parameters(tmp_path):
+    """Test that records written with other extraction parameters are not used."""
+    path = tmp_path / "image-colours.jsonl"
+    parameters = {"k": 1, "image_size": 100, "algorithm": "kmeans"}
+    with ColourDataWriter(path, append=False, parameters=parameters) as writer:
+        writer.write(colour_data("track1"))
+    with ColourDataWriter(path, parameters={"k": 2}) as writer:
+        writer.write(colour_data("track2"))
+
+    assert read_parameters(path) == parameters
+    assert [r["track_id"] for r in iter_colour_data(path)] == ["track1", "track2"]
+    assert [r["track_id"] for r in iter_colour_data(path, {"track2"})] == ["track2"]
+    assert processed_track_ids(path, parameters) == {"track1", "track2"}
+    assert processed_track_ids(path, {**parameters, "k": 2}) == set()
+
+    # Files without a header were written with unknown parameters
+    with ColourDataWriter(path, append=False) as writer:
+        writer.write(colour_data("track1"))
+    assert read_parameters(path) is None
+    assert processed_track_ids(path, parameters) == set()
+    assert processed_track_ids(path) == {"track1"}
+
+
+def test_iter_colour_data_reads_json_list(tmp_path):
+    """Test that the JSON list format is still read."""
+    path = tmp_path / "image-colours.json"
+    path.write_text(json.dumps([colour_data("track1").to_dict()], indent=2))
+
+    assert [r["track_id"] for r in iter_colour_data(path)] == ["track1"]
+
+
+def test_colour_data_path_prefers_newest_file(tmp_path):
+    """Test that the most recently written colour data file is used."""
+    file_paths = FilePaths(tmp_path)
+    assert colour_data_path(file_paths) is None
+
+    file_paths.image_colours_path().write_text("[]")
+    file_paths.image_colours_jsonl_path().write_text("")
+    os.utime(file_paths.image_colours_path(), (1000, 1000))
+    assert colour_data_path(file_paths) == file_paths.image_colours_jsonl_path()
+
+    os.utime(file_paths.image_colours_jsonl_path(), (500, 500))
+    assert colour_data_path(file_paths) == file_paths.image_colours_path()
+
+
+def test_binary_colour_array_round_trip(tmp_path):
+    """Test writing and memory-mapping the binary format, with errors and short rows."""
+    path = tmp_path / "image-colours.npy"
+    two_colours = ImageColourData(
+        track_id="track3", rgbs=[(0, 0, 255), (10, 20, 30)],
+        hsvs=[(240.0, 100.0, 100.0), (210.0, 66.7, 11.8)], error=None)
+    write_colour_array(path, [colour_data("track1"), colour_data("t2", "boom"), two_colours], k=3)
+
+    array = load_colour_array(path)
+    assert isinstance(array, np.memmap)
+    records = list(colour_data_from_array(array))
+
+    assert records[0] == colour_data("track1")
+    assert records[1] == colour_data("t2", BINARY_ERROR_MESSAGE)
+    assert records[2].rgbs == two_colours.rgbs
+    assert records[2].hsvs == [pytest.approx(hsv, abs=1e-4) for hsv in two_colours.hsvs]
+    assert [r["track_id"] for r in iter_colour_data(path)] == ["track1", "t2", "track3"]
+
+
+def test_dominant_colours_from_array(tmp_path):
+    """Test that failed and colourless tracks are skipped."""
+    path = tmp_path / "image-colours.npy"
+    no_colours = ImageColourData(track_id="track3", rgbs=[], hsvs=[], error=None)
+    write_colour_array(path, [colour_data("track1"), colour_data("t2", "boom"), no_colours], k=2)
+
+    track_ids, hsvs = dominant_colours_from_array(load_colour_array(path))
+
+    assert track_ids == ["track1"]
+    assert hsvs.tolist() == [[0.0, 100.0, 100.0]]
+
+
+def test_iter_colour_data_for_some_tracks(tmp_path):
+    """Test that only the records of the given tracks are decoded."""
+    path = tmp_path / "image-colours.jsonl"
+    with ColourDataWriter(path) as writer:
+        for track_id in ["track1", "track2", "track3"]:
+            writer.write(ImageColourData(track_id=track_id, rgbs=[], hsvs=[], error=None))
+    with open(path, "a") as f:
+        f.write('{"track_id": "track2", "rgbs": [')
+
+    assert [r["track_id"] for r in iter_colour_data(path, {"track2", "track3"})] == [
+        "track2", "track3"]
+    assert list(iter_colour_data(path, set())) == []
@@ -7,7 +7,7 @@ import pytest
 
 def test_validate_environment_all_vars_present():
     """Test that validation passes when all required env vars are set."""
-    from chromalist.__main__ import validate_environment
+    from chromalist.cli import validate_environment
 
     with patch.dict(os.environ, {
         "SPOTIPY_CLIENT_ID": "test_client_id",
@@ -20,7 +20,7 @@ def test_validate_environment_all_vars_present():
 
 def test_validate_environment_missing_client_id():
     """Test that validation fails when SPOTIPY_CLIENT_ID is missing."""
-    from chromalist.__main__ import validate_environment
+    from chromalist.cli import validate_environment
 
     with patch.dict(os.environ, {
         "SPOTIPY_CLIENT_SECRET": "test_client_secret",
@@ -33,7 +33,7 @@ def test_validate_environment_missing_client_id():
 
 def test_validate_environment_missing_client_secret():
     """Test that validation fails when SPOTIPY_CLIENT_SECRET is missing."""
-    from chromalist.__main__ import validate_environment
+    from chromalist.cli import validate_environment
 
     with patch.dict(os.environ, {
         "SPOTIPY_CLIENT_ID": "test_client_id",
@@ -46,7 +46,7 @@ def test_validate_environment_missing_client_secret():
 
 def test_validate_environment_missing_redirect_uri():
     """Test that validation fails when SPOTIPY_REDIRECT_URI is missing."""
-    from chromalist.__main__ import validate_environment
+    from chromalist.cli import validate_environment
 
     with patch.dict(os.environ, {
         "SPOTIPY_CLIENT_ID": "test_client_id",
@@ -59,7 +59,7 @@ def test_validate_environment_missing_redirect_uri():
 
 def test_validate_environment_missing_all_vars():
     """Test that validation fails when all env vars are missing."""
-    from chromalist.__main__ import validate_environment
+    from chromalist.cli import validate_environment
 
     with patch.dict(os.environ, {}, clear=True):
         with pytest.raises(SystemExit) as exc_info:
@@ -69,7 +69,7 @@ def test_validate_environment_missing_all_vars():
 
 def test_validate_environment_error_message_content(capsys):
     """Test that error message contains helpful setup instructions."""
-    from chromalist.__main__ import validate_environment
+    from chromalist.cli import validate_environment
 
     with patch.dict(os.environ, {}, clear=True):
         with pytest.raises(SystemExit):
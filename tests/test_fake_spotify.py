@@ -0,0 +1,81 @@
+"""Tests for SpotifyClient over real HTTP, against the local stand-in server."""
+
+import io
+
+import pytest
+from PIL import Image
+
+from chromalist.fake_spotify import FakeSpotifyServer
+from chromalist.files import FilePaths
+from chromalist.request_scheduler import RequestScheduler
+from chromalist.spotify_client import SpotifyClient
+
+
+@pytest.fixture
+def server():
+    """A stand-in server with a playlist spread over several small pages."""
+    with FakeSpotifyServer(page_size=7, image_variety=2) as server:
+        server.add_playlist("playlist1", n_tracks=30, n_covers=10)
+        yield server
+
+
+def make_client(server, **kwargs):
+    """Create a client pointed at the stand-in server."""
+    return SpotifyClient(api_url=server.api_url, access_token="fake", **kwargs)
+
+
+def test_get_playlist_pages_in_order(server):
+    """Test fetching every page of a playlist, in playlist order."""
+    playlist = make_client(server).get_playlist("playlist1")
+
+    assert playlist.id == "playlist1"
+    assert playlist.snapshot_id == "playlist1-snapshot"
+    assert [track.id for track in playlist.tracks] == [f"track{i:07d}" for i in range(30)]
+    assert [image.width for image in playlist.tracks[0].album_images] == [640, 300, 64]
+    # One request for the playlist and one for each further page of 7
+    assert server.requests == 5
+
+
+def test_get_playlist_snapshot(server):
+    """Test fetching the snapshot ID only."""
+    assert make_client(server).get_playlist_snapshot("playlist1") == (
+        "playlist1", "playlist1-snapshot")
+
+
+def test_download_album_art(server, tmp_path):
+    """Test downloading a cover variant from the stand-in server."""
+    client = make_client(server)
+    track = client.get_playlist("playlist1").tracks[0]
+    file_paths = FilePaths(tmp_path)
+
+    client.download_album_art(track.id, track.image_url(100), file_paths)
+
+    with Image.open(file_paths.track_image_path(track.id)) as image:
+        assert image.size == (300, 300)
+
+
+def test_retries_injected_errors(server):
+    """Test that injected 429s and 500s are retried until the requests succeed."""
+    server.throttle_rate = 0.3
+    server.error_rate = 0.1
+    server.retry_after = 0.01
+    client = make_client(
+        server, scheduler=RequestScheduler(max_retries=20, backoff_base=0.001))
+
+    playlist = client.get_playlist("playlist1")
+    images = [
+        client.fetch_album_art(group[0].image_url(64)) for group in playlist.cover_groups()]
+
+    assert len(playlist.tracks) == 30
+    assert all(Image.open(io.BytesIO(image)).size == (64, 64) for image in images)
+    assert server.throttled > 0
+    assert client.scheduler.throttled == server.throttled
+
+
+def test_unknown_playlist(server):
+    """Test that an unknown playlist fails with the API's 404."""
+    import spotipy
+
+    with pytest.raises(spotipy.SpotifyException) as exc_info:
+        make_client(server).get_playlist("unknown")
+    assert exc_info.value.http_status == 404
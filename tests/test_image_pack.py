@@ -0,0 +1,121 @@
+"""Tests for the packed cover image store."""
+
+import io
+import pickle
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from chromalist.files import FilePaths
+from chromalist.image_pack import ImagePack, MemoryViewReader, open_image_pack
+from chromalist.image_processing import ImageProcessor
+from chromalist.models import Playlist, Track
+
+
+def jpeg_bytes(colour):
+    """Encode a single-colour image as JPEG."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (100, 100), colour).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def make_track(track_id):
+    """Create a track with the given ID."""
+    return Track(id=track_id, name=f"Song {track_id}", artist="Artist",
+                 album_name="Album", album_art_url=f"https://example.com/{track_id}.jpg")
+
+
+def test_add_get_and_alias(tmp_path):
+    """Test that images are appended back to back, and aliases share the bytes."""
+    red, blue = jpeg_bytes((255, 0, 0)), jpeg_bytes((0, 0, 255))
+    file_paths = FilePaths(tmp_path)
+    assert open_image_pack(file_paths) is None
+
+    with ImagePack.for_output_dir(file_paths) as pack:
+        pack.add("t1", red)
+        assert bytes(pack.get("t1")) == red
+        pack.add("t2", blue)
+        pack.alias("t1", "t3")
+
+        assert isinstance(pack.get("t2"), memoryview)
+        assert bytes(pack.get("t2")) == blue
+        assert bytes(pack.get("t3")) == red
+        assert pack.get("t4") is None
+        with pytest.raises(KeyError):
+            pack.alias("t4", "t5")
+
+    assert file_paths.image_pack_path().stat().st_size == len(red) + len(blue)
+    with open_image_pack(file_paths) as pack:
+        assert len(pack) == 3
+        assert bytes(pack.get("t3")) == red
+
+
+def test_ignores_partial_index_line(tmp_path):
+    """Test that an interrupted write leaves the earlier images readable."""
+    file_paths = FilePaths(tmp_path)
+    with ImagePack.for_output_dir(file_paths) as pack:
+        pack.add("t1", b"image")
+    with open(file_paths.image_pack_index_path(), "a") as f:
+        f.write("t2\t5\t")
+
+    with open_image_pack(file_paths) as pack:
+        assert "t1" in pack
+        assert "t2" not in pack
+
+
+def test_memoryview_reader_decodes_like_bytes():
+    """Test that PIL decodes the same pixels from the zero-copy reader."""
+    image_bytes = jpeg_bytes((10, 200, 30))
+    processor = ImageProcessor()
+
+    from_view = processor.load_pixels(memoryview(image_bytes))
+    from_bytes = processor.load_pixels(io.BytesIO(image_bytes))
+
+    np.testing.assert_array_equal(from_view, from_bytes)
+    reader = MemoryViewReader(memoryview(b"abcdef"))
+    reader.seek(-2, io.SEEK_END)
+    assert reader.read() == b"ef"
+
+
+def test_pickled_pack_is_reopened_once_per_process(tmp_path):
+    """Test that unpickling reopens the pack from disk, reusing it until it changes."""
+    file_paths = FilePaths(tmp_path)
+    with ImagePack.for_output_dir(file_paths) as pack:
+        pack.add("t1", b"one")
+        first = pickle.loads(pickle.dumps(pack))
+        assert pickle.loads(pickle.dumps(pack)) is first
+
+        pack.add("t2", b"two")
+        second = pickle.loads(pickle.dumps(pack))
+
+    assert second is not first
+    assert bytes(second.get("t2")) == b"two"
+
+
+@pytest.mark.parametrize("workers, batch_size", [(1, 1), (2, 1), (1, 2)])
+def test_process_tracks_reads_from_pack(tmp_path, workers, batch_size):
+    """Test that processing reads packed covers, with the same results as files."""
+    (tmp_path / "files").mkdir()
+    (tmp_path / "packed").mkdir()
+    files, packed = FilePaths(tmp_path / "files"), FilePaths(tmp_path / "packed")
+    tracks = [make_track(f"t{i}") for i in range(4)]
+    processor = ImageProcessor()
+
+    with ImagePack.for_output_dir(packed) as pack:
+        for track, colour in zip(tracks[:3], [(255, 0, 0), (0, 255, 0), (0, 0, 255)]):
+            image_bytes = jpeg_bytes(colour)
+            files.track_image_path(track.id).write_bytes(image_bytes)
+            pack.add(track.id, image_bytes)
+
+        with pytest.raises(FileNotFoundError, match="t3"):
+            processor.validate_files(
+                packed, Playlist(id="p", name="P", description="", tracks=tracks), pack)
+
+    from_files = list(processor.process_tracks(files, 1, tracks, workers, batch_size))
+    with open_image_pack(packed) as pack:
+        from_pack = list(processor.process_tracks(
+            packed, 1, tracks, workers, batch_size, images=pack))
+
+    assert [r.rgbs for r in from_pack[:3]] == [r.rgbs for r in from_files[:3]]
+    assert "No image for track t3" in from_pack[3].error
@@ -252,3 +252,127 @@ def test_extract_colours_sorts_by_frequency(temp_dir, create_test_image):
 
     # First color should be more red-ish (higher R component)
     assert rgbs[0][0] > rgbs[1][0]  # Red component of first should be higher
+
+
+def test_process_tracks_parallel_preserves_order(temp_dir, sample_playlist, create_test_image):
+    """Test that processing across a worker pool returns results in playlist order."""
+    file_paths = FilePaths(temp_dir)
+    create_test_image(file_paths.track_image_path("track1"), colours=[(255, 0, 0)])
+    create_test_image(file_paths.track_image_path("track2"), colours=[(0, 255, 0)])
+    # track3 has no image, so its error must be captured in place
+
+    processor = ImageProcessor()
+    serial = list(processor.process_tracks(
+        file_paths, 1, sample_playlist.tracks, workers=1))
+    parallel = list(processor.process_tracks(
+        file_paths, 1, sample_playlist.tracks, workers=2))
+
+    assert [r.track_id for r in parallel] == ["track1", "track2", "track3"]
+    assert [r.rgbs for r in parallel] == [r.rgbs for r in serial]
+    assert parallel[0].error is None
+    assert parallel[1].error is None
+    assert parallel[2].error is not None
+
+
+def test_extract_colours_batch_matches_single_image(temp_dir, create_test_image):
+    """Test that batched k-means finds the same dominant colours as per-image k-means."""
+    paths = []
+    for i, colours in enumerate([
+        [(255, 0, 0), (0, 0, 255)],
+        [(0, 255, 0), (255, 255, 0)],
+        [(40, 40, 40), (220, 220, 220)],
+    ]):
+        path = temp_dir / f"image{i}.jpg"
+        create_test_image(path, colours=colours)
+        paths.append(path)
+
+    processor = ImageProcessor()
+    batch_results = processor.extract_colours_batch(paths, k=2)
+
+    assert len(batch_results) == 3
+    for path, (rgbs, hsvs) in zip(paths, batch_results):
+        single_rgbs, _ = processor.extract_colours(path, k=2)
+        assert len(rgbs) == len(hsvs) == 2
+        assert sorted(rgbs) == pytest.approx(sorted(single_rgbs), abs=2)
+
+
+def test_process_tracks_batched_captures_errors(temp_dir, sample_playlist, create_test_image):
+    """Test that a missing image in a batch is flagged without failing the batch."""
+    file_paths = FilePaths(temp_dir)
+    create_test_image(file_paths.track_image_path("track1"), colours=[(255, 0, 0)])
+    create_test_image(file_paths.track_image_path("track3"), colours=[(0, 0, 255)])
+
+    processor = ImageProcessor()
+    results = list(processor.process_tracks(
+        file_paths, 1, sample_playlist.tracks, workers=1, batch_size=3))
+
+    assert [r.track_id for r in results] == ["track1", "track2", "track3"]
+    assert results[0].error is None and results[0].rgbs[0][0] > 200
+    assert results[1].error is not None and results[1].rgbs == []
+    assert results[2].error is None and results[2].rgbs[0][2] > 200
+
+
+def test_playlist_cover_groups():
+    """Test that tracks are grouped by album art URL in order of first appearance."""
+    def track(track_id, url):
+        return Track(id=track_id, name="Song", artist="Artist",
+                     album_name="Album", album_art_url=url)
+
+    playlist = Playlist(
+        id="p", name="P", description="",
+        tracks=[
+            track("a1", "https://example.com/a.jpg"),
+            track("b1", "https://example.com/b.jpg"),
+            track("a2", "https://example.com/a.jpg"),
+            track("x1", ""),
+            track("x2", ""),
+        ],
+    )
+
+    groups = [[t.id for t in group] for group in playlist.cover_groups()]
+    assert groups == [["a1", "a2"], ["b1"], ["x1"], ["x2"]]
+
+
+def test_process_tracks_processes_shared_cover_once(temp_dir, create_test_image):
+    """Test that tracks sharing a cover get the result of a single extraction."""
+    file_paths = FilePaths(temp_dir)
+    tracks = [
+        Track(id=track_id, name="Song", artist="Artist", album_name="Album",
+              album_art_url=f"https://example.com/{url}.jpg")
+        for track_id, url in [("a1", "a"), ("b1", "b"), ("a2", "a"), ("a3", "a")]
+    ]
+    # Only the first track of each album has its image on disk
+    create_test_image(file_paths.track_image_path("a1"), colours=[(255, 0, 0)])
+    create_test_image(file_paths.track_image_path("b1"), colours=[(0, 0, 255)])
+
+    processor = ImageProcessor()
+    results = list(processor.process_tracks(file_paths, 1, tracks, workers=1))
+
+    assert [r.track_id for r in results] == ["a1", "b1", "a2", "a3"]
+    assert all(r.error is None for r in results)
+    assert results[2].rgbs == results[0].rgbs
+    assert results[3].rgbs == results[0].rgbs
+    assert results[1].rgbs != results[0].rgbs
+
+
+def test_share_track_image(temp_dir, create_test_image):
+    """Test that a downloaded cover is made available for other tracks."""
+    file_paths = FilePaths(temp_dir)
+    create_test_image(file_paths.track_image_path("a1"))
+
+    file_paths.share_track_image("a1", "a2")
+
+    assert file_paths.track_image_path("a2").read_bytes() == \
+        file_paths.track_image_path("a1").read_bytes()
+
+
+def test_load_pixels_fast_decode_is_close_to_full_decode(temp_dir, create_test_image):
+    """Test that the reduced-resolution decode gives nearly the same pixels."""
+    image_path = temp_dir / "cover.jpg"
+    create_test_image(image_path, colours=[(255, 0, 0), (0, 128, 255)], size=(640, 640))
+
+    full = ImageProcessor().load_pixels(image_path)
+    fast = ImageProcessor(fast_decode=True).load_pixels(image_path)
+
+    assert fast.shape == full.shape == (10000, 3)
+    assert abs(fast - full).mean() < 5
@@ -0,0 +1,99 @@
+"""Tests for the manifest of cover images."""
+
+import pytest
+
+from chromalist.files import FilePaths
+from chromalist.image_processing import ImageProcessor
+from chromalist.manifest import Manifest
+from chromalist.models import Playlist, Track
+
+PARAMETERS = {"k": 3, "image_size": 100, "algorithm": "kmeans"}
+
+
+def make_track(track_id):
+    """Create a track with the given ID."""
+    return Track(id=track_id, name=f"Song {track_id}", artist="Artist",
+                 album_name="Album", album_art_url=f"https://example.com/{track_id}.jpg")
+
+
+def test_changed_covers(tmp_path):
+    """Test that covers are changed until processed, and again when replaced."""
+    tracks = [make_track(f"t{i}") for i in range(4)]
+    with Manifest.for_output_dir(FilePaths(tmp_path)) as manifest:
+        manifest.record("t0", b"red", 1.0)
+        manifest.record("t1", b"blue", 2.0)
+        manifest.share("t1", "t2")
+        manifest.share("t9", "t3")
+        assert manifest.changed(tracks, PARAMETERS) == tracks[:3]
+
+        manifest.mark_processed(["t0", "t1", "t2", "t9"], PARAMETERS)
+        assert manifest.changed(tracks, PARAMETERS) == []
+        assert manifest.changed(tracks, {**PARAMETERS, "k": 1}) == tracks[:3]
+
+        # The same image again stays processed; a new one doesn't
+        manifest.record("t0", b"red", 3.0)
+        manifest.record("t1", b"green", 4.0)
+        manifest.share("t1", "t2")
+        assert manifest.changed(tracks, PARAMETERS) == tracks[1:3]
+
+    entry = manifest.entries["t0"]
+    assert (entry.size, entry.mtime, entry.processed) == (3, 3.0, PARAMETERS)
+
+
+def test_reload_ignores_partial_line(tmp_path):
+    """Test that the last record of a track wins on reload, and a partial line is skipped."""
+    file_paths = FilePaths(tmp_path)
+    with Manifest.for_output_dir(file_paths) as manifest:
+        manifest.record("t0", b"red", 1.0)
+        manifest.mark_processed(["t0"], PARAMETERS)
+        manifest.record("t1", b"blue", 2.0)
+    with open(file_paths.manifest_path(), "a") as f:
+        f.write('{"track_id": "t2", "si')
+
+    with Manifest.for_output_dir(file_paths) as manifest:
+        assert manifest.entries == {"t0": manifest.entries["t0"], "t1": manifest.entries["t1"]}
+        assert manifest.entries["t0"].processed == PARAMETERS
+        assert manifest.changed([make_track("t0"), make_track("t1")], PARAMETERS) == [
+            make_track("t1")]
+        manifest.record("t2", b"green", 3.0)
+
+    assert set(Manifest.for_output_dir(file_paths).entries) == {"t0", "t1", "t2"}
+
+
+def test_load_compacts_replaced_records(tmp_path):
+    """Test that loading drops the records replaced by later ones from the file."""
+    file_paths = FilePaths(tmp_path)
+    with Manifest.for_output_dir(file_paths) as manifest:
+        manifest.record("t0", b"red", 1.0)
+        manifest.record("t1", b"blue", 2.0)
+        manifest.mark_processed(["t0", "t1"], PARAMETERS)
+        manifest.record("t0", b"green", 3.0)
+    with open(file_paths.manifest_path(), "a") as f:
+        # Written before the extraction parameters were recorded
+        f.write('{"track_id": "t2", "size": 4, "mtime": 4.0, "sha256": "x", "processed": true}\n')
+    assert len(file_paths.manifest_path().read_text().splitlines()) == 6
+
+    with Manifest.for_output_dir(file_paths) as manifest:
+        assert len(file_paths.manifest_path().read_text().splitlines()) == 3
+        manifest.record("t3", b"white", 5.0)
+
+    reloaded = Manifest.for_output_dir(file_paths)
+    assert reloaded.entries == manifest.entries
+    assert [entry.processed for entry in reloaded.entries.values()] == [
+        None, PARAMETERS, None, None]
+    assert len(file_paths.manifest_path().read_text().splitlines()) == 4
+
+
+def test_validate_files_reports_missing(tmp_path):
+    """Test that validation from a single directory scan finds the missing images."""
+    file_paths = FilePaths(tmp_path)
+    tracks = [make_track(f"t{i}") for i in range(3)]
+    for track in tracks[:2]:
+        file_paths.track_image_path(track.id).write_bytes(b"image")
+    playlist = Playlist(id="p", name="P", description="", tracks=tracks)
+
+    with pytest.raises(FileNotFoundError, match="t2"):
+        ImageProcessor().validate_files(file_paths, playlist)
+
+    file_paths.track_image_path("t2").write_bytes(b"image")
+    ImageProcessor().validate_files(file_paths, playlist)
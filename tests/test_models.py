@@ -0,0 +1,185 @@
+"""Tests for the domain models."""
+
+import json
+
+import pytest
+
+from chromalist.models import AlbumImage, Playlist, PlaylistLines, Track
+
+
+@pytest.fixture
+def track_with_images():
+    """A track with the three album art sizes Spotify usually offers."""
+    return Track(
+        id="track1",
+        name="Song 1",
+        artist="Artist 1",
+        album_name="Album 1",
+        album_art_url="https://example.com/640.jpg",
+        album_images=[
+            AlbumImage(url="https://example.com/640.jpg", width=640, height=640),
+            AlbumImage(url="https://example.com/300.jpg", width=300, height=300),
+            AlbumImage(url="https://example.com/64.jpg", width=64, height=64),
+        ],
+    )
+
+
+@pytest.mark.parametrize("min_size, expected", [
+    (None, "https://example.com/640.jpg"),
+    (1, "https://example.com/64.jpg"),
+    (64, "https://example.com/64.jpg"),
+    (100, "https://example.com/300.jpg"),
+    (300, "https://example.com/300.jpg"),
+    (301, "https://example.com/640.jpg"),
+    (1000, "https://example.com/640.jpg"),
+])
+def test_image_url_picks_smallest_adequate_size(track_with_images, min_size, expected):
+    """Test that the smallest image at least min_size large is chosen."""
+    assert track_with_images.image_url(min_size) == expected
+
+
+def test_image_url_without_known_sizes():
+    """Test that album_art_url is used when no image sizes are known."""
+    track = Track(
+        id="track1", name="Song", artist="Artist", album_name="Album",
+        album_art_url="https://example.com/art.jpg",
+        album_images=[AlbumImage(url="https://example.com/other.jpg")],
+    )
+
+    assert track.image_url(100) == "https://example.com/art.jpg"
+
+
+def test_playlist_json_round_trip(tmp_path, track_with_images):
+    """Test that tracks, including their image variants, survive a JSON round trip."""
+    playlist = Playlist(
+        id="playlist1", name="Playlist", description="Test", tracks=[track_with_images])
+    path = tmp_path / "playlist.json"
+
+    playlist.to_json(path)
+
+    assert Playlist.from_json(path) == playlist
+
+
+def test_to_json_line_matches_to_dict(track_with_images):
+    """Test that the directly formatted JSON encodes the same data as to_dict."""
+    track_with_images.name = 'Song "1" \u00e9'
+    track_with_images.sort_key = (1, 42.5)
+
+    line = track_with_images.to_json_line()
+
+    assert "\n" not in line
+    assert json.loads(line) == json.loads(json.dumps(track_with_images.to_dict()))
+
+
+def test_playlist_json_streams_one_track_per_line(tmp_path, track_with_images):
+    """Test the playlist file layout, and that sort keys survive the round trip."""
+    track_with_images.sort_key = (0, 120.0)
+    playlist = Playlist(id="playlist1", name="Playlist", description="Test",
+                        tracks=[track_with_images, make_track("track2")])
+    path = tmp_path / "playlist.json"
+
+    playlist.to_json(path)
+
+    lines = path.read_text().splitlines()
+    assert lines[6].strip() == track_with_images.to_json_line() + ","
+    assert json.loads(path.read_text()) == json.loads(json.dumps(playlist.to_dict()))
+    loaded = Playlist.from_json(path)
+    assert loaded.tracks[0].sort_key == (0, 120.0)
+    assert loaded.tracks[1].sort_key is None
+
+
+def test_playlist_from_json_reads_indented_files(tmp_path, track_with_images):
+    """Test that files written as one indented JSON document still load."""
+    path = tmp_path / "playlist.json"
+    data = {"id": "playlist1", "name": "Playlist", "description": "Test",
+            "tracks": [track_with_images.to_dict()]}
+    del data["tracks"][0]["sort_key"]
+    path.write_text(json.dumps(data, indent=2))
+
+    assert Playlist.from_json(path).tracks == [track_with_images]
+
+
+def test_models_are_slotted(track_with_images):
+    """Test that the models have no per-instance __dict__."""
+    with pytest.raises(AttributeError):
+        track_with_images.colour = "red"
+
+
+def test_track_from_dict_without_album_images():
+    """Test that tracks saved before image variants were recorded still load."""
+    track = Track.from_dict({
+        "id": "track1",
+        "name": "Song",
+        "artist": "Artist",
+        "album_name": "Album",
+        "album_art_url": "https://example.com/art.jpg",
+        "hue": None,
+    })
+
+    assert track.album_images == []
+    assert track.image_url(100) == "https://example.com/art.jpg"
+
+
+def make_track(track_id):
+    """Create a track with the given ID."""
+    return Track(id=track_id, name=f"Song {track_id}", artist="Artist",
+                 album_name="Album", album_art_url=f"https://example.com/{track_id}.jpg")
+
+
+def test_playlist_diff():
+    """Test finding the tracks added and removed since an earlier version."""
+    previous = Playlist(id="playlist1", name="Playlist", description="",
+                        tracks=[make_track(i) for i in ["a", "b", "c"]], snapshot_id="1")
+    current = Playlist(id="playlist1", name="Playlist", description="",
+                       tracks=[make_track(i) for i in ["d", "a", "c", "e"]], snapshot_id="2")
+
+    diff = current.diff(previous)
+
+    assert [track.id for track in diff.added] == ["d", "e"]
+    assert [track.id for track in diff.removed] == ["b"]
+    assert not diff.unchanged
+    assert current.diff(current).unchanged
+
+
+def test_playlist_snapshot_id_round_trip(tmp_path):
+    """Test that the snapshot ID is saved, and that older files without it still load."""
+    path = tmp_path / "playlist.json"
+    Playlist(id="playlist1", name="Playlist", description="", tracks=[],
+             snapshot_id="snapshot1").to_json(path)
+
+    assert Playlist.from_json(path).snapshot_id == "snapshot1"
+    assert Playlist.from_dict(
+        {"id": "playlist1", "name": "Playlist", "description": "", "tracks": []}
+    ).snapshot_id is None
+
+
+@pytest.mark.parametrize("track_count", [0, 1, 3])
+def test_playlist_lines_round_trip(tmp_path, track_with_images, track_count):
+    """Test reading a playlist file without decoding the tracks, and writing it back as is."""
+    path = tmp_path / "playlist.json"
+    tracks = [Track(id=f"t{i}", name='Say "hi"', artist="Ärtist", album_name="",
+                    album_art_url="", sort_key=(0.0, 10.0 * i)) for i in range(track_count)]
+    playlist = Playlist(id="playlist1", name="Playlist", description="Test",
+                        tracks=tracks, snapshot_id="s1")
+    playlist.to_json(path)
+
+    lines = PlaylistLines.read(path)
+
+    assert (lines.id, lines.name, lines.description, lines.snapshot_id) == (
+        "playlist1", "Playlist", "Test", "s1")
+    assert lines.track_ids() == [track.id for track in tracks]
+    assert lines.sort_keys() == [track.sort_key for track in tracks]
+    assert [Track.from_json_line(line) for line in lines.track_lines] == tracks
+    written = tmp_path / "written.json"
+    lines.to_json(written)
+    assert written.read_text() == path.read_text()
+
+
+def test_playlist_lines_rejects_other_layouts(tmp_path, track_with_images):
+    """Test that files not written by Playlist.to_json are left to Playlist.from_json."""
+    path = tmp_path / "playlist.json"
+    path.write_text(json.dumps(
+        {"id": "playlist1", "name": "Playlist", "description": "Test",
+         "tracks": [track_with_images.to_dict()]}, indent=2))
+
+    assert PlaylistLines.read(path) is None
@@ -0,0 +1,152 @@
+"""Tests for the fused download -> colour extraction -> sort pipeline."""
+
+import io
+from unittest.mock import Mock
+
+import pytest
+import requests
+from PIL import Image
+
+from chromalist.colour_cache import ColourCache
+from chromalist.colour_store import iter_colour_data, read_parameters
+from chromalist.files import FilePaths
+from chromalist.image_processing import ImageProcessor
+from chromalist.models import Playlist, Track
+from chromalist.pipeline import Pipeline, run_pipeline
+
+COLOURS = {
+    "red": (255, 0, 0),
+    "green": (0, 255, 0),
+    "blue": (0, 0, 255),
+}
+
+
+def jpeg_bytes(colour):
+    """Encode a single-colour image as JPEG."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (100, 100), colour).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def playlist():
+    """A playlist where two tracks share the red cover, and one cover is missing."""
+    def track(track_id, cover):
+        return Track(id=track_id, name=f"Song {track_id}", artist="Artist",
+                     album_name=cover, album_art_url=f"https://example.com/{cover}.jpg")
+
+    return Playlist(id="playlist1", name="Playlist", description="", tracks=[
+        track("t1", "blue"),
+        track("t2", "red"),
+        track("t3", "green"),
+        track("t4", "red"),
+        track("t5", "missing"),
+    ])
+
+
+@pytest.fixture
+def client():
+    """A Spotify client serving the covers from memory."""
+    def fetch_album_art(image_url):
+        name = image_url.rsplit("/", 1)[1].removesuffix(".jpg")
+        if name not in COLOURS:
+            raise requests.HTTPError("404 Not Found")
+        return jpeg_bytes(COLOURS[name])
+
+    client = Mock()
+    client.fetch_album_art.side_effect = fetch_album_art
+    return client
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_pipeline_sorts_playlist(tmp_path, client, playlist, workers):
+    """Test downloading, processing and sorting in memory, without writing files."""
+    progress = Mock()
+
+    result = run_pipeline(
+        client, playlist, ImageProcessor(), k=1, workers=workers, progress=progress)
+
+    assert [track.id for track in result.sorted_playlist.tracks] == ["t2", "t4", "t3", "t1"]
+    assert [track.id for track in result.excluded_tracks] == ["t5"]
+    assert [data.track_id for data in result.colour_data] == ["t1", "t2", "t3", "t4", "t5"]
+    assert "404" in result.colour_data[4].error
+
+    # Each unique cover is downloaded and reported once
+    assert client.fetch_album_art.call_count == 4
+    assert sum(call.args[0] for call in progress.call_args_list) == 4
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_run_pipeline_matches_process_tracks(tmp_path, client, playlist):
+    """Test that the in-memory pipeline gives the same colours as processing files."""
+    file_paths = FilePaths(tmp_path)
+    processor = ImageProcessor()
+
+    result = run_pipeline(client, playlist, processor, k=2, workers=1, file_paths=file_paths)
+    from_files = list(processor.process_tracks(file_paths, 2, playlist.tracks[:4], workers=1))
+
+    assert [(data.rgbs, data.hsvs) for data in result.colour_data[:4]] == [
+        (data.rgbs, data.hsvs) for data in from_files]
+
+
+def test_run_pipeline_writes_intermediate_files(tmp_path, client, playlist):
+    """Test that the intermediate files of the separate commands are written on request."""
+    file_paths = FilePaths(tmp_path)
+
+    run_pipeline(client, playlist, ImageProcessor(), k=1, workers=1, file_paths=file_paths)
+
+    assert Playlist.from_json(file_paths.playlist_path()) == playlist
+    for track_id in ["t1", "t2", "t3", "t4"]:
+        assert file_paths.track_image_path(track_id).exists()
+    colours_path = file_paths.image_colours_jsonl_path()
+    assert read_parameters(colours_path) == ImageProcessor().extraction_parameters(1)
+    assert len(list(iter_colour_data(colours_path))) == 5
+
+
+def test_run_pipeline_uses_cache(tmp_path, client, playlist):
+    """Test that covers found in the colour cache are not processed again."""
+    with ColourCache(tmp_path / "cache.sqlite") as cache:
+        first = run_pipeline(client, playlist, ImageProcessor(), k=1, workers=1, cache=cache)
+        assert (cache.hits, cache.misses) == (0, 3)
+
+        second = run_pipeline(client, playlist, ImageProcessor(), k=1, workers=1, cache=cache)
+        assert (cache.hits, cache.misses) == (3, 3)
+
+    assert second.colour_data == first.colour_data
+
+
+def test_pipeline_shares_covers_between_playlists(tmp_path, client, playlist):
+    """Test that covers seen in an earlier playlist are not downloaded again."""
+    other = Playlist(id="playlist2", name="Other", description="", tracks=[
+        Track(id="t6", name="Song t6", artist="Artist", album_name="red",
+              album_art_url="https://example.com/red.jpg"),
+    ])
+    (tmp_path / "one").mkdir()
+    (tmp_path / "two").mkdir()
+
+    with Pipeline(client, ImageProcessor(), k=1, workers=1) as pipeline:
+        first = pipeline.run(playlist, FilePaths(tmp_path / "one"))
+        result = pipeline.run(other, FilePaths(tmp_path / "two"))
+
+    assert client.fetch_album_art.call_count == 4
+    assert pipeline.covers_downloaded == 4
+    assert [track.id for track in result.sorted_playlist.tracks] == ["t6"]
+    assert result.colour_data[0].rgbs == first.colour_data[1].rgbs
+    assert FilePaths(tmp_path / "two").track_image_path("t6").exists()
+
+
+def test_pipeline_replaces_shared_cover_without_changing_linked_tracks(tmp_path, client, playlist):
+    """Test that a new cover for one track doesn't change the cover it used to share."""
+    file_paths = FilePaths(tmp_path)
+    run_pipeline(client, playlist, ImageProcessor(), k=1, workers=1, file_paths=file_paths)
+    red = file_paths.track_image_path("t2").read_bytes()
+    assert file_paths.track_image_path("t4").read_bytes() == red
+
+    changed = Playlist(id="playlist1", name="Playlist", description="", tracks=[
+        Track(id="t4", name="Song t4", artist="Artist", album_name="blue",
+              album_art_url="https://example.com/blue.jpg"),
+    ])
+    run_pipeline(client, changed, ImageProcessor(), k=1, workers=1, file_paths=file_paths)
+
+    assert file_paths.track_image_path("t2").read_bytes() == red
+    assert file_paths.track_image_path("t4").read_bytes() == jpeg_bytes(COLOURS["blue"])
@@ -2,11 +2,19 @@
 
 import json
 
+import numpy as np
 import pytest
 
+from chromalist.colour_store import write_colour_array
 from chromalist.files import FilePaths
 from chromalist.models import ImageColourData, Playlist, Track
-from chromalist.playlist_sorting import sort_playlist_by_hue
+from chromalist.playlist_sorting import (
+    SortMode,
+    TieBreaker,
+    sort_playlist_by_hue,
+    sort_tracks_by_dominant_hsv,
+    update_sorted_playlist,
+)
 
 
 @pytest.fixture
@@ -353,3 +361,204 @@ def test_sort_playlist_hue_order(tmp_path):
     assert sorted_playlist.tracks[1].sort_key == (0,60.0)
     assert sorted_playlist.tracks[2].sort_key == (0,180.0)
     assert sorted_playlist.tracks[3].sort_key == (0,300.0)
+
+
+def test_sort_playlist_from_json_lines(tmp_path, sample_playlist, sample_color_data):
+    """Test sorting with colour data streamed from image-colours.jsonl."""
+    file_paths = FilePaths(tmp_path)
+    sample_playlist.to_json(file_paths.playlist_path())
+
+    # An earlier failed attempt for the red track is replaced by the later record
+    failed_red = ImageColourData(
+        track_id="track_red", rgbs=[], hsvs=[], error="Failed to process image")
+    with open(file_paths.image_colours_jsonl_path(), "w") as f:
+        for c in [failed_red, *reversed(sample_color_data)]:
+            f.write(json.dumps(c.to_dict()) + "\n")
+
+    sorted_playlist, excluded_count = sort_playlist_by_hue(file_paths)
+
+    assert excluded_count == 0
+    assert [t.id for t in sorted_playlist.tracks] == [
+        "track_red", "track_green", "track_blue"]
+
+
+def test_sort_playlist_from_binary_colour_data(tmp_path, sample_playlist, sample_color_data):
+    """Test sorting with colour data from the memory-mapped image-colours.npy."""
+    file_paths = FilePaths(tmp_path)
+    sample_playlist.to_json(file_paths.playlist_path())
+    failed_green = ImageColourData(
+        track_id="track_green", rgbs=[], hsvs=[], error="Failed to process image")
+    write_colour_array(
+        file_paths.image_colours_binary_path(),
+        [sample_color_data[2], failed_green, sample_color_data[0]], k=3)
+
+    sorted_playlist, excluded_count = sort_playlist_by_hue(file_paths)
+
+    assert excluded_count == 1
+    assert [t.id for t in sorted_playlist.tracks] == ["track_red", "track_blue"]
+
+
+def make_tracks(names):
+    """Create tracks named after their IDs."""
+    return [Track(id=name, name=name, artist=artist, album_name="Album",
+                  album_art_url=f"https://example.com/{name}.jpg")
+            for name, artist in names]
+
+
+def test_sort_tracks_vectorized_matching():
+    """Test that colours are matched to the playlist by ID, the last colour of a track winning."""
+    tracks = make_tracks([("c", "A"), ("a", "A"), ("missing", "A"), ("b", "A")])
+    playlist = Playlist(id="p", name="P", description="", tracks=tracks)
+
+    sorted_playlist, excluded_tracks = sort_tracks_by_dominant_hsv(
+        playlist,
+        ["a", "b", "unknown", "c", "a"],
+        np.array([[10, 90, 90], [20, 90, 90], [0, 90, 90], [30, 90, 90], [40, 90, 90]]),
+    )
+
+    assert [t.id for t in sorted_playlist.tracks] == ["b", "c", "a"]
+    assert [t.sort_key for t in sorted_playlist.tracks] == [(0, 20), (0, 30), (0, 40)]
+    assert excluded_tracks == [tracks[2]]
+
+    sorted_playlist, excluded_tracks = sort_tracks_by_dominant_hsv(
+        playlist, [], np.empty((0, 3)))
+    assert sorted_playlist.tracks == []
+    assert excluded_tracks == tracks
+
+
+def test_sort_tracks_saturation_threshold():
+    """Test that the threshold decides which colours are sorted as greys."""
+    tracks = make_tracks([("pale", "A"), ("red", "A"), ("grey", "A")])
+    playlist = Playlist(id="p", name="P", description="", tracks=tracks)
+    hsvs = np.array([[200, 30, 90], [0, 90, 50], [0, 5, 40]])
+
+    by_default, _ = sort_tracks_by_dominant_hsv(playlist, ["pale", "red", "grey"], hsvs)
+    assert [t.id for t in by_default.tracks] == ["red", "pale", "grey"]
+
+    strict, _ = sort_tracks_by_dominant_hsv(
+        playlist, ["pale", "red", "grey"], hsvs, saturation_threshold=50)
+    assert [t.id for t in strict.tracks] == ["red", "grey", "pale"]
+    assert strict.tracks[2].sort_key == (90, 0)
+
+
+@pytest.mark.parametrize("tie_breakers, expected", [
+    ((), ["d", "b", "a", "c"]),
+    ((TieBreaker.saturation,), ["b", "a", "d", "c"]),
+    ((TieBreaker.value,), ["a", "d", "b", "c"]),
+    ((TieBreaker.artist, TieBreaker.name), ["a", "b", "d", "c"]),
+])
+def test_sort_tracks_tie_breakers(tie_breakers, expected):
+    """Test that tie-breakers order tracks with equal sort keys, which otherwise keep their order."""
+    tracks = make_tracks([("d", "Y"), ("b", "x"), ("a", "x"), ("c", "Z")])
+    playlist = Playlist(id="p", name="P", description="", tracks=tracks)
+    # Same hue for all but c
+    hsvs = np.array([[100, 50, 90], [100, 80, 95], [100, 60, 40], [200, 50, 50]])
+
+    sorted_playlist, _ = sort_tracks_by_dominant_hsv(
+        playlist, ["d", "b", "a", "c"], hsvs, tie_breakers=tie_breakers)
+
+    assert [t.id for t in sorted_playlist.tracks] == expected
+
+
+def test_sort_playlist_gradient_mode(tmp_path):
+    """Test that the gradient mode puts similar colours next to each other."""
+    file_paths = FilePaths(tmp_path)
+    # Dark red, bright blue, bright red and dark blue
+    hsvs = {"dark_red": (0.0, 100.0, 30.0), "blue": (240.0, 100.0, 100.0),
+            "red": (0.0, 100.0, 100.0), "dark_blue": (240.0, 100.0, 30.0),
+            "orange": (20.0, 100.0, 100.0)}
+    tracks = make_tracks([(track_id, "A") for track_id in hsvs])
+    Playlist(id="p", name="P", description="", tracks=tracks).to_json(file_paths.playlist_path())
+    with open(file_paths.image_colours_jsonl_path(), "w") as f:
+        for track_id, hsv in hsvs.items():
+            f.write(json.dumps({"track_id": track_id, "rgbs": [], "hsvs": [hsv], "error": None}) + "\n")
+
+    sorted_playlist, excluded_count = sort_playlist_by_hue(file_paths, mode=SortMode.gradient)
+
+    order = [t.id for t in sorted_playlist.tracks]
+    assert excluded_count == 0
+    for first, second in [("dark_red", "red"), ("red", "orange"), ("blue", "dark_blue")]:
+        assert abs(order.index(first) - order.index(second)) == 1
+    assert all(t.sort_key is None for t in sorted_playlist.tracks)
+
+
+def write_colour_lines(file_paths, hsvs):
+    """Write image-colours.jsonl with a dominant colour per track ID."""
+    with open(file_paths.image_colours_jsonl_path(), "w") as f:
+        for track_id, hsv in hsvs.items():
+            f.write(json.dumps({"track_id": track_id, "rgbs": [], "hsvs": [hsv], "error": None}) + "\n")
+
+
+def sorted_ids(file_paths):
+    """IDs of the tracks in sorted-playlist.json."""
+    return [t.id for t in Playlist.from_json(file_paths.sorted_playlist_path()).tracks]
+
+
+def test_update_sorted_playlist(tmp_path):
+    """Test that added tracks are placed by their keys and removed tracks taken out."""
+    file_paths = FilePaths(tmp_path)
+    hsvs = {"red": (0.0, 90.0, 90.0), "green": (120.0, 90.0, 90.0),
+            "blue": (240.0, 90.0, 90.0), "black": (0.0, 0.0, 5.0)}
+    write_colour_lines(file_paths, hsvs)
+    tracks = make_tracks([(track_id, "A") for track_id in ["green", "blue", "red", "black"]])
+    Playlist(id="p", name="P", description="", tracks=tracks).to_json(file_paths.playlist_path())
+
+    # Without a sorted playlist, everything is sorted
+    result = update_sorted_playlist(file_paths)
+    assert sorted_ids(file_paths) == ["red", "green", "blue", "black"]
+    assert (len(result.added_tracks), result.track_count) == (4, 4)
+
+    # Stored keys are trusted: a changed colour doesn't move a track
+    hsvs.update({"red": (300.0, 90.0, 90.0), "yellow": (60.0, 90.0, 90.0),
+                 "white": (0.0, 0.0, 95.0), "green_too": (120.0, 90.0, 90.0)})
+    write_colour_lines(file_paths, hsvs)
+    tracks = make_tracks([(track_id, "A") for track_id in [
+        "red", "blue", "black", "white", "green_too", "yellow", "no_colours"]])
+    Playlist(id="p", name="Renamed", description="", tracks=tracks).to_json(
+        file_paths.playlist_path())
+
+    result = update_sorted_playlist(file_paths)
+
+    expected = ["red", "yellow", "green_too", "blue", "black", "white"]
+    assert [t.id for t in result.added_tracks] == ["yellow", "green_too", "white"]
+    assert [t.id for t in result.removed_tracks] == ["green"]
+    assert (result.track_count, result.excluded_count) == (6, 1)
+    saved = Playlist.from_json(file_paths.sorted_playlist_path())
+    assert saved.name == "Renamed"
+    assert [t.id for t in saved.tracks] == expected
+    assert saved.tracks[0].sort_key == (0, 0)
+    assert saved.tracks[1].sort_key == (0, 60)
+    markdown = file_paths.sorted_playlist_images_markdown_path().read_text().splitlines()
+    assert [line.split('data-trackid="')[1][:-2] for line in markdown] == expected
+
+
+def test_update_sorted_playlist_unchanged(tmp_path, sample_playlist, sample_color_data):
+    """Test that an up-to-date sorted playlist isn't rewritten."""
+    file_paths = FilePaths(tmp_path)
+    sample_playlist.to_json(file_paths.playlist_path())
+    write_colour_lines(file_paths, {c.track_id: c.hsvs[0] for c in sample_color_data})
+    sort_playlist_by_hue(file_paths)
+    file_paths.sorted_playlist_images_markdown_path().unlink()
+
+    result = update_sorted_playlist(file_paths)
+
+    assert (result.added_tracks, result.removed_tracks) == ([], [])
+    assert result.track_count == 3
+    assert not file_paths.sorted_playlist_images_markdown_path().exists()
+
+
+def test_update_sorted_playlist_after_gradient_sort(tmp_path, sample_playlist, sample_color_data):
+    """Test that a sorted playlist without sort keys is sorted again from scratch when it changes."""
+    file_paths = FilePaths(tmp_path)
+    sample_playlist.to_json(file_paths.playlist_path())
+    write_colour_lines(file_paths, {c.track_id: c.hsvs[0] for c in sample_color_data})
+    sort_playlist_by_hue(file_paths, mode=SortMode.gradient)
+    removed = sample_playlist.tracks.pop(1)
+    sample_playlist.to_json(file_paths.playlist_path())
+
+    result = update_sorted_playlist(file_paths)
+
+    assert sorted_ids(file_paths) == ["track_red", "track_blue"]
+    assert (result.added_tracks, result.removed_tracks) == ([], [removed])
+    saved = Playlist.from_json(file_paths.sorted_playlist_path())
+    assert all(t.sort_key is not None for t in saved.tracks)
@@ -0,0 +1,189 @@
+"""Tests for the rate-limit-aware request scheduler, against a local stub server."""
+
+import email.utils
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from spotipy.exceptions import SpotifyException
+
+from chromalist.request_scheduler import RequestScheduler, parse_retry_after
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    """Answers 429 when too many requests are in flight, or a scripted status."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            status = server.script.pop(0) if server.script else None
+            if status is None and server.active > server.capacity:
+                status = 429
+        try:
+            if status is None:
+                time.sleep(0.005)
+                status = 200
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", server.retry_after)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    """A local HTTP server that throttles beyond a number of concurrent requests."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.active = 0
+    server.capacity = 1000
+    server.script = []
+    server.retry_after = "0.01"
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/image.jpg"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("3", 3.0),
+    ("0.5", 0.5),
+    ("-1", 0.0),
+    (None, None),
+    ("soon", None),
+    ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0),
+])
+def test_parse_retry_after(value, expected):
+    """Test parsing Retry-After seconds and HTTP dates."""
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_future_date():
+    """Test that an HTTP date is converted to the number of seconds until then."""
+    value = email.utils.formatdate(time.time() + 60, usegmt=True)
+
+    assert 55 < parse_retry_after(value) <= 60
+
+
+def test_retries_throttled_request(stub_server):
+    """Test that 429s are retried and lower the concurrency limit."""
+    scheduler = RequestScheduler(max_concurrency=8, backoff_base=0.001)
+    stub_server.script = [429, 429]
+
+    response = scheduler.run(requests.get, stub_server.url, timeout=5)
+
+    assert response.status_code == 200
+    assert (scheduler.requests, scheduler.retries, scheduler.throttled) == (3, 2, 2)
+    assert scheduler.concurrency < 8
+
+
+def test_retries_server_errors_then_gives_up(stub_server):
+    """Test that 5xx statuses are retried until the retries run out."""
+    scheduler = RequestScheduler(max_retries=2, backoff_base=0.001)
+    stub_server.script = [503, 503, 503, 503]
+
+    response = scheduler.run(requests.get, stub_server.url, timeout=5)
+
+    assert response.status_code == 503
+    assert scheduler.requests == 3
+    assert scheduler.throttled == 0
+
+
+def test_does_not_retry_client_errors(stub_server):
+    """Test that errors other than throttling and server errors fail at once."""
+    scheduler = RequestScheduler(backoff_base=0.001)
+    stub_server.script = [404]
+
+    response = scheduler.run(requests.get, stub_server.url, timeout=5)
+
+    assert response.status_code == 404
+    assert scheduler.requests == 1
+
+
+def test_retries_connection_errors():
+    """Test that connection errors are retried and raised when the retries run out."""
+    scheduler = RequestScheduler(max_retries=2, backoff_base=0.001)
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise requests.ConnectionError("refused")
+
+    with pytest.raises(requests.ConnectionError):
+        scheduler.run(fail)
+    assert len(calls) == 3
+
+
+def test_honours_retry_after_from_spotify_exception():
+    """Test that throttling raised by spotipy waits for Retry-After."""
+    scheduler = RequestScheduler(backoff_base=0.001)
+    outcomes = [SpotifyException(429, -1, "slow down", headers={"Retry-After": "0.2"}), "ok"]
+
+    def request():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    start = time.perf_counter()
+    assert scheduler.run(request) == "ok"
+    assert time.perf_counter() - start >= 0.2
+
+
+def test_gives_up_on_long_retry_after():
+    """Test that a request throttled for longer than max_retry_after fails at once."""
+    scheduler = RequestScheduler(max_retry_after=1)
+
+    def request():
+        raise SpotifyException(429, -1, "slow down", headers={"Retry-After": "3600"})
+
+    with pytest.raises(SpotifyException):
+        scheduler.run(request)
+    assert scheduler.requests == 1
+
+
+def test_adapts_concurrency_to_throttling_server(stub_server):
+    """Test that AIMD settles below the server's capacity and every request succeeds."""
+    stub_server.capacity = 3
+    scheduler = RequestScheduler(max_concurrency=16, max_retries=20, backoff_base=0.005)
+
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=16) as executor:
+        responses = list(executor.map(
+            lambda _: scheduler.run(session.get, stub_server.url, timeout=5), range(60)))
+
+    assert all(response.status_code == 200 for response in responses)
+    assert scheduler.throttled > 0
+    assert scheduler.concurrency < 16
+
+
+def test_additive_increase_is_capped():
+    """Test that successes raise the limit gradually again, up to max_concurrency."""
+    scheduler = RequestScheduler(max_concurrency=8)
+    outcomes = [SpotifyException(429, -1, "slow down", headers={"Retry-After": "0"}), "ok"]
+
+    def request():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    scheduler.run(request)
+    assert scheduler.concurrency == 4
+
+    for _ in range(100):
+        scheduler.run(lambda: "ok")
+    assert scheduler.concurrency == 8
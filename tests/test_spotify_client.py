@@ -5,7 +5,7 @@ import pytest
 
 from chromalist.files import FilePaths
 from chromalist.models import Playlist
-from chromalist.spotify_client import SpotifyClient
+from chromalist.spotify_client import PLAYLIST_FIELDS, PLAYLIST_ITEMS_FIELDS, SpotifyClient
 
 
 @pytest.fixture
@@ -15,6 +15,7 @@ def mock_spotify_data():
         "id": "test_playlist_id",
         "name": "Test Playlist",
         "description": "A test playlist for unit tests",
+        "snapshot_id": "snapshot1",
         "tracks": {
             "items": [
                 {
@@ -75,13 +76,16 @@ def test_get_playlist_success(mock_spotify_client, mock_spotify_data):
     playlist = mock_spotify_client.get_playlist("test_playlist_id")
 
     # Verify API was called
-    mock_spotify_client.sp.playlist.assert_called_once_with("test_playlist_id")
+    mock_spotify_client.sp.playlist.assert_called_once_with(
+        "test_playlist_id", fields=PLAYLIST_FIELDS)
+    mock_spotify_client.sp.playlist_items.assert_not_called()
 
     # Verify playlist data
     assert isinstance(playlist, Playlist)
     assert playlist.id == "test_playlist_id"
     assert playlist.name == "Test Playlist"
     assert playlist.description == "A test playlist for unit tests"
+    assert playlist.snapshot_id == "snapshot1"
     assert len(playlist.tracks) == 2
 
     # Verify track data
@@ -91,6 +95,18 @@ def test_get_playlist_success(mock_spotify_client, mock_spotify_data):
     assert track1.artist == "Test Artist 1"
     assert track1.album_name == "Test Album 1"
     assert track1.album_art_url == "http://example.com/image1.jpg"
+    assert [image.url for image in track1.album_images] == ["http://example.com/image1.jpg"]
+
+
+def test_get_playlist_snapshot(mock_spotify_client):
+    """Test fetching only the snapshot ID of a playlist."""
+    mock_spotify_client.sp.playlist.return_value = {
+        "id": "test_playlist_id", "snapshot_id": "snapshot1"}
+
+    assert mock_spotify_client.get_playlist_snapshot("test_playlist_id") == (
+        "test_playlist_id", "snapshot1")
+    mock_spotify_client.sp.playlist.assert_called_once_with(
+        "test_playlist_id", fields="id,snapshot_id")
 
 
 def test_get_playlist_with_null_tracks(mock_spotify_client):
@@ -127,59 +143,53 @@ def test_get_playlist_with_null_tracks(mock_spotify_client):
     assert playlist.tracks[0].id == "track1"
 
 
+def make_item(track_id):
+    """Create a playlist item as returned by the Spotify API."""
+    return {
+        "track": {
+            "id": track_id,
+            "name": f"Song {track_id}",
+            "artists": [{"name": "Artist"}],
+            "album": {
+                "name": "Album",
+                "images": [{"url": f"http://example.com/{track_id}.jpg"}],
+            },
+        }
+    }
+
+
 def test_get_playlist_pagination(mock_spotify_client):
     """Test fetching playlist with multiple pages of tracks."""
-    # First page
+    # First page, with the playlist
     first_page = {
         "id": "test_playlist_id",
         "name": "Test Playlist",
         "description": "Test",
         "tracks": {
-            "items": [
-                {
-                    "track": {
-                        "id": "track1",
-                        "name": "Test Song 1",
-                        "artists": [{"name": "Artist 1"}],
-                        "album": {
-                            "name": "Album 1",
-                            "images": [{"url": "http://example.com/image1.jpg"}],
-                        },
-                    }
-                },
-            ],
-            "next": "http://api.spotify.com/next",
+            "items": [make_item(f"track{i}") for i in range(100)],
+            "total": 250,
         },
     }
 
-    # Second page
-    second_page = {
-        "items": [
-            {
-                "track": {
-                    "id": "track2",
-                    "name": "Test Song 2",
-                    "artists": [{"name": "Artist 2"}],
-                    "album": {
-                        "name": "Album 2",
-                        "images": [{"url": "http://example.com/image2.jpg"}],
-                    },
-                }
-            },
-        ],
-        "next": None,
-    }
+    # The remaining pages, by offset
+    def playlist_items(playlist_id, fields, limit, offset):
+        return {
+            "items": [make_item(f"track{i}") for i in range(offset, min(offset + limit, 250))],
+            "total": 250,
+        }
 
     mock_spotify_client.sp.playlist.return_value = first_page
-    mock_spotify_client.sp.next.return_value = second_page
+    mock_spotify_client.sp.playlist_items.side_effect = playlist_items
 
-    playlist = mock_spotify_client.get_playlist("test_playlist_id")
+    playlist = mock_spotify_client.get_playlist("test_playlist_id", concurrency=2)
 
-    # Should have tracks from both pages
-    assert len(playlist.tracks) == 2
-    assert playlist.tracks[0].id == "track1"
-    assert playlist.tracks[1].id == "track2"
-    mock_spotify_client.sp.next.assert_called_once()
+    # Should have tracks from all pages, in playlist order
+    assert [track.id for track in playlist.tracks] == [f"track{i}" for i in range(250)]
+    assert mock_spotify_client.sp.playlist_items.call_count == 2
+    for offset in [100, 200]:
+        mock_spotify_client.sp.playlist_items.assert_any_call(
+            "test_playlist_id", fields=PLAYLIST_ITEMS_FIELDS, limit=100, offset=offset)
+    mock_spotify_client.sp.next.assert_not_called()
 
 
 def test_download_album_art_success(mock_spotify_client, tmp_path):
@@ -188,7 +198,7 @@ def test_download_album_art_success(mock_spotify_client, tmp_path):
     mock_response = Mock()
     mock_response.content = b"fake_image_data"
 
-    with patch("chromalist.spotify_client.requests.get", return_value=mock_response):
+    with patch.object(mock_spotify_client.session, "get", return_value=mock_response):
         mock_spotify_client.download_album_art(
             "track123",
             "http://example.com/image.jpg",
@@ -217,7 +227,7 @@ def test_download_album_art_network_error(mock_spotify_client, tmp_path):
     import requests
     file_paths = FilePaths(tmp_path)
 
-    with patch("chromalist.spotify_client.requests.get") as mock_get:
+    with patch.object(mock_spotify_client.session, "get") as mock_get:
         mock_get.side_effect = requests.RequestException("Network error")
 
         with pytest.raises(requests.RequestException):
@@ -226,3 +236,47 @@ def test_download_album_art_network_error(mock_spotify_client, tmp_path):
                 "http://example.com/image.jpg",
                 file_paths
             )
+
+
+def test_download_album_arts_concurrently(mock_spotify_client, tmp_path):
+    """Test downloading many covers concurrently over the shared session."""
+    import requests
+    file_paths = FilePaths(tmp_path)
+
+    def fake_get(url, timeout):
+        if "broken" in url:
+            raise requests.RequestException("Network error")
+        response = Mock()
+        response.content = url.encode()
+        return response
+
+    downloads = [(f"track{i}", f"http://example.com/image{i}.jpg") for i in range(20)]
+    downloads.append(("track_broken", "http://example.com/broken.jpg"))
+
+    with patch.object(mock_spotify_client.session, "get", side_effect=fake_get) as mock_get:
+        results = dict(mock_spotify_client.download_album_arts(
+            downloads, file_paths, concurrency=4))
+
+    # Every download is reported once, with failures reported per track
+    assert mock_get.call_count == 21
+    assert set(results) == {track_id for track_id, _ in downloads}
+    assert isinstance(results.pop("track_broken"), requests.RequestException)
+    assert all(error is None for error in results.values())
+    for track_id, image_url in downloads[:-1]:
+        assert file_paths.track_image_path(track_id).read_bytes() == image_url.encode()
+
+
+
+def test_download_album_art_retries_when_throttled(mock_spotify_client, tmp_path):
+    """Test that a throttled download is retried by the client's scheduler."""
+    import requests
+    file_paths = FilePaths(tmp_path)
+    throttled = Mock(spec=requests.Response, status_code=429, headers={"Retry-After": "0"})
+    ok = Mock(spec=requests.Response, status_code=200, headers={}, content=b"fake_image_data")
+
+    with patch.object(mock_spotify_client.session, "get", side_effect=[throttled, ok]):
+        mock_spotify_client.download_album_art(
+            "track123", "http://example.com/image.jpg", file_paths)
+
+    assert file_paths.track_image_path("track123").read_bytes() == b"fake_image_data"
+    assert mock_spotify_client.scheduler.throttled == 1